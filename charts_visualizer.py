@@ -12,8 +12,10 @@ com foco em variáveis meteorológicas derivadas de fontes como ERA5-Land (via G
 Responsabilidades
 -----------------
 - Gerar gráficos de linha (Plotly) para séries temporais padronizadas.
-- Exibir estatísticas descritivas básicas (média, máximo, mínimo, amplitude e desvio padrão).
-- Disponibilizar exportação dos resultados em PNG/JPG (imagem), CSV e Excel.
+- Exibir estatísticas descritivas (média, extremos, percentis, tendência de Mann-Kendall/Sen,
+  autocorrelação e excedências) via `series_statistics`.
+- Disponibilizar exportação dos resultados em PNG/JPG (imagem), CSV, Excel e Parquet.
+  As imagens só são geradas quando o usuário pede, num renderizador Kaleido reaproveitado.
 - Fornecer visualização comparativa multi-eixos (até 4 variáveis simultâneas).
 
 """
@@ -21,12 +23,81 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go 
-import io
+import numpy as np
 import re
+import json
+import hashlib
+import threading
+import export_handler
+import series_statistics
+import series_aggregation
+import event_detection
 
-def _create_chart_figure(df: pd.DataFrame, variable: str, unit: str):
+# Tamanho padrão das imagens exportadas
+EXPORT_WIDTH, EXPORT_HEIGHT, EXPORT_SCALE = 1200, 800, 2
+# O escopo Kaleido conversa com um único subprocesso por stdin/stdout: uma renderização por vez
+_RENDER_LOCK = threading.Lock()
+
+# Séries acima deste número de pontos usam WebGL (Scattergl) + redução LTTB
+LARGE_SERIES_THRESHOLD = 2000
+LTTB_TARGET_POINTS = 1500
+
+def lttb_downsample(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: devolve os índices de `n_out` pontos que
+    preservam a forma visual da série (picos e vales). `x` deve ser numérico e crescente.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        nlo = hi
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        nhi = max(nhi, nlo + 1)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # Área do triângulo (a, candidato, média do próximo balde), vetorizada no balde
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+def _downsample_df(df: pd.DataFrame, n_out: int = LTTB_TARGET_POINTS) -> pd.DataFrame:
+    """Aplica LTTB em um DataFrame date/value (ordenado) se ele for grande."""
+    if len(df) <= LARGE_SERIES_THRESHOLD:
+        return df
+    x = df['date'].values.astype('datetime64[ns]').astype(np.int64).astype(float)
+    keep = lttb_downsample(x, df['value'].values, n_out)
+    return df.iloc[keep]
+
+def _zoom_window(date_min, date_max, key: str):
+    """
+    Janela de zoom em resolução total para séries longas. O Streamlit não expõe o
+    evento relayout do Plotly, então o recorte é escolhido neste controle e a série
+    completa em cache é fatiada e reduzida de novo só dentro da janela.
+    """
+    d0, d1 = date_min.date(), date_max.date()
+    if d0 >= d1:
+        return None
+    win = st.slider(
+        "🔍 Janela de zoom (resolução total)",
+        min_value=d0, max_value=d1, value=(d0, d1),
+        format="DD/MM/YYYY", key=f"zoom_{key}"
+    )
+    return pd.Timestamp(win[0]), pd.Timestamp(win[1]) + pd.Timedelta(days=1)
+
+def _create_chart_figure(df: pd.DataFrame, variable: str, unit: str, large: bool = False):
     """
     Cria uma figura Plotly (linha) para uma série temporal padronizada.
+    Com `large=True` usa WebGL e dispensa os marcadores.
     """
     
     variable_name = variable.split(" (")[0]
@@ -40,7 +111,8 @@ def _create_chart_figure(df: pd.DataFrame, variable: str, unit: str):
             "date": "Data",
             "value": f"{variable_name} ({unit})"
         },
-        markers=True
+        markers=not large,
+        render_mode="webgl" if large else "auto"
     )
 
     fig.update_layout(
@@ -77,15 +149,80 @@ def _create_chart_figure(df: pd.DataFrame, variable: str, unit: str):
 
     return fig
 
-def _convert_df_to_excel(df: pd.DataFrame) -> bytes:
+@st.cache_resource(show_spinner=False)
+def _get_image_renderer():
     """
-    Converte um DataFrame em arquivo Excel (.xlsx) em memória.
+    Escopo Kaleido único por processo. O Chromium do Kaleido fica vivo entre
+    renderizações; a figura vazia aqui só serve para aquecê-lo.
     """
+    import plotly.io as pio
+    scope = pio.kaleido.scope
+    scope.default_width, scope.default_height, scope.default_scale = EXPORT_WIDTH, EXPORT_HEIGHT, EXPORT_SCALE
+    try:
+        with _RENDER_LOCK:
+            scope.transform(go.Figure().to_plotly_json(), format="png", width=10, height=10, scale=1)
+    except Exception:
+        pass
+    return scope
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _figure_image_bytes(fig_digest: str, fmt: str, _fig_json: str) -> bytes:
+    """Bytes da imagem em cache pelo digest da figura (mesma figura = sem nova renderização)."""
+    scope = _get_image_renderer()
+    fig_json = json.loads(_fig_json)
+    with _RENDER_LOCK:
+        return scope.transform(fig_json, format=fmt, width=EXPORT_WIDTH, height=EXPORT_HEIGHT, scale=EXPORT_SCALE)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _cached_statistics(digest: str, thresholds: tuple, trend: bool, _df: pd.DataFrame) -> pd.Series:
+    """Estatísticas da série em cache pelo digest dos dados (Mann-Kendall não é refeito a cada rerun)."""
+    return series_statistics.compute_series_statistics(_df, thresholds=list(thresholds) if thresholds else None, trend=trend)
+
+def _render_image_downloads(fig, variable_clean: str):
+    """
+    Botão 'Preparar imagens' e, depois do clique, os downloads PNG/JPG.
+    O pedido fica marcado na sessão pelo digest da figura, então reruns
+    seguintes só reutilizam os bytes em cache.
+    """
+    fig_json = fig.to_json()
+    digest = hashlib.sha1(fig_json.encode("utf-8")).hexdigest()
+    req_key = f"img_req_{variable_clean}"
+    
+    col_img1, col_img2, _ = st.columns([1, 1, 2])
     
-    excel_buffer = io.BytesIO()
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Dados')
-    return excel_buffer.getvalue()
+    if st.session_state.get(req_key) != digest:
+        with col_img1:
+            if not st.button("🖼️ Preparar Imagem", use_container_width=True, key=f"btn_prep_img_{variable_clean}"):
+                return
+        st.session_state[req_key] = digest
+
+    try:
+        with st.spinner("Gerando imagem..."):
+            img_png = _figure_image_bytes(digest, "png", fig_json)
+            img_jpg = _figure_image_bytes(digest, "jpeg", fig_json)
+    except (ValueError, RuntimeError):
+        with col_img1: st.warning("⚠️ Erro no servidor de imagem.")
+        return
+
+    with col_img1: 
+        st.download_button(
+            "💾 Baixar PNG", 
+            data=img_png, 
+            file_name=f"grafico_{variable_clean}.png", 
+            mime="image/png", 
+            use_container_width=True, 
+            key=f"btn_png_{variable_clean}"
+        )
+    
+    with col_img2: 
+        st.download_button(
+            "💾 Baixar JPG", 
+            data=img_jpg, 
+            file_name=f"grafico_{variable_clean}.jpg", 
+            mime="image/jpeg", 
+            use_container_width=True, 
+            key=f"btn_jpg_{variable_clean}"
+        )
 
 def display_time_series_chart(df: pd.DataFrame, variable: str, unit: str, show_help: bool = True):
     """
@@ -114,9 +251,20 @@ def display_time_series_chart(df: pd.DataFrame, variable: str, unit: str, show_h
     df_clean['value'] = pd.to_numeric(df_clean['value'], errors='coerce')
     df_clean = df_clean.dropna(subset=['date', 'value']).sort_values('date')
 
-    # 1. Gráfico
+    variable_clean = re.sub(r'[^a-zA-Z0-9]', '_', variable).lower()
+
+    # 1. Gráfico (séries longas: janela de zoom + LTTB + WebGL)
+    df_plot = df_clean
+    large = len(df_clean) > LARGE_SERIES_THRESHOLD
+    if large:
+        win = _zoom_window(df_clean['date'].min(), df_clean['date'].max(), variable_clean)
+        if win:
+            df_plot = df_clean[(df_clean['date'] >= win[0]) & (df_clean['date'] < win[1])]
+        df_plot = _downsample_df(df_plot)
+        large = len(df_plot) < len(df_clean) or len(df_plot) > LARGE_SERIES_THRESHOLD
+
     try:
-        fig = _create_chart_figure(df_clean, variable, unit)
+        fig = _create_chart_figure(df_plot, variable, unit, large=large)
         fig.update_layout(margin=dict(t=140, l=60, r=30, b=60))
         st.plotly_chart(fig, use_container_width=True)
         
@@ -128,38 +276,9 @@ def display_time_series_chart(df: pd.DataFrame, variable: str, unit: str, show_h
         st.error(f"Erro ao plotar gráfico: {e}")
         return
 
-    # 2. Download Imagem
-    
-    variable_clean = re.sub(r'[^a-zA-Z0-9]', '_', variable).lower()
+    # 2. Download Imagem (gerado só quando o usuário pede)
     
-    col_img1, col_img2, _ = st.columns([1, 1, 2])
-    
-    try:
-        img_png = fig.to_image(format="png", width=1200, height=800, scale=2)
-        img_jpg = fig.to_image(format="jpeg", width=1200, height=800, scale=2)
-        
-        with col_img1: 
-            st.download_button(
-                "💾 Baixar PNG", 
-                data=img_png, 
-                file_name=f"grafico_{variable_clean}.png", 
-                mime="image/png", 
-                use_container_width=True, 
-                key=f"btn_png_{variable_clean}"
-            )
-        
-        with col_img2: 
-            st.download_button(
-                "💾 Baixar JPG", 
-                data=img_jpg, 
-                file_name=f"grafico_{variable_clean}.jpg", 
-                mime="image/jpeg", 
-                use_container_width=True, 
-                key=f"btn_jpg_{variable_clean}"
-            )
-            
-    except (ValueError, RuntimeError):
-        with col_img1: st.warning("⚠️ Erro no servidor de imagem.")
+    _render_image_downloads(fig, variable_clean)
 
     # 3. Ajuda
     if show_help:
@@ -167,8 +286,10 @@ def display_time_series_chart(df: pd.DataFrame, variable: str, unit: str, show_h
 
     # 4. Estatísticas
     st.markdown("#### Estatísticas do Período")
-    media, maximo, minimo = df_clean['value'].mean(), df_clean['value'].max(), df_clean['value'].min()
-    amplitude, desvio = maximo - minimo, df_clean['value'].std()
+    digest = export_handler.dataframe_digest(df_clean[['date', 'value']])
+    stats = _cached_statistics(digest, None, True, df_clean)
+    media, maximo, minimo = stats["Média"], stats["Máxima"], stats["Mínima"]
+    amplitude, desvio = stats["Amplitude"], stats["Desvio Padrão"]
 
     c1, c2, c3, c4, c5 = st.columns(5)
     c1.metric("Média", f"{media:.1f} {unit}")
@@ -176,6 +297,21 @@ def display_time_series_chart(df: pd.DataFrame, variable: str, unit: str, show_h
     c3.metric("Mínima", f"{minimo:.1f} {unit}")
     c4.metric("Amplitude", f"{amplitude:.1f} {unit}", help="Diferença entre Máximo e Mínimo.")
     c5.metric("Desvio Padrão", f"{desvio:.1f}", help="Dispersão dos dados em relação à média.")
+
+    with st.expander("📐 Estatísticas Avançadas (percentis, tendência, excedências)", expanded=False):
+        pcols = st.columns(len(series_statistics.DEFAULT_PERCENTILES))
+        for col, p in zip(pcols, series_statistics.DEFAULT_PERCENTILES):
+            col.metric(f"P{p}", f"{stats[f'P{p}']:.1f}")
+
+        t1, t2, t3, t4 = st.columns(4)
+        t1.metric("Tendência (Mann-Kendall)", stats["Tendência"], help=f"Teste não paramétrico de tendência monotônica (α = {series_statistics.MK_ALPHA}).")
+        t2.metric("p-valor", f"{stats['MK p-valor']:.3f}" if pd.notna(stats['MK p-valor']) else "--")
+        t3.metric("Inclinação de Sen", f"{stats['Sen (por ano)']:.3f} {unit}/ano" if pd.notna(stats['Sen (por ano)']) else "--", help="Mediana das inclinações entre pares de pontos (robusta a outliers).")
+        t4.metric("Autocorrelação lag-1", f"{stats['Autocorrelação lag-1']:.2f}", help="Correlação de cada dia com o dia anterior (persistência).")
+
+        thr = st.number_input(f"Limiar de excedência ({unit})", value=round(float(stats["P90"]), 1), step=1.0, format="%.1f", key=f"thr_{variable_clean}")
+        exc = _cached_statistics(digest, (thr,), False, df_clean)
+        st.metric(f"Dias acima de {thr:.1f} {unit}", f"{int(exc['Excedências #1'])} de {int(exc['N'])}")
     
     # 5. Tabela
        
@@ -199,33 +335,249 @@ def display_time_series_chart(df: pd.DataFrame, variable: str, unit: str, show_h
             }
         )
 
-    # Botões de exportação
-    csv_data = df_export.to_csv(index=False, encoding='utf-8-sig', date_format='%d/%m/%Y')
-    try: excel_data = _convert_df_to_excel(df_export)
-    except: excel_data = None
-    
-    cex1, cex2 = st.columns(2)
-    
-    with cex1: 
-        st.download_button(
-            "💾 Baixar CSV", 
-            data=csv_data, 
-            file_name=f"serie_{variable_clean}.csv", 
-            mime="text/csv", 
-            use_container_width=True, 
-            key=f"btn_csv_{variable_clean}"
+    # Botões de exportação (gerados só sob demanda)
+    export_handler.render_lazy_downloads(
+        df_export, f"serie_{variable_clean}", variable_clean,
+        csv_encoding='utf-8-sig', date_format='%d/%m/%Y'
+    )
+
+def display_diurnal_cycle_chart(df: pd.DataFrame, variable: str, unit: str):
+    """Ciclo diurno composto (média por hora UTC), com o eixo também em horário de Brasília."""
+    if df is None or df.empty or 'hour' not in df.columns:
+        st.warning("Nenhum dado válido encontrado.")
+        return
+
+    variable_name = variable.split(" (")[0]
+    variable_clean = re.sub(r'[^a-zA-Z0-9]', '_', variable).lower()
+    d = df.sort_values('hour')
+    fig = go.Figure(go.Scatter(
+        x=d['hour'], y=d['value'], mode='lines+markers', line=dict(color='#1f77b4', width=2.5),
+        customdata=(d['hour'] - 3) % 24,
+        hovertemplate="%{x:02d} UTC (%{customdata:02d} BRT)<br>%{y:.2f} " + unit + "<extra></extra>"
+    ))
+    fig.update_layout(
+        title=dict(text=f"<b>Ciclo Diurno de {variable}</b>", font=dict(size=20), x=0),
+        plot_bgcolor='white', paper_bgcolor='white', height=450,
+        xaxis=dict(title="Hora (UTC)", tickmode='linear', dtick=3, range=[-0.5, 23.5], showgrid=True, gridcolor='#E5E5E5'),
+        yaxis=dict(title=f"{variable_name} ({unit})", showgrid=True, gridcolor='#E5E5E5'),
+        margin=dict(t=60, l=60, r=30, b=50)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    c1, c2, c3 = st.columns(3)
+    i_max, i_min = d['value'].idxmax(), d['value'].idxmin()
+    c1.metric("Máxima", f"{d.loc[i_max, 'value']:.1f} {unit}", help=f"{int(d.loc[i_max, 'hour']):02d} UTC")
+    c2.metric("Mínima", f"{d.loc[i_min, 'value']:.1f} {unit}", help=f"{int(d.loc[i_min, 'hour']):02d} UTC")
+    c3.metric("Amplitude diurna", f"{d['value'].max() - d['value'].min():.1f} {unit}")
+
+    df_export = d.rename(columns={'hour': 'Hora (UTC)', 'value': f"{variable_name} ({unit})", 'n_hours': 'Nº de horas'})
+    export_handler.render_lazy_downloads(df_export, f"ciclo_diurno_{variable_clean}", f"diurnal_{variable_clean}")
+
+def display_spatial_spread_chart(df: pd.DataFrame, variable: str, unit: str):
+    """
+    Gráfico em leque da distribuição espacial diária dentro da região:
+    faixa mín.–máx., faixa P10–P90, mediana e média.
+    """
+    needed = {'date', 'value', 'min', 'max', 'p10', 'p50', 'p90'}
+    if df is None or df.empty or not needed.issubset(df.columns): return
+
+    variable_name = variable.split(" (")[0]
+    d = df.sort_values('date')
+    large = len(d) > LARGE_SERIES_THRESHOLD
+    if large: d = _downsample_df(d)
+    trace_cls = go.Scattergl if large else go.Scatter
+
+    st.markdown("##### 🌡️ Distribuição Espacial na Região")
+    fig = go.Figure()
+    bands = [("max", "min", "Mín.–Máx.", 'rgba(31,119,180,0.12)'), ("p90", "p10", "P10–P90", 'rgba(31,119,180,0.30)')]
+    for upper, lower, label, color in bands:
+        fig.add_trace(go.Scatter(x=d['date'], y=d[upper], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(
+            x=d['date'], y=d[lower], fill='tonexty', fillcolor=color, line=dict(width=0), name=label,
+            customdata=d[upper], hovertemplate=label + ": %{y:.1f} a %{customdata:.1f} " + unit + "<extra></extra>"
+        ))
+    fig.add_trace(trace_cls(x=d['date'], y=d['p50'], name="Mediana", line=dict(color='#1f77b4', width=1.5, dash='dot'),
+                            hovertemplate="Mediana: %{y:.1f} " + unit + "<extra></extra>"))
+    fig.add_trace(trace_cls(x=d['date'], y=d['value'], name="Média", line=dict(color='#d62728', width=2),
+                            hovertemplate="%{x|%d/%m/%Y}<br>Média: %{y:.1f} " + unit + "<extra></extra>"))
+    fig.update_layout(
+        plot_bgcolor='white', paper_bgcolor='white', height=450, hovermode='x unified',
+        yaxis=dict(title=f"{variable_name} ({unit})", showgrid=True, gridcolor='#E5E5E5'),
+        xaxis=dict(showgrid=True, gridcolor='#E5E5E5'),
+        margin=dict(t=30, l=60, r=30, b=50), legend=dict(orientation="h", y=-0.2)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    if 'count' in d.columns:
+        st.caption(f"Pixels por dia na região: ~{int(d['count'].median())}. A faixa mostra a variação entre os pixels, não a incerteza da média.")
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_aggregation(digest: str, view: str, how: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Agregações da série diária em cache pelo digest dos dados."""
+    if view in series_aggregation.RESAMPLE_RULES:
+        return series_aggregation.resample_series(_df, view, how)
+    if view == "Climatologia (dia do ano)":
+        return series_aggregation.doy_climatology(_df)
+    return series_aggregation.anomalies(_df)
+
+def display_aggregation_views(df: pd.DataFrame, variable: str, unit: str, how: str = "mean"):
+    """
+    Agregações locais da série diária em cache: totais/médias mensais e anuais,
+    climatologia por dia do ano e anomalias em relação a ela.
+    """
+    if df is None or df.empty or 'date' not in df.columns: return
+
+    variable_clean = re.sub(r'[^a-zA-Z0-9]', '_', variable).lower()
+    variable_name = variable.split(" (")[0]
+    with st.expander("🗓️ Agregações, Climatologia e Anomalias", expanded=False):
+        view = st.radio(
+            "Visualização",
+            ["Mensal", "Anual", "Climatologia (dia do ano)", "Anomalias"],
+            horizontal=True, key=f"agg_view_{variable_clean}", label_visibility="collapsed"
         )
-        
-    with cex2: 
-        if excel_data: 
-            st.download_button(
-                "💾 Baixar Excel", 
-                data=excel_data, 
-                file_name=f"serie_{variable_clean}.xlsx", 
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
-                use_container_width=True, 
-                key=f"btn_xlsx_{variable_clean}"
-            )
+        digest = export_handler.dataframe_digest(df[['date', 'value']])
+        agg = _cached_aggregation(digest, view, how, df)
+        if agg.empty:
+            st.info("Dados insuficientes para esta agregação.")
+            return
+
+        fig = go.Figure()
+        if view in series_aggregation.RESAMPLE_RULES:
+            label = "Total" if how == "sum" else "Média"
+            fig.add_trace(go.Bar(
+                x=agg['date'], y=agg['value'], marker_color='#1f77b4', name=label,
+                customdata=agg['n_days'],
+                hovertemplate="%{x|%m/%Y}<br>" + label + ": %{y:.2f} " + unit + "<br>Dias: %{customdata}<extra></extra>"
+            ))
+            y_title = f"{label} {view.lower()} ({unit})"
+        elif view == "Climatologia (dia do ano)":
+            fig.add_trace(go.Scatter(x=agg['doy'], y=agg['p90'], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(x=agg['doy'], y=agg['p10'], fill='tonexty', fillcolor='rgba(31,119,180,0.2)', line=dict(width=0), name="P10–P90"))
+            fig.add_trace(go.Scatter(x=agg['doy'], y=agg['mean'], line=dict(color='#1f77b4', width=2.5), name="Média"))
+            fig.update_xaxes(title="Dia do ano")
+            y_title = f"{variable_name} ({unit})"
+        else:
+            colors = np.where(agg['value'] >= 0, '#d62728', '#1f77b4')
+            trace_cls = go.Scattergl if len(agg) > LARGE_SERIES_THRESHOLD else go.Scatter
+            fig.add_trace(trace_cls(
+                x=agg['date'], y=agg['value'], mode='markers', marker=dict(color=colors, size=4),
+                customdata=agg['z'], name="Anomalia",
+                hovertemplate="%{x|%d/%m/%Y}<br>Anomalia: %{y:.2f} " + unit + "<br>z: %{customdata:.2f}<extra></extra>"
+            ))
+            fig.add_hline(y=0, line_color='black', line_width=1)
+            y_title = f"Anomalia ({unit})"
+            st.caption("Anomalia = valor do dia − climatologia do mesmo dia do ano (média móvel de 15 dias no próprio período).")
+
+        fig.update_layout(
+            plot_bgcolor='white', paper_bgcolor='white', height=420,
+            yaxis=dict(title=y_title, showgrid=True, gridcolor='#E5E5E5'),
+            xaxis=dict(showgrid=True, gridcolor='#E5E5E5'),
+            margin=dict(t=30, l=60, r=30, b=50), legend=dict(orientation="h", y=-0.2)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_events(digests: tuple, rule_json: str, _frames: dict) -> pd.DataFrame:
+    """Eventos em cache pelos digests das séries e pela regra."""
+    return event_detection.detect_events(_frames, json.loads(rule_json))
+
+def display_event_detection(frames: dict, unit: str, key: str):
+    """
+    Detecção de eventos extremos (ondas de calor/frio, dias secos, chuva intensa)
+    para uma ou várias séries diárias de uma vez.
+    """
+    frames = {n: df for n, df in frames.items() if df is not None and not df.empty and 'date' in df.columns}
+    if not frames: return
+
+    with st.expander("🔥 Eventos Extremos (sequências acima/abaixo de limiares)", expanded=False):
+        c1, c2, c3, c4 = st.columns([2.2, 0.8, 1, 1])
+        preset = c1.selectbox("Tipo de evento", list(event_detection.EVENT_PRESETS) + ["Personalizado"], key=f"evt_preset_{key}")
+        if preset == "Personalizado":
+            mode = c2.selectbox("Limiar", ["Valor", "Percentil"], key=f"evt_mode_{key}")
+            op = c2.selectbox("Condição", [">", ">=", "<", "<="], key=f"evt_op_{key}")
+            if mode == "Percentil":
+                value = int(c3.number_input("Percentil", 1, 99, 90, key=f"evt_val_{key}"))
+            else:
+                value = float(c3.number_input(f"Valor ({unit})", value=0.0, key=f"evt_val_{key}"))
+            min_days = int(c4.number_input("Mín. de dias", 1, 60, 3, key=f"evt_min_{key}"))
+            rule = {"mode": "pct" if mode == "Percentil" else "abs", "op": op, "value": value, "min_days": min_days}
+        else:
+            rule = event_detection.EVENT_PRESETS[preset]
+            lim = f"P{rule['value']} da climatologia do dia" if rule["mode"] == "pct" else f"{rule['value']} {unit}"
+            c3.metric("Limiar", lim)
+            c4.metric("Mín. de dias", rule["min_days"])
+
+        digests = tuple(export_handler.dataframe_digest(df[['date', 'value']]) for df in frames.values())
+        events = _cached_events(digests, json.dumps(rule, sort_keys=True), frames)
+        if events.empty:
+            st.info("Nenhum evento encontrado no período com esta regra.")
+            return
+
+        summary = event_detection.summarize_events(events)
+        if len(frames) > 1:
+            st.dataframe(summary, use_container_width=True)
+        else:
+            row = summary.iloc[0]
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Eventos", int(row["eventos"]))
+            m2.metric("Dias em evento", int(row["dias_em_evento"]))
+            m3.metric("Maior duração", f"{int(row['maior_duracao'])} dias")
+
+        table = events.rename(columns={
+            "serie": "Série", "inicio": "Início", "fim": "Fim", "duracao_dias": "Duração (dias)",
+            "pico": f"Pico ({unit})", "media": f"Média ({unit})", "intensidade": f"Intensidade ({unit}·dia)"
+        })
+        if len(frames) == 1: table = table.drop(columns="Série")
+        st.dataframe(
+            table, use_container_width=True, hide_index=True, height=250,
+            column_config={
+                "Início": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                "Fim": st.column_config.DateColumn(format="DD/MM/YYYY"),
+            }
+        )
+        export_handler.render_lazy_downloads(events, f"eventos_{key}", f"evt_{key}", csv_encoding='utf-8-sig', date_format='%d/%m/%Y')
+
+def display_region_comparison(df_long: pd.DataFrame, variable: str, unit: str, resolution: str = "Diária"):
+    """
+    Comparação da mesma variável entre regiões (tabela longa region/date/value):
+    linhas sobrepostas ou pequenos múltiplos, estatísticas e eventos em lote.
+    """
+    if df_long is None or df_long.empty: return
+
+    variable_name = variable.split(" (")[0]
+    n_regions = df_long['region'].nunique()
+    st.markdown("---")
+    st.markdown(f"##### 🗺️ Comparação entre Regiões ({n_regions})")
+    layout = st.radio("Layout", ["Linhas sobrepostas", "Pequenos múltiplos"], horizontal=True, key="region_layout", label_visibility="collapsed")
+
+    large = df_long.groupby('region').size().max() > LARGE_SERIES_THRESHOLD
+    plot_df = df_long
+    if large:
+        plot_df = pd.concat([_downsample_df(g.sort_values('date')) for _, g in df_long.groupby('region', sort=False)], ignore_index=True)
+
+    kwargs = dict(x='date', y='value', color='region', render_mode='webgl' if large else 'auto',
+                  labels={'date': 'Data', 'value': f"{variable_name} ({unit})", 'region': 'Região'})
+    if layout == "Pequenos múltiplos":
+        n_cols = min(3, n_regions)
+        fig = px.line(plot_df, facet_col='region', facet_col_wrap=n_cols, **kwargs)
+        fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
+        fig.update_layout(height=260 * -(-n_regions // n_cols), showlegend=False)
+    else:
+        fig = px.line(plot_df, **kwargs)
+        fig.update_layout(height=500, legend=dict(orientation="h", y=-0.2))
+    fig.update_layout(plot_bgcolor='white', paper_bgcolor='white', margin=dict(t=30, l=60, r=30, b=50))
+    fig.update_xaxes(showgrid=True, gridcolor='#E5E5E5')
+    fig.update_yaxes(showgrid=True, gridcolor='#E5E5E5')
+    st.plotly_chart(fig, use_container_width=True)
+
+    frames = {k: g[['date', 'value']] for k, g in df_long.groupby('region', sort=False)}
+    with st.expander("📐 Estatísticas por Região", expanded=False):
+        st.dataframe(series_statistics.compute_batch_statistics(frames).T, use_container_width=True)
+    if resolution == "Diária":
+        display_event_detection(frames, unit, "regions")
+
+    with st.expander("📄 Tabela (formato longo) e Exportar", expanded=False):
+        st.dataframe(df_long, use_container_width=True, hide_index=True, height=250)
+        export_handler.render_lazy_downloads(df_long, f"regioes_{re.sub(r'[^a-zA-Z0-9]', '_', variable).lower()}", "regions", csv_encoding='utf-8-sig', date_format='%d/%m/%Y')
 
 def display_multiaxis_chart(data_dict):
     """
@@ -285,6 +637,12 @@ def display_multiaxis_chart(data_dict):
         )
     }
 
+    # Séries longas: janela de zoom comum a todas as variáveis
+    frames = [res["time_series_df"] for res in data_dict.values() if 'date' in res["time_series_df"].columns]
+    win = None
+    if any(len(d) > LARGE_SERIES_THRESHOLD for d in frames):
+        win = _zoom_window(min(d['date'].min() for d in frames), max(d['date'].max() for d in frames), "multiaxis")
+
     idx = 0
     for var_name, res in data_dict.items():
         if idx >= 4: break 
@@ -296,13 +654,20 @@ def display_multiaxis_chart(data_dict):
         
         yaxis_name = f"y{idx+1}" if idx > 0 else "y"
         
-        fig.add_trace(go.Scatter(
+        large = len(df) > LARGE_SERIES_THRESHOLD
+        if large:
+            df = df.sort_values('date')
+            if win: df = df[(df['date'] >= win[0]) & (df['date'] < win[1])]
+            df = _downsample_df(df)
+        trace_cls = go.Scattergl if large else go.Scatter
+        
+        fig.add_trace(trace_cls(
             x=df['date'],
             y=df['value'],
             name=f"{var_name} ({unit})",
             yaxis=yaxis_name,
             line=dict(color=colors[idx], width=2.5),
-            mode='lines+markers'
+            mode='lines' if large else 'lines+markers'
         ))
         
         key = f"yaxis{idx+1}" if idx > 0 else "yaxis"
@@ -328,7 +693,13 @@ def display_multiaxis_chart(data_dict):
     
     st.info("💡 **Dica:** Dê um clique na legenda de uma variável para retirar ou retornar.")
 
-
-
-
-
+    # Estatísticas de todas as variáveis num único lote
+    frames = {
+        f"{name} ({res['var_cfg']['unit']})": res["time_series_df"]
+        for name, res in data_dict.items()
+        if res.get("time_series_df") is not None and 'date' in res["time_series_df"].columns
+    }
+    if frames:
+        with st.expander("📐 Estatísticas Comparadas", expanded=False):
+            table = series_statistics.compute_batch_statistics(frames)
+            st.dataframe(table.T, use_container_width=True)
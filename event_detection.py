@@ -0,0 +1,167 @@
+# ==================================================================================
+# event_detection.py
+# ==================================================================================
+"""
+Detecção de eventos extremos em séries diárias (run-length encoding em numpy).
+
+Um "evento" é uma sequência de dias consecutivos em que a condição vale:
+- acima/abaixo de um limiar fixo (ex.: chuva < 1 mm -> dias secos consecutivos);
+- acima/abaixo de um percentil da climatologia local por dia do ano
+  (ex.: Tmax > P90 por 3 dias -> onda de calor).
+
+As séries (várias regiões e/ou variáveis) são alinhadas num calendário diário
+comum e viram uma matriz séries × dias; as sequências de todas saem de um único
+np.diff sobre a máscara, sem laço em Python por dia.
+"""
+import numpy as np
+import pandas as pd
+
+import series_aggregation
+
+# Regras prontas. mode: 'abs' (limiar fixo) ou 'pct' (percentil da climatologia do dia do ano)
+EVENT_PRESETS = {
+    "Onda de calor (> P90 por 3+ dias)": {"mode": "pct", "op": ">", "value": 90, "min_days": 3},
+    "Onda de frio (< P10 por 3+ dias)": {"mode": "pct", "op": "<", "value": 10, "min_days": 3},
+    "Dias secos consecutivos (< 1 mm por 5+ dias)": {"mode": "abs", "op": "<", "value": 1.0, "min_days": 5},
+    "Chuva intensa (≥ 50 mm/dia)": {"mode": "abs", "op": ">=", "value": 50.0, "min_days": 1},
+}
+
+_OPS = {
+    ">": np.greater, ">=": np.greater_equal,
+    "<": np.less, "<=": np.less_equal,
+}
+
+EVENT_COLUMNS = ["serie", "inicio", "fim", "duracao_dias", "pico", "media", "intensidade"]
+
+
+# ------------------------------------------------------------------
+# 1. MATRIZ DIÁRIA COMUM
+# ------------------------------------------------------------------
+
+def _daily_matrix(frames: dict) -> tuple[pd.DatetimeIndex, np.ndarray]:
+    """Alinha as séries num calendário diário contínuo (dias faltantes = NaN)."""
+    cleaned = {}
+    for name, df in frames.items():
+        if df is None or df.empty or 'date' not in df.columns:
+            continue
+        d = df[['date', 'value']].dropna()
+        cleaned[name] = pd.Series(d['value'].to_numpy(dtype=float), index=pd.to_datetime(d['date']).dt.normalize())
+    if not cleaned:
+        return pd.DatetimeIndex([]), np.empty((0, 0))
+
+    start = min(s.index.min() for s in cleaned.values())
+    end = max(s.index.max() for s in cleaned.values())
+    calendar = pd.date_range(start, end, freq="D")
+    mat = np.full((len(frames), calendar.size), np.nan)
+    for i, name in enumerate(frames):
+        s = cleaned.get(name)
+        if s is None:
+            continue
+        s = s[~s.index.duplicated(keep='last')]
+        mat[i, calendar.get_indexer(s.index)] = s.to_numpy()
+    return calendar, mat
+
+
+# ------------------------------------------------------------------
+# 2. LIMIARES E RUN-LENGTH ENCODING
+# ------------------------------------------------------------------
+
+def _threshold_matrix(calendar: pd.DatetimeIndex, mat: np.ndarray, rule: dict) -> np.ndarray:
+    """Limiar por série e por dia (constante ou percentil da climatologia do dia do ano)."""
+    if rule["mode"] == "abs":
+        return np.full(mat.shape, float(rule["value"]))
+
+    pct = rule["value"]
+    doy = series_aggregation._day_of_year(pd.Series(calendar))
+    thr = np.full(mat.shape, np.nan)
+    for i, row in enumerate(mat):
+        ok = np.isfinite(row)
+        if ok.sum() < 365:
+            continue  # menos de um ano: climatologia não representativa
+        clim = series_aggregation.doy_climatology(
+            pd.DataFrame({'date': calendar[ok], 'value': row[ok]}), percentiles=(pct,)
+        )
+        thr[i] = clim[f'p{pct}'].to_numpy()[doy - 1]
+    return thr
+
+def run_lengths(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sequências de True em cada linha de uma máscara 2D.
+    Devolve (linha, início, fim exclusivo) de todas as sequências, em ordem.
+    """
+    mask = np.atleast_2d(mask).astype(np.int8)
+    padded = np.pad(mask, ((0, 0), (1, 1)))
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)  # mesma ordem (linha a linha) que os inícios
+    return rows, starts, ends
+
+
+# ------------------------------------------------------------------
+# 3. INTERFACE PÚBLICA
+# ------------------------------------------------------------------
+
+def detect_events(frames: dict, rule) -> pd.DataFrame:
+    """
+    Eventos para várias séries de uma vez.
+    `frames`: {nome: DataFrame date/value} (regiões, variáveis ou ambos).
+    `rule`: nome de EVENT_PRESETS ou dict {mode, op, value, min_days}.
+    Colunas: serie, inicio, fim, duracao_dias, pico, media, intensidade
+    (soma do excesso além do limiar, em unidade × dia).
+    """
+    if isinstance(rule, str):
+        rule = EVENT_PRESETS[rule]
+    calendar, mat = _daily_matrix(frames)
+    if mat.size == 0:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    thr = _threshold_matrix(calendar, mat, rule)
+    with np.errstate(invalid='ignore'):
+        mask = _OPS[rule["op"]](mat, thr) & np.isfinite(mat) & np.isfinite(thr)
+
+    rows, starts, ends = run_lengths(mask)
+    length = ends - starts
+    keep = length >= int(rule.get("min_days", 1))
+    rows, starts, ends, length = rows[keep], starts[keep], ends[keep], length[keep]
+    if rows.size == 0:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    # Somas por evento via cumsum (sem laço): soma[a:b] = c[b] - c[a]
+    vals = np.where(mask, mat, 0.0)
+    excess = np.where(mask, np.abs(mat - thr), 0.0)
+    csum = np.pad(np.cumsum(vals, axis=1), ((0, 0), (1, 0)))
+    cexc = np.pad(np.cumsum(excess, axis=1), ((0, 0), (1, 0)))
+    total = csum[rows, ends] - csum[rows, starts]
+    intensity = cexc[rows, ends] - cexc[rows, starts]
+
+    # Pico: máximo (ou mínimo, para condições "abaixo") dentro de cada evento
+    pick = np.fmin if rule["op"] in ("<", "<=") else np.fmax
+    fill = np.inf if pick is np.fmin else -np.inf
+    masked = np.append(np.where(mask, mat, fill).ravel(), fill)
+    bounds = np.empty(2 * rows.size, dtype=np.int64)
+    bounds[0::2] = rows * mat.shape[1] + starts
+    bounds[1::2] = rows * mat.shape[1] + ends
+    peak = pick.reduceat(masked, bounds)[0::2]  # índices pares = fatia [início, fim)
+
+    names = np.asarray(list(frames), dtype=object)
+    return pd.DataFrame({
+        "serie": names[rows],
+        "inicio": calendar[starts],
+        "fim": calendar[ends - 1],
+        "duracao_dias": length,
+        "pico": peak,
+        "media": total / length,
+        "intensidade": intensity,
+    })
+
+def summarize_events(events: pd.DataFrame) -> pd.DataFrame:
+    """Resumo por série: nº de eventos, dias em evento, maior duração e pico extremo."""
+    if events.empty:
+        return pd.DataFrame(columns=["eventos", "dias_em_evento", "maior_duracao", "maior_intensidade"])
+    g = events.groupby("serie")
+    return pd.DataFrame({
+        "eventos": g.size(),
+        "dias_em_evento": g["duracao_dias"].sum(),
+        "maior_duracao": g["duracao_dias"].max(),
+        "maior_intensidade": g["intensidade"].max(),
+    })
@@ -0,0 +1,96 @@
+# ==================================================================================
+# export_handler.py
+# ==================================================================================
+"""
+Exportação de tabelas (CSV, Excel e Parquet) sob demanda.
+
+Nada é gerado enquanto o usuário não pede: o arquivo só é montado depois do
+clique em "Preparar arquivo" e fica em cache pelo digest do DataFrame, então
+reruns e tabelas idênticas não pagam a conversão de novo.
+"""
+import io
+import hashlib
+import pandas as pd
+import streamlit as st
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+def dataframe_digest(df: pd.DataFrame) -> str:
+    """Digest do conteúdo (valores, colunas e dtypes) do DataFrame."""
+    h = hashlib.sha1()
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+def _excel_bytes(df: pd.DataFrame, sheet_name: str) -> bytes:
+    """
+    Excel via xlsxwriter (mais rápido que o openpyxl para escrita); sem ele, cai no openpyxl.
+    Sem constant_memory: o pandas grava coluna a coluna e esse modo só aceita linhas
+    em ordem, o que deixaria as células em branco.
+    """
+    buf = io.BytesIO()
+    try:
+        with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
+            df.to_excel(writer, index=False, sheet_name=sheet_name)
+    except ImportError:
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name=sheet_name)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def export_bytes(digest: str, fmt: str, _df: pd.DataFrame, csv_encoding: str = "utf-8", date_format: str = None, sheet_name: str = "Dados") -> bytes:
+    """Converte o DataFrame no formato pedido. Em cache por (digest, formato, opções)."""
+    if fmt == "CSV":
+        return _df.to_csv(index=False, date_format=date_format).encode(csv_encoding)
+    if fmt == "Excel":
+        return _excel_bytes(_df, sheet_name)
+    if fmt == "Parquet":
+        # Parquet/Arrow preserva os dtypes (datas, floats) sem conversão para texto
+        buf = io.BytesIO()
+        _df.to_parquet(buf, index=False)
+        return buf.getvalue()
+    raise ValueError(f"Formato desconhecido: {fmt}")
+
+def render_lazy_downloads(df: pd.DataFrame, filename_prefix: str, key_suffix: str, csv_encoding: str = "utf-8", date_format: str = None):
+    """
+    Seletor de formato + botão "Preparar arquivo". O download só aparece depois
+    do pedido; o pedido fica marcado na sessão pelo (digest, formato).
+    """
+    if df is None or df.empty: return
+
+    c1, c2 = st.columns(2)
+    fmt = c1.selectbox("Formato", list(EXPORT_FORMATS), key=f"fmt_{key_suffix}", label_visibility="collapsed")
+    try:
+        # Colunas com objetos não hasheáveis (listas, dicts) derrubam o hash_pandas_object
+        digest = dataframe_digest(df)
+    except Exception as e:
+        c2.warning(f"⚠️ Não foi possível preparar a exportação: {e}")
+        return
+    req_key = f"export_req_{key_suffix}"
+
+    if st.session_state.get(req_key) != (digest, fmt):
+        if not c2.button("📦 Preparar arquivo", key=f"btn_prep_{key_suffix}", use_container_width=True):
+            return
+        st.session_state[req_key] = (digest, fmt)
+
+    ext, mime = EXPORT_FORMATS[fmt]
+    try:
+        with st.spinner(f"Gerando {fmt}..."):
+            data = export_bytes(digest, fmt, df, csv_encoding, date_format)
+    except Exception as e:
+        c2.warning(f"⚠️ Não foi possível gerar {fmt}: {e}")
+        return
+
+    c2.download_button(
+        f"💾 Baixar {fmt}",
+        data=data,
+        file_name=f"{filename_prefix}.{ext}",
+        mime=mime,
+        use_container_width=True,
+        key=f"btn_{ext}_{key_suffix}"
+    )
@@ -8,9 +8,12 @@ import ee
 import os
 import geobr
 import pandas as pd
+import numpy as np
+import math
 from datetime import date, datetime
 import requests 
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 import shapefile_handler
 
 # --- INICIALIZAÇÃO GEE ---
@@ -527,6 +530,167 @@ def get_era5_image(
     except:
         return None
 
+def get_era5_images_concurrent(
+    variables: list,
+    start_date: date,
+    end_date: date,
+    geometry: ee.Geometry,
+    target_hour: int = None
+) -> dict:
+    """
+    Monta as imagens de várias variáveis em paralelo. Cada get_era5_image faz
+    suas próprias chamadas getInfo; em threads as latências se sobrepõem.
+    """
+    variables = list(dict.fromkeys(variables))
+    if not variables:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(variables)) as ex:
+        futures = {
+            v: ex.submit(get_era5_image, v, start_date, end_date, geometry, target_hour)
+            for v in variables
+        }
+        return {v: f.result() for v, f in futures.items()}
+
+# --- COMPARAÇÃO CALCULADA (SOBREPOSIÇÃO) ---
+COMPARISON_OPS = {
+    "Diferença (B − A)": "diff",
+    "Razão (B / A)": "ratio",
+    "Anomalia Padronizada (zB − zA)": "zanom",
+}
+
+COMPARISON_PALETTE = [
+    '#2166ac', '#4393c3', '#92c5de', '#d1e5f0', '#f7f7f7',
+    '#fddbc7', '#f4a582', '#d6604d', '#b2182b'
+]
+
+def _standardize(img, geometry):
+    """(img - média) / desvio, com as estatísticas da própria região (server-side)."""
+    stats = img.reduceRegion(
+        ee.Reducer.mean().combine(ee.Reducer.stdDev(), sharedInputs=True),
+        geometry,
+        9000,
+        bestEffort=True,
+        maxPixels=1e9
+    )
+    return img.subtract(ee.Number(stats.get('v_mean'))).divide(ee.Number(stats.get('v_stdDev')))
+
+def get_comparison_image(
+    img_a: ee.Image,
+    img_b: ee.Image,
+    op_label: str,
+    geometry: ee.Geometry
+) -> tuple[ee.Image, dict]:
+    """
+    Combina as duas camadas numa única expressão EE (diferença, razão ou
+    anomalia padronizada) e devolve (imagem, vis_params) com escala divergente.
+    """
+    op = COMPARISON_OPS.get(op_label, "diff")
+    a = img_a.select([0]).rename('v')
+    b = img_b.select([0]).rename('v')
+
+    if op == "ratio":
+        comp = b.divide(a.updateMask(a.neq(0)))
+    elif op == "zanom":
+        comp = _standardize(b, geometry).subtract(_standardize(a, geometry))
+    else:
+        comp = b.subtract(a)
+    comp = comp.rename('comparison').clip(geometry).float()
+
+    vis = {"palette": COMPARISON_PALETTE, "caption": op_label}
+    if op == "zanom":
+        vis.update({"min": -3, "max": 3})
+        return comp, vis
+
+    # Uma única ida ao servidor para calibrar a escala de cores
+    try:
+        pct = comp.reduceRegion(
+            ee.Reducer.percentile([2, 98]),
+            geometry,
+            9000,
+            bestEffort=True,
+            maxPixels=1e9
+        ).getInfo()
+        p_lo, p_hi = pct.get('comparison_p2'), pct.get('comparison_p98')
+    except Exception:
+        p_lo, p_hi = None, None
+
+    if op == "ratio":
+        # Centraliza em 1 (sem mudança)
+        span = max(abs((p_hi or 2) - 1), abs(1 - (p_lo or 0)), 0.1)
+        vis.update({"min": round(1 - span, 2), "max": round(1 + span, 2)})
+    else:
+        span = max(abs(p_lo or 0), abs(p_hi or 0)) or 1
+        vis.update({"min": -round(span, 2), "max": round(span, 2)})
+    return comp, vis
+
+# --- CAMPO DE VENTO (GRADE U/V) ---
+WIND_UV_BANDS = ['u_component_of_wind_10m', 'v_component_of_wind_10m']
+WIND_GRID_MAX_PX = 120   # lado máximo da grade baixada (pixels)
+WIND_GRID_MIN_STEP = 0.1 # resolução nativa do ERA5-Land (graus)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_wind_uv_grid(
+    start_date: date,
+    end_date: date,
+    geo_key: str,
+    target_hour: int,
+    _geometry: ee.Geometry
+) -> dict:
+    """
+    Baixa de uma vez a grade média de u/v (m/s) recortada na região, como
+    arrays numpy float32. Pontos fora da geometria ficam NaN.
+    A grade fica em cache: trocar cor ou densidade dos vetores não vai ao servidor.
+    """
+    is_hourly = target_hour is not None
+    collection_id = 'ECMWF/ERA5_LAND/HOURLY' if is_hourly else 'ECMWF/ERA5_LAND/DAILY_AGGR'
+    try:
+        col = (
+            ee.ImageCollection(collection_id)
+            .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+            .select(WIND_UV_BANDS)
+        )
+        if is_hourly:
+            col = col.filter(ee.Filter.calendarRange(target_hour, target_hour, 'hour'))
+
+        inside = ee.Image.constant(1).clip(_geometry).unmask(0).rename('inside')
+        img = col.mean().unmask(0).addBands(inside).float()
+
+        coords = _geometry.bounds().getInfo()['coordinates'][0]
+        lon_min, lat_min = coords[0][0], coords[0][1]
+        lon_max, lat_max = coords[2][0], coords[2][1]
+        span = max(lon_max - lon_min, lat_max - lat_min)
+        step = max(WIND_GRID_MIN_STEP, span / WIND_GRID_MAX_PX)
+        width = max(2, math.ceil((lon_max - lon_min) / step))
+        height = max(2, math.ceil((lat_max - lat_min) / step))
+
+        arr = ee.data.computePixels({
+            'expression': img,
+            'fileFormat': 'NUMPY_NDARRAY',
+            'grid': {
+                'dimensions': {'width': width, 'height': height},
+                'affineTransform': {
+                    'scaleX': step, 'shearX': 0, 'translateX': lon_min,
+                    'shearY': 0, 'scaleY': -step, 'translateY': lat_max
+                },
+                'crsCode': 'EPSG:4326'
+            }
+        })
+    except Exception as e:
+        print(f"Erro grade de vento: {e}")
+        return None
+
+    mask = arr['inside'] > 0
+    u = np.where(mask, arr[WIND_UV_BANDS[0]], np.nan).astype(np.float32)
+    v = np.where(mask, arr[WIND_UV_BANDS[1]], np.nan).astype(np.float32)
+    return {
+        "key": f"{start_date}|{end_date}|{geo_key}|{target_hour}",
+        "lat": (lat_max - (np.arange(height) + 0.5) * step).astype(np.float32),
+        "lon": (lon_min + (np.arange(width) + 0.5) * step).astype(np.float32),
+        "step": step,
+        "u": u,
+        "v": v,
+    }
+
 def get_sampled_data_as_dataframe(
     ee_image: ee.Image,
     geometry: ee.Geometry,
@@ -563,43 +727,84 @@ def get_time_series_data(
 ) -> pd.DataFrame:
     return _get_series_generic(variable, start_date, end_date, geometry)
 
+def _daily_series_collection(variable, start, end):
+    """
+    Coleção diária (DAILY_AGGR) já com a banda de resultado da variável
+    (vento, UR e radiação derivados). Devolve None se não houver imagens.
+    """
+    cfg = ERA5_VARS[variable]
+    col_id = 'ECMWF/ERA5_LAND/DAILY_AGGR'
+    bands = cfg.get('bands', cfg.get('band'))
+    col = (
+        ee.ImageCollection(col_id)
+        .filterDate(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        .select(bands)
+    )
+    if col.size().getInfo() == 0:
+        return None
+    if variable == "Velocidade do Vento (10m)":
+        col = col.map(
+            lambda img: img.addBands(
+                img.select(['u_component_of_wind_10m', 'v_component_of_wind_10m'])
+                .pow(2)
+                .reduce(ee.Reducer.sum())
+                .sqrt()
+                .rename(cfg['result_band'])
+            )
+        )
+    elif variable == "Umidade Relativa (2m)":
+        col = col.map(_calc_rh)
+    elif variable == "Radiação Solar Incidente":
+        col = col.map(lambda img: _calc_rad(img, False))
+    else:
+        col = col.map(lambda img: img.rename(cfg['result_band']))
+    return col
+
+def _to_display_units(values: pd.Series, unit: str) -> pd.Series:
+    """Mesma conversão de unidades do servidor (K -> °C, m -> mm), feita no cliente."""
+    if unit == "°C":
+        return values - 273.15
+    if unit == "mm":
+        return values * 1000
+    return values
+
+# --- ESCALA DE REDUÇÃO ADAPTATIVA À ÁREA ---
+ERA5_LAND_SCALE = 11132       # m (0,1° - resolução nativa do ERA5-Land)
+SERIES_TARGET_PIXELS = 4000   # pixels-alvo por reduceRegion
+SCALE_LEVELS = (-4, 5)        # níveis 2^k × escala nativa (~700 m a ~356 km)
+
+def _adaptive_scale(geom, n_regions=1) -> ee.Number:
+    """
+    Escala (m) para que a região tenha ~SERIES_TARGET_PIXELS pixels, alinhada a um
+    nível da pirâmide (escala nativa × 2^k). Regiões pequenas ganham amostragem
+    mais fina; estados grandes usam um nível mais grosso em vez de serem
+    reescalados silenciosamente pelo bestEffort. Calculada no servidor.
+    """
+    area = ee.Number(geom.area(maxError=1000)).divide(n_regions)
+    raw = area.divide(SERIES_TARGET_PIXELS).sqrt()
+    level = raw.divide(ERA5_LAND_SCALE).log().divide(math.log(2)).round().clamp(*SCALE_LEVELS)
+    return ee.Number(2).pow(level).multiply(ERA5_LAND_SCALE)
+
+def _with_scale(df: pd.DataFrame, scale) -> pd.DataFrame:
+    """Anota no DataFrame a escala efetiva usada na redução (df.attrs['scale_m'])."""
+    df.attrs['scale_m'] = float(scale) if scale is not None else None
+    return df
+
 def _get_series_generic(variable, start, end, geom):
     if variable not in ERA5_VARS:
         return pd.DataFrame()
     cfg = ERA5_VARS[variable]
-    col_id = 'ECMWF/ERA5_LAND/DAILY_AGGR'
-    bands = cfg.get('bands', cfg.get('band'))
     try:
-        col = (
-            ee.ImageCollection(col_id)
-            .filterDate(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
-            .select(bands)
-        )
-        if col.size().getInfo() == 0:
+        col = _daily_series_collection(variable, start, end)
+        if col is None:
             return pd.DataFrame()
-        if variable == "Velocidade do Vento (10m)":
-            col = col.map(
-                lambda img: img.addBands(
-                    img.select(['u_component_of_wind_10m', 'v_component_of_wind_10m'])
-                    .pow(2)
-                    .reduce(ee.Reducer.sum())
-                    .sqrt()
-                    .rename(cfg['result_band'])
-                )
-            )
-        elif variable == "Umidade Relativa (2m)":
-            col = col.map(_calc_rh)
-        elif variable == "Radiação Solar Incidente":
-            col = col.map(lambda img: _calc_rad(img, False))
-        else:
-            col = col.map(lambda img: img.rename(cfg['result_band']))
+        scale = _adaptive_scale(geom)
         
         def ext(img):
             val = img.select(cfg['result_band']).reduceRegion(
                 ee.Reducer.mean(),
                 geom,
-                9000,
-                bestEffort=True,
+                scale,
                 maxPixels=1e9
             ).get(cfg['result_band'])
             val = ee.Number(val)
@@ -610,17 +815,374 @@ def _get_series_generic(variable, start, end, geom):
             return img.set('date', img.date().format('YYYY-MM-dd')).set('value', val)
 
         series = col.map(ext)
-        dates = series.aggregate_array('date').getInfo()
-        vals = series.aggregate_array('value').getInfo()
+        # Datas, valores e escala efetiva numa única ida ao servidor
+        info = ee.Dictionary({
+            'dates': series.aggregate_array('date'),
+            'vals': series.aggregate_array('value'),
+            'scale': scale,
+        }).getInfo()
+        dates, vals = info.get('dates'), info.get('vals')
         if not dates or not vals:
             return pd.DataFrame()
         df = pd.DataFrame({'date': dates, 'value': vals})
         df['date'] = pd.to_datetime(df['date'])
         df['value'] = pd.to_numeric(df['value'], errors='coerce')
-        return df.dropna().sort_values('date')
+        return _with_scale(df.dropna().sort_values('date'), info.get('scale'))
     except:
         return pd.DataFrame()
 
+# --- DISTRIBUIÇÃO ESPACIAL POR DIA (UM REDUCER COMBINADO) ---
+ZONAL_PERCENTILES = [10, 50, 90]
+ZONAL_STATS = ['mean', 'min', 'max'] + [f'p{p}' for p in ZONAL_PERCENTILES] + ['count']
+
+def _zonal_reducer() -> ee.Reducer:
+    """mean + min/max + percentis + count num único reducer (uma passada pelos pixels)."""
+    return (
+        ee.Reducer.mean()
+        .combine(ee.Reducer.minMax(), sharedInputs=True)
+        .combine(ee.Reducer.percentile(ZONAL_PERCENTILES), sharedInputs=True)
+        .combine(ee.Reducer.count(), sharedInputs=True)
+    )
+
+def get_zonal_distribution_series(variable, start, end, geom) -> pd.DataFrame:
+    """
+    Série diária com a distribuição espacial dentro da região: média, mín., máx.,
+    P10/P50/P90 e nº de pixels, todos no mesmo reduceRegion por dia e numa
+    única ida ao servidor. 'value' é a média (compatível com os gráficos padrão).
+    """
+    if variable not in ERA5_VARS:
+        return pd.DataFrame()
+    cfg = ERA5_VARS[variable]
+    band = cfg['result_band']
+    try:
+        col = _daily_series_collection(variable, start, end)
+        if col is None:
+            return pd.DataFrame()
+        reducer = _zonal_reducer()
+        scale = _adaptive_scale(geom)
+
+        def ext(img):
+            stats = img.select(band).reduceRegion(
+                reducer,
+                geom,
+                scale,
+                maxPixels=1e9
+            )
+            props = {s: stats.get(f'{band}_{s}') for s in ZONAL_STATS}
+            props['date'] = img.date().format('YYYY-MM-dd')
+            return ee.Feature(None, props)
+
+        fc = ee.FeatureCollection(col.map(ext)).filter(ee.Filter.notNull(['mean']))
+        cols = ['date'] + ZONAL_STATS
+        info = ee.Dictionary({
+            'rows': fc.reduceColumns(ee.Reducer.toList(len(cols)), cols).get('list'),
+            'scale': scale,
+        }).getInfo()
+        rows = info.get('rows')
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows, columns=cols)
+        df['date'] = pd.to_datetime(df['date'])
+        for c in ZONAL_STATS:
+            df[c] = pd.to_numeric(df[c], errors='coerce')
+            if c != 'count':
+                df[c] = _to_display_units(df[c], cfg['unit'])
+        df = df.rename(columns={'mean': 'value'})
+        return _with_scale(df.dropna(subset=['value']).sort_values('date').reset_index(drop=True), info.get('scale'))
+    except Exception as e:
+        print(f"Erro distribuição espacial: {e}")
+        return pd.DataFrame()
+
+# --- SÉRIES AGREGADAS NO SERVIDOR (MENSAL / ANUAL) ---
+AGGREGATION_FREQS = {"Mensal": "month", "Anual": "year"}
+
+def get_aggregated_series(variable, start, end, geom, freq: str = "Mensal") -> pd.DataFrame:
+    """
+    Totais (precipitação) ou médias mensais/anuais agregados no servidor:
+    um reduce por período e uma única ida ao servidor, em vez de baixar a série diária.
+    Colunas: date (início do período), value, n_days.
+    """
+    if variable not in ERA5_VARS or freq not in AGGREGATION_FREQS:
+        return pd.DataFrame()
+    cfg = ERA5_VARS[variable]
+    unit_step = AGGREGATION_FREQS[freq]
+    band = cfg['result_band']
+    try:
+        col = _daily_series_collection(variable, start, end)
+        if col is None:
+            return pd.DataFrame()
+        col = col.select(band)
+        scale = _adaptive_scale(geom)
+
+        starts = pd.date_range(
+            pd.Timestamp(start).to_period('M' if unit_step == "month" else 'Y').start_time,
+            pd.Timestamp(end),
+            freq='MS' if unit_step == "month" else 'YS'
+        )
+        t_start = ee.Date(start.strftime('%Y-%m-%d'))
+        t_end = ee.Date(end.strftime('%Y-%m-%d'))
+
+        def per_period(t0):
+            t0 = ee.Date(t0)
+            t1 = t0.advance(1, unit_step)
+            sub = col.filterDate(
+                ee.Date(ee.Algorithms.If(t0.millis().lt(t_start.millis()), t_start, t0)),
+                ee.Date(ee.Algorithms.If(t1.millis().gt(t_end.millis()), t_end, t1))
+            )
+            img = sub.sum() if cfg['aggregation'] == 'sum' else sub.mean()
+            val = img.reduceRegion(
+                ee.Reducer.mean(),
+                geom,
+                scale,
+                maxPixels=1e9
+            ).get(band)
+            return ee.Feature(None, {'date': t0.format('YYYY-MM-dd'), 'value': val, 'n_days': sub.size()})
+
+        periods = ee.List([d.strftime('%Y-%m-%d') for d in starts])
+        fc = ee.FeatureCollection(periods.map(per_period)).filter(ee.Filter.gt('n_days', 0))
+        info = ee.Dictionary({
+            'rows': fc.reduceColumns(ee.Reducer.toList(3), ['date', 'value', 'n_days']).get('list'),
+            'scale': scale,
+        }).getInfo()
+        rows = info.get('rows')
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows, columns=['date', 'value', 'n_days'])
+        df['date'] = pd.to_datetime(df['date'])
+        df['value'] = _to_display_units(pd.to_numeric(df['value'], errors='coerce'), cfg['unit'])
+        return _with_scale(df.dropna().sort_values('date'), info.get('scale'))
+    except Exception as e:
+        print(f"Erro série agregada: {e}")
+        return pd.DataFrame()
+
+# --- SÉRIES MULTI-REGIÃO (UM reduceRegions POR IMAGEM) ---
+REGION_SIMPLIFY_DEG = 0.005  # simplificação das geometrias enviadas ao servidor (~500 m)
+
+def _split_uf(val: str) -> str:
+    """'Minas Gerais - MG' -> 'MG'."""
+    return val.split(' - ')[-1] if ' - ' in val else val
+
+def selected_region_label(session_state) -> str:
+    """Rótulo da região selecionada na série multi-região (UF para Estado, nome para Município)."""
+    if session_state.get('tipo_localizacao') == "Estado":
+        return _split_uf(session_state.get('estado', ''))
+    return session_state.get('municipio', '')
+
+def get_regions_feature_collection(session_state, extras: list, include_selected: bool = True) -> tuple[ee.FeatureCollection, list]:
+    """
+    FeatureCollection com a região selecionada + as regiões de comparação
+    (estados ou municípios da mesma UF), cada uma com a propriedade 'region'.
+    Devolve (fc, rótulos na ordem: selecionada primeiro).
+    include_selected=False: só as regiões de comparação (a selecionada segue pela
+    geometria exata em get_time_series_data; aqui as geometrias são simplificadas).
+    """
+    tipo = session_state.get('tipo_localizacao', 'Estado')
+    atual = selected_region_label(session_state)
+    try:
+        if tipo == "Estado":
+            ufs = [atual] + [_split_uf(v) for v in extras]
+            gdf = _load_all_states_gdf()
+            if gdf is None:
+                return None, []
+            sel = gdf[gdf['abbrev_state'].isin(ufs)].set_index('abbrev_state')
+            labels = [uf for uf in dict.fromkeys(ufs) if uf in sel.index]
+        elif tipo == "Município":
+            uf = _split_uf(session_state.get('estado', ''))
+            gdf = _load_municipalities_gdf(uf)
+            if gdf is None:
+                return None, []
+            nomes = [atual] + list(extras)
+            gdf = gdf.assign(name_norm=gdf['name_muni'].apply(normalize_text))
+            gdf = gdf.drop_duplicates('name_norm').set_index('name_norm')
+            labels, keys = [], []
+            for nome in dict.fromkeys(nomes):
+                k = normalize_text(nome)
+                if k in gdf.index:
+                    labels.append(nome)
+                    keys.append(k)
+            sel = gdf.loc[keys]
+            sel.index = labels
+        else:
+            return None, []
+
+        if not labels or labels[0] != atual:
+            # Sem a selecionada na frente os rótulos não batem com a série principal
+            print(f"Erro regiões de comparação: região selecionada '{atual}' não encontrada")
+            return None, []
+        if not include_selected:
+            labels = labels[1:]
+            if not labels:
+                return None, []
+        if not labels:
+            return None, []
+        geoms = sel.loc[labels].geometry.simplify(REGION_SIMPLIFY_DEG, preserve_topology=True)
+        feats = [
+            ee.Feature(ee.Geometry(g.__geo_interface__, proj='EPSG:4326', geodesic=False), {'region': label})
+            for label, g in zip(labels, geoms)
+        ]
+        return ee.FeatureCollection(feats), labels
+    except Exception as e:
+        print(f"Erro regiões de comparação: {e}")
+        return None, []
+
+def get_multi_region_series(variable, start, end, regions: ee.FeatureCollection) -> pd.DataFrame:
+    """
+    Série diária de várias regiões de uma vez: um reduceRegions por imagem
+    (todas as regiões no mesmo pedido) e uma única ida ao servidor.
+    Formato longo: region, date, value.
+    """
+    if variable not in ERA5_VARS or regions is None:
+        return pd.DataFrame()
+    cfg = ERA5_VARS[variable]
+    band = cfg['result_band']
+    try:
+        col = _daily_series_collection(variable, start, end)
+        if col is None:
+            return pd.DataFrame()
+        # Escala comum: área média das regiões
+        scale = _adaptive_scale(regions.geometry(maxError=1000), regions.size())
+
+        def per_image(img):
+            d = img.date().format('YYYY-MM-dd')
+            stats = img.select(band).reduceRegions(
+                collection=regions,
+                reducer=ee.Reducer.mean(),
+                scale=scale,
+                tileScale=2
+            )
+            return stats.map(lambda f: ee.Feature(None, {'region': f.get('region'), 'date': d, 'value': f.get('mean')}))
+
+        fc = col.map(per_image).flatten().filter(ee.Filter.notNull(['value']))
+        info = ee.Dictionary({
+            'rows': fc.reduceColumns(ee.Reducer.toList(3), ['region', 'date', 'value']).get('list'),
+            'scale': scale,
+        }).getInfo()
+        rows = info.get('rows')
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows, columns=['region', 'date', 'value'])
+        df['date'] = pd.to_datetime(df['date'])
+        df['value'] = _to_display_units(pd.to_numeric(df['value'], errors='coerce'), cfg['unit'])
+        return _with_scale(df.dropna().sort_values(['region', 'date']).reset_index(drop=True), info.get('scale'))
+    except Exception as e:
+        print(f"Erro série multi-região: {e}")
+        return pd.DataFrame()
+
+# --- SÉRIES HORÁRIAS E CICLO DIURNO (ERA5-LAND HOURLY) ---
+HOURLY_COLLECTION = 'ECMWF/ERA5_LAND/HOURLY'
+HOURLY_CHUNK_DAYS = 7      # uma consulta por semana (168 imagens)
+HOURLY_MAX_DAYS = 366      # limite da série horária completa
+HOURLY_MAX_WORKERS = 4
+# Bandas horárias "desacumuladas" (as originais acumulam desde 00 UTC)
+HOURLY_BANDS = {
+    "Precipitação Total": "total_precipitation_hourly",
+    "Radiação Solar Incidente": "surface_solar_radiation_downwards_hourly",
+}
+
+def _hourly_series_collection(variable, start, end):
+    """Coleção horária com a banda de resultado da variável (mesmos derivados da diária)."""
+    cfg = ERA5_VARS[variable]
+    band = cfg['result_band']
+    col = ee.ImageCollection(HOURLY_COLLECTION).filterDate(
+        pd.Timestamp(start).strftime('%Y-%m-%d'), pd.Timestamp(end).strftime('%Y-%m-%d')
+    )
+    if variable == "Velocidade do Vento (10m)":
+        return col.map(
+            lambda img: ee.Image(
+                img.select(['u_component_of_wind_10m', 'v_component_of_wind_10m'])
+                .pow(2).reduce(ee.Reducer.sum()).sqrt().rename(band)
+                .copyProperties(img, ['system:time_start'])
+            )
+        )
+    if variable == "Umidade Relativa (2m)":
+        return col.map(lambda img: _calc_rh(img).select(band))
+    if variable == "Radiação Solar Incidente":
+        return col.map(
+            lambda img: ee.Image(
+                img.select(HOURLY_BANDS[variable]).divide(3600).rename(band)
+                .copyProperties(img, ['system:time_start'])
+            )
+        )
+    return col.select([HOURLY_BANDS.get(variable, cfg.get('band'))], [band])
+
+def _hourly_chunk(variable, t0, t1, geom, scale) -> list:
+    """Uma semana de valores horários (uma ida ao servidor)."""
+    band = ERA5_VARS[variable]['result_band']
+    col = _hourly_series_collection(variable, t0, t1)
+
+    def ext(img):
+        val = img.reduceRegion(ee.Reducer.mean(), geom, scale, maxPixels=1e9).get(band)
+        return ee.Feature(None, {'time': img.date().format('YYYY-MM-dd HH:mm'), 'value': val})
+
+    fc = ee.FeatureCollection(col.map(ext)).filter(ee.Filter.notNull(['value']))
+    return fc.reduceColumns(ee.Reducer.toList(2), ['time', 'value']).get('list').getInfo() or []
+
+def get_hourly_series(variable, start, end, geom) -> pd.DataFrame:
+    """
+    Série horária (UTC) em blocos semanais buscados em paralelo; cada bloco
+    traz ~168 valores, em vez de uma única lista enorme via aggregate_array.
+    Colunas: date (data e hora UTC), value.
+    """
+    if variable not in ERA5_VARS:
+        return pd.DataFrame()
+    cfg = ERA5_VARS[variable]
+    t_start = pd.Timestamp(start)
+    t_end = min(pd.Timestamp(end), t_start + pd.Timedelta(days=HOURLY_MAX_DAYS))
+    try:
+        scale_obj = _adaptive_scale(geom)
+        scale = scale_obj.getInfo()
+        bounds = list(pd.date_range(t_start, t_end, freq=f'{HOURLY_CHUNK_DAYS}D')) + [t_end]
+        chunks = [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if a < b]
+        with ThreadPoolExecutor(max_workers=HOURLY_MAX_WORKERS) as pool:
+            parts = list(pool.map(lambda ab: _hourly_chunk(variable, ab[0], ab[1], geom, scale), chunks))
+        rows = [r for part in parts for r in part]
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows, columns=['date', 'value'])
+        df['date'] = pd.to_datetime(df['date'])
+        df['value'] = _to_display_units(pd.to_numeric(df['value'], errors='coerce'), cfg['unit'])
+        df = df.dropna().drop_duplicates('date').sort_values('date').reset_index(drop=True)
+        df.attrs['truncated'] = t_end < pd.Timestamp(end)
+        return _with_scale(df, scale)
+    except Exception as e:
+        print(f"Erro série horária: {e}")
+        return pd.DataFrame()
+
+def get_diurnal_cycle(variable, start, end, geom) -> pd.DataFrame:
+    """
+    Ciclo diurno composto: média por hora UTC no período, calculada no servidor
+    (24 valores na resposta, qualquer que seja o tamanho do período).
+    Colunas: hour, value, n_hours.
+    """
+    if variable not in ERA5_VARS:
+        return pd.DataFrame()
+    cfg = ERA5_VARS[variable]
+    band = cfg['result_band']
+    try:
+        col = _hourly_series_collection(variable, start, end)
+        scale = _adaptive_scale(geom)
+
+        def per_hour(h):
+            sub = col.filter(ee.Filter.calendarRange(h, h, 'hour'))
+            val = sub.mean().reduceRegion(ee.Reducer.mean(), geom, scale, maxPixels=1e9).get(band)
+            return ee.Feature(None, {'hour': h, 'value': val, 'n_hours': sub.size()})
+
+        fc = ee.FeatureCollection(ee.List.sequence(0, 23).map(per_hour)).filter(ee.Filter.gt('n_hours', 0))
+        info = ee.Dictionary({
+            'rows': fc.reduceColumns(ee.Reducer.toList(3), ['hour', 'value', 'n_hours']).get('list'),
+            'scale': scale,
+        }).getInfo()
+        rows = info.get('rows')
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows, columns=['hour', 'value', 'n_hours'])
+        df['hour'] = df['hour'].astype(int)
+        df['value'] = _to_display_units(pd.to_numeric(df['value'], errors='coerce'), cfg['unit'])
+        return _with_scale(df.dropna().sort_values('hour').reset_index(drop=True), info.get('scale'))
+    except Exception as e:
+        print(f"Erro ciclo diurno: {e}")
+        return pd.DataFrame()
+
 def obter_vis_params_interativo(variavel: str):
     if variavel not in ERA5_VARS:
         return {}
@@ -35,8 +35,9 @@ import gee_handler
 import map_visualizer
 import charts_visualizer
 import utils
+import export_handler
+import series_aggregation
 import base64 
-import io
 import pandas as pd
 import time
 import folium
@@ -170,16 +171,26 @@ def render_map_tips():
         """)
 
 def render_download_buttons(df, filename_prefix, key_suffix):
-    if df is None or df.empty: return
-    try: df_export = df.astype(str)
-    except: df_export = df
-    csv = df_export.to_csv(index=False).encode('utf-8')
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer: df_export.to_excel(writer, index=False)
-    excel_data = buffer.getvalue()
+    # Exportação sob demanda, mantendo os dtypes originais (sem astype(str))
+    export_handler.render_lazy_downloads(df, filename_prefix, key_suffix)
+
+def render_wind_field_controls(results, tipo_mapa):
+    """Controles do campo de vento. Devolve (grade u/v ou None, densidade, estilo)."""
+    if st.session_state.get("variavel") != "Velocidade do Vento (10m)" or "period" not in results:
+        return None, 20, "Setas"
+    if not st.toggle("🧭 Mostrar direção (campo de vento)", value=False, key="wind_field_on"):
+        return None, 20, "Setas"
     c1, c2 = st.columns(2)
-    c1.download_button("💾 Baixar CSV", csv, f"{filename_prefix}.csv", "text/csv", key=f"btn_csv_{key_suffix}", use_container_width=True)
-    c2.download_button("💾 Baixar Excel", excel_data, f"{filename_prefix}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key=f"btn_xlsx_{key_suffix}", use_container_width=True)
+    density = c1.slider("Densidade dos vetores", 8, 40, 20, 2, key="wind_density")
+    style = "Setas"
+    if tipo_mapa != "Interativo":
+        style = c2.radio("Estilo", ["Setas", "Linhas de Corrente"], horizontal=True, key="wind_style")
+    p = results["period"]
+    with st.spinner("Baixando grade de vento..."):
+        grid = gee_handler.get_wind_uv_grid(p["start"], p["end"], p["geo_key"], p["hour"], results["geometry"])
+    if grid is None:
+        st.warning("Não foi possível obter a grade de vento.")
+    return grid, density, style
 
 def get_geo_caching_key(session_state):
     loc_type = session_state.get('tipo_localizacao')
@@ -212,14 +223,55 @@ def run_analysis_logic(variavel, start_date, end_date, geo_caching_key, aba):
         ee_image = gee_handler.get_era5_image(variavel, start_date, end_date, geometry, target_hour)
         if ee_image:
             results["ee_image"] = ee_image
+            # Parâmetros guardados para buscar a grade u/v sob demanda (campo de vento)
+            results["period"] = {"start": start_date, "end": end_date, "hour": target_hour, "geo_key": geo_caching_key}
             # Gera dados para tabela (Mapas/Shapefile)
             if aba in ["Mapas", "Shapefile"]:
                 df_map_samples = gee_handler.get_sampled_data_as_dataframe(ee_image, geometry, variavel)
                 if df_map_samples is not None: results["map_dataframe"] = df_map_samples
             
     elif aba in ["Séries Temporais", "Múltiplas Séries"]:
-        df = gee_handler.get_time_series_data(variavel, start_date, end_date, geometry)
+        resolucao = st.session_state.get('serie_resolucao', 'Diária')
+        extras = (st.session_state.get('regioes_comparacao') or []) if aba == "Séries Temporais" else []
+        regions, labels = (None, [])
+        if extras and resolucao not in ["Diária", "Mensal", "Anual"]:
+            # Aviso guardado nos resultados: aparece junto do gráfico, não só no rerun do cálculo
+            results["region_notice"] = f"ℹ️ A comparação entre regiões não está disponível na resolução '{resolucao}'; exibindo só a região selecionada."
+        elif extras and st.session_state.get('tipo_localizacao') in ["Estado", "Município"]:
+            # Só as regiões extras vão no FeatureCollection simplificado; a selecionada
+            # continua no caminho normal, sobre a geometria exata
+            regions, labels = gee_handler.get_regions_feature_collection(st.session_state, extras, include_selected=False)
+            if regions is None:
+                results["region_notice"] = "⚠️ Não foi possível montar as regiões de comparação; exibindo só a região selecionada."
+        if resolucao in gee_handler.AGGREGATION_FREQS:
+            # Agregação mensal/anual feita no servidor (um reduce por período)
+            df = gee_handler.get_aggregated_series(variavel, start_date, end_date, geometry, resolucao)
+        elif resolucao == "Horária":
+            # ERA5-Land horário em blocos semanais paralelos
+            df = gee_handler.get_hourly_series(variavel, start_date, end_date, geometry)
+        elif resolucao == "Ciclo Diurno":
+            # Média por hora UTC calculada no servidor (24 valores)
+            df = gee_handler.get_diurnal_cycle(variavel, start_date, end_date, geometry)
+        elif aba == "Séries Temporais" and st.session_state.get('serie_distribuicao'):
+            # Média + mín./máx. + percentis espaciais no mesmo reduceRegion
+            df = gee_handler.get_zonal_distribution_series(variavel, start_date, end_date, geometry)
+        else:
+            df = gee_handler.get_time_series_data(variavel, start_date, end_date, geometry)
         if df is not None: results["time_series_df"] = df
+        if regions is not None:
+            # Todas as regiões extras num único reduceRegions por imagem
+            df_long = gee_handler.get_multi_region_series(variavel, start_date, end_date, regions)
+            # Escala comum das regiões extras (a da selecionada vem de df, logo abaixo)
+            results["region_scale_m"] = df_long.attrs.get('scale_m')
+            if not df_long.empty and resolucao in gee_handler.AGGREGATION_FREQS:
+                df_long = series_aggregation.resample_long(df_long, resolucao, var_cfg["aggregation"])
+            main_label = gee_handler.selected_region_label(st.session_state)
+            parts = [df_long[['region', 'date', 'value']]] if not df_long.empty else []
+            if df is not None and not df.empty:
+                parts.insert(0, df[['date', 'value']].assign(region=main_label)[['region', 'date', 'value']])
+            results["region_series_df"] = pd.concat(parts, ignore_index=True) if parts else df_long
+        results["resolution"] = resolucao
+        results["scale_m"] = df.attrs.get('scale_m') if df is not None else None
 
     return results
 
@@ -234,10 +286,30 @@ def run_full_analysis():
             with st.spinner("Gerando Skew-T..."):
                 df = skewt_handler.get_vertical_profile_data(lat, lon, date, hour)
                 st.session_state.skewt_results = {"df": df, "params": (lat, lon, date, hour)}
+                # Dia inteiro (mesmo bloco em cache) para o corte tempo-altura
+                if df is not None:
+                    st.session_state.skewt_results["day"] = skewt_handler.get_day_section(lat, lon, date)
+                # Comparação em lote (outros pontos e/ou dias consecutivos)
+                extras = skewt_handler.parse_points_text(st.session_state.get("skew_extra_points", ""))
+                n_days = int(st.session_state.get("skew_n_days", 1))
+                if extras or n_days > 1:
+                    points = (("Ponto principal", lat, lon),) + extras
+                    st.session_state.skewt_results["batch"] = skewt_handler.get_profiles_batch(
+                        points, date, date + timedelta(days=n_days - 1), hours=(int(hour),)
+                    )
+                # Composição de muitos dias (mesma hora), com filtro opcional de meses
+                if st.session_state.get("skew_composite"):
+                    months = tuple(utils.MESES_PARA_NUMEROS[m] for m in st.session_state.get("skew_comp_months", []))
+                    try:
+                        st.session_state.skewt_results["composite"] = skewt_handler.get_composite_profiles(
+                            lat, lon, st.session_state.get("skew_comp_start"), st.session_state.get("skew_comp_end"), int(hour), months or None
+                        )
+                    except ValueError as e:
+                        st.session_state.skewt_results["composite"] = {"errors": [f"composição não gerada: {e}"]}
         except Exception as e:
             st.session_state.skewt_results = None
             st.warning("⚠️ Erro na conexão.")
-            with st.expander("ℹ️ Detalhes (Erro 429)"): st.info("O serviço bloqueou a conexão. Aguarde 1 min.")
+            with st.expander("ℹ️ Detalhes"): st.info(f"{e}")
         return
     
     # SOBREPOSIÇÃO
@@ -249,11 +321,21 @@ def run_full_analysis():
             start_date, end_date = d, d + timedelta(days=1) if d else None
         else: start_date, end_date = utils.get_date_range(tipo_per, st.session_state)
         if not (start_date and end_date): return
-        geo_key = get_geo_caching_key(st.session_state)
+        target_hour = st.session_state.get('hora_especifica') if tipo_per == "Horário Específico" else None
         with st.spinner("Gerando camadas..."):
-            res1 = run_analysis_logic(v1, start_date, end_date, geo_key, aba)
-            res2 = run_analysis_logic(v2, start_date, end_date, geo_key, aba)
-            if res1 and res2: st.session_state.analysis_results = {"mode": "overlay", "layer1": {"res": res1, "name": v1}, "layer2": {"res": res2, "name": v2}}
+            geometry, feature = gee_handler.get_area_of_interest_geometry(st.session_state)
+            if not geometry: return
+            # As duas camadas são montadas em paralelo (antes era uma após a outra)
+            imgs = gee_handler.get_era5_images_concurrent([v1, v2], start_date, end_date, geometry, target_hour)
+            if imgs.get(v1) is None or imgs.get(v2) is None: return
+            res1 = {"geometry": geometry, "feature": feature, "var_cfg": gee_handler.ERA5_VARS[v1], "ee_image": imgs[v1]}
+            res2 = {"geometry": geometry, "feature": feature, "var_cfg": gee_handler.ERA5_VARS[v2], "ee_image": imgs[v2]}
+            results = {"mode": "overlay", "layer1": {"res": res1, "name": v1}, "layer2": {"res": res2, "name": v2}}
+            if st.session_state.get('overlay_mode') == "Comparação Calculada":
+                op = st.session_state.get('overlay_op', next(iter(gee_handler.COMPARISON_OPS)))
+                comp_img, comp_vis = gee_handler.get_comparison_image(imgs[v1], imgs[v2], op, geometry)
+                results["comparison"] = {"ee_image": comp_img, "vis": comp_vis, "op": op}
+            st.session_state.analysis_results = results
         return
 
     # MÚLTIPLOS
@@ -303,6 +385,8 @@ def render_analysis_results():
                 **Por que isso acontece aqui?**
                 O **Open-Meteo** (nossa fonte de dados) é um serviço gratuito e compartilhado com o mundo todo. Para garantir que ele não saia do ar, ele bloqueia temporariamente quem faz muitos pedidos em poucos segundos.
 
+                O aplicativo já organiza os pedidos numa fila e tenta de novo automaticamente quando o serviço pede uma pausa. Só quando a espera passa de 1 minuto aparece o aviso de muitas consultas.
+
                 **🛠️ Como resolver:**
                 1. **Pare de clicar em Gerar Skew-T.** Insistir vai apenas reiniciar o tempo de bloqueio.
                 2. Aguarde cerca de **1 minuto**.
@@ -401,13 +485,29 @@ def render_analysis_results():
                         
                         # Botões de Download
                         st.markdown("##### 📥 Baixar Tabela")
-                        render_download_buttons(df_display, "sondagem_skewt", "sk")
+                        render_download_buttons(df_tab, "sondagem_skewt", "sk")
                         
                     except Exception as e:
                         st.warning(f"Não foi possível formatar a tabela perfeitamente: {e}")
                         # Fallback: mostra como estava antes se der erro
-                        st.dataframe(res["df"].astype(str), use_container_width=True)
-                        render_download_buttons(res["df"].astype(str), "sondagem_skewt", "sk")
+                        df_fallback = res["df"].astype(str)
+                        st.dataframe(df_fallback, use_container_width=True)
+                        render_download_buttons(df_fallback, "sondagem_skewt", "sk")
+
+                with st.expander("##### 🕒 Evolução ao Longo do Dia (corte tempo-altura e índices)", expanded=False):
+                    skewt_visualizer.render_day_section(res.get("day"), res["params"][3])
+
+            batch = res.get("batch")
+            if batch is not None:
+                skewt_visualizer.render_profile_comparison(batch)
+                with st.expander("##### 📊 Tabela das Sondagens Comparadas (ponto, horário, pressão)", expanded=False):
+                    df_batch = batch.reset_index()
+                    st.dataframe(df_batch, use_container_width=True, hide_index=True, height=250)
+                    render_download_buttons(df_batch, "sondagens_lote", "sk_batch")
+
+            composite = res.get("composite")
+            if composite is not None:
+                skewt_visualizer.render_composite(composite, res["params"][0], res["params"][1], res["params"][3])
         return
     if "analysis_results" not in st.session_state or st.session_state.analysis_results is None: return
     results = st.session_state.analysis_results
@@ -460,6 +560,12 @@ def render_analysis_results():
         st.subheader("Mapa de Sobreposição")
         ui.renderizar_resumo_selecao()
         mode = st.session_state.get('overlay_mode', "Transparência")
+        if mode == "Comparação Calculada" and "comparison" in results:
+            comp = results["comparison"]
+            v1, v2 = results["layer1"]["name"], results["layer2"]["name"]
+            st.caption(f"**A:** {v1} | **B:** {v2} | **Operação:** {comp['op']}")
+            map_visualizer.create_interactive_map(comp["ee_image"], results["layer1"]["res"]["feature"], comp["vis"], comp["op"])
+            return
         map_visualizer.create_overlay_map(
             results["layer1"]["res"]["ee_image"], results["layer1"]["name"], 
             results["layer2"]["res"]["ee_image"], results["layer2"]["name"], 
@@ -540,6 +646,7 @@ def render_analysis_results():
         if "ee_image" in results:
             vis = gee_handler.obter_vis_params_interativo(st.session_state.variavel)
             tipo_mapa = st.session_state.get("map_type", "Interativo")
+            wind_grid, wind_density, wind_style = render_wind_field_controls(results, tipo_mapa)
             
             # --- MODO INTERATIVO ---
             if tipo_mapa == "Interativo":
@@ -548,7 +655,7 @@ def render_analysis_results():
                 if aba == "Shapefile":
                     st.markdown("#### 🎚️ Ajuste de Transparência")
                     opa = st.slider("Opacidade", 0.0, 1.0, 0.7, 0.1, key='shp_opacity')
-                map_visualizer.create_interactive_map(results["ee_image"], results["feature"], vis, var_cfg["unit"], opacity=opa)
+                map_visualizer.create_interactive_map(results["ee_image"], results["feature"], vis, var_cfg["unit"], opacity=opa, wind_grid=wind_grid, wind_density=wind_density)
 
             # --- MODO ESTÁTICO (COM TÍTULO COMPLETO) ---
             else:
@@ -579,6 +686,13 @@ def render_analysis_results():
                     if final_png: c1.download_button("💾 Baixar PNG", final_png, "mapa.png", "image/png", use_container_width=True)
                     if final_jpg: c2.download_button("💾 Baixar JPG", final_jpg, "mapa.jpeg", "image/jpeg", use_container_width=True)
 
+                if wind_grid is not None:
+                    wind_png = map_visualizer.create_static_wind_map(wind_grid, vis, wind_density, wind_style, titulo_completo)
+                    if wind_png:
+                        st.markdown("##### 🧭 Campo de Vento")
+                        st.image(wind_png, use_column_width=800)
+                        st.download_button("💾 Baixar Campo de Vento (PNG)", wind_png, "campo_vento.png", "image/png", use_container_width=True)
+
             # --- DADOS E TABELA ---
             if "map_dataframe" in results and not results["map_dataframe"].empty:
                 st.markdown("---")
@@ -591,7 +705,25 @@ def render_analysis_results():
     elif aba == "Séries Temporais":
         if "time_series_df" in results:
             render_chart_tips()
-            charts_visualizer.display_time_series_chart(results["time_series_df"], st.session_state.variavel, var_cfg["unit"], show_help=False)
+            if results.get("resolution") == "Ciclo Diurno":
+                charts_visualizer.display_diurnal_cycle_chart(results["time_series_df"], st.session_state.variavel, var_cfg["unit"])
+            else:
+                charts_visualizer.display_time_series_chart(results["time_series_df"], st.session_state.variavel, var_cfg["unit"], show_help=False)
+            if results["time_series_df"].attrs.get('truncated'):
+                st.warning(f"⚠️ A série horária foi limitada aos primeiros {gee_handler.HOURLY_MAX_DAYS} dias do período.")
+            if results.get("scale_m"):
+                st.caption(f"📏 Escala de redução: {results['scale_m'] / 1000:.1f} km (escolhida pela área da região, ~{gee_handler.SERIES_TARGET_PIXELS} pixels por dia).")
+            if "p10" in results["time_series_df"].columns:
+                charts_visualizer.display_spatial_spread_chart(results["time_series_df"], st.session_state.variavel, var_cfg["unit"])
+            if results.get("resolution", "Diária") == "Diária":
+                charts_visualizer.display_aggregation_views(results["time_series_df"], st.session_state.variavel, var_cfg["unit"], var_cfg["aggregation"])
+                charts_visualizer.display_event_detection({st.session_state.variavel: results["time_series_df"]}, var_cfg["unit"], "single")
+            if results.get("region_notice"):
+                st.info(results["region_notice"])
+            if results.get("region_series_df") is not None and not results["region_series_df"].empty:
+                charts_visualizer.display_region_comparison(results["region_series_df"], st.session_state.variavel, var_cfg["unit"], results.get("resolution", "Diária"))
+                if results.get("region_scale_m"):
+                    st.caption(f"📏 Escala de redução das regiões de comparação: {results['region_scale_m'] / 1000:.1f} km (geometrias simplificadas).")
 
 def render_polygon_drawer():
     st.subheader("Desenhe sua Área")
@@ -20,112 +20,104 @@ import matplotlib.colors as mcolors
 from branca.colormap import StepColormap 
 from branca.element import Template, MacroElement 
 import folium 
+import streamlit.components.v1 as components
+import hashlib
 import gee_handler
+import tile_proxy
+
+# Validade dos map IDs do Earth Engine. Os tokens de tile expiram no servidor
+# (cerca de 1 h), então o cache local fica bem abaixo disso: um template pego no
+# fim do TTL ainda tem margem antes de o token vencer.
+MAPID_LIFETIME = 3600
+MAPID_TTL = 3000
+# O HTML embute o template de URL: pode ter sido montado com um map ID já no fim
+# do MAPID_TTL, então só vive o que sobra do token depois disso
+MAP_HTML_TTL = MAPID_LIFETIME - MAPID_TTL
+
+# Chaves aceitas pelo getMapId (o restante, como 'caption', é só para a legenda)
+_EE_VIS_KEYS = ("bands", "min", "max", "gain", "bias", "gamma", "palette", "opacity", "forceRgbOutput")
 
 # ------------------------------------------------------------------
 # 0. MAPA DE SOBREPOSIÇÃO (OVERLAY + SPLIT MAP)
 # ------------------------------------------------------------------
 
 def create_overlay_map(img1, name1, img2, name2, feature, opacity1=1.0, opacity2=0.6, mode="Transparência"):
-    try:
-        coords = feature.geometry().bounds().getInfo()['coordinates'][0]
-        lon_min, lat_min = coords[0][0], coords[0][1]
-        lon_max, lat_max = coords[2][0], coords[2][1]
-        bounds = [[lat_min, lon_min], [lat_max, lon_max]]
-        centro = feature.geometry().centroid(maxError=1).getInfo()['coordinates'] 
-        lon_c, lat_c = centro[0], centro[1]
-    except Exception:
-        bounds = None
-        lat_c, lon_c = -15.78, -47.93
-
-    mapa = geemap.Map(center=[lat_c, lon_c], zoom=4, add_google_map=False, tiles=None)
-    
-    # Base ESRI
-    esri_layer = folium.TileLayer(
-        tiles="https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
-        attr="Tiles &copy; Esri",
-        name="Esri Satellite",
-        overlay=False,
-        control=True
-    )
-    esri_layer.add_to(mapa)
-
     vis1 = gee_handler.obter_vis_params_interativo(name1)
     vis2 = gee_handler.obter_vis_params_interativo(name2)
 
-    # Lógica do Split Map (Cortina)
-    if mode == "Split Map (Cortina)":
-        left_layer = geemap.ee_tile_layer(img1, vis1, name=f"Esq: {name1}")
-        right_layer = geemap.ee_tile_layer(img2, vis2, name=f"Dir: {name2}")
-        
-        mapa.split_map(left_layer=left_layer, right_layer=right_layer)
-        
-        _add_colorbar_bottomleft(mapa, vis1, f"Esq: {name1}", index=0)
-        _add_colorbar_bottomleft(mapa, vis2, f"Dir: {name2}", index=1)
-
-    else:
-        # Modo Transparência (Tradicional)
-        mapa.addLayer(img1, vis1, f"Base: {name1}", opacity=opacity1)
-        mapa.addLayer(img2, vis2, f"Topo: {name2}", opacity=opacity2)
-        
-        _add_colorbar_bottomleft(mapa, vis1, f"Base: {name1}", index=0)
-        _add_colorbar_bottomleft(mapa, vis2, f"Topo: {name2}", index=1)
-
-    # Contorno sempre visível
-    mapa.addLayer(ee.Image().paint(ee.FeatureCollection([feature]), 0, 2), {"palette": "red"}, "Contorno")
-
-    if bounds:
-        mapa.fit_bounds(bounds)
-    
-    mapa.to_streamlit(height=500, use_container_width=True)
+    def _build():
+        mapa, bounds, _ = _base_map(feature)
+
+        # Lógica do Split Map (Cortina)
+        if mode == "Split Map (Cortina)":
+            left_layer = _ee_tile_layer(img1, vis1, f"Esq: {name1}")
+            right_layer = _ee_tile_layer(img2, vis2, f"Dir: {name2}")
+            
+            mapa.split_map(left_layer=left_layer, right_layer=right_layer)
+            
+            _add_colorbar_bottomleft(mapa, vis1, f"Esq: {name1}", index=0)
+            _add_colorbar_bottomleft(mapa, vis2, f"Dir: {name2}", index=1)
+
+        else:
+            # Modo Transparência (Tradicional)
+            _ee_tile_layer(img1, vis1, f"Base: {name1}", opacity=opacity1).add_to(mapa)
+            _ee_tile_layer(img2, vis2, f"Topo: {name2}", opacity=opacity2).add_to(mapa)
+            
+            _add_colorbar_bottomleft(mapa, vis1, f"Base: {name1}", index=0)
+            _add_colorbar_bottomleft(mapa, vis2, f"Topo: {name2}", index=1)
+
+        # Contorno sempre visível
+        _ee_tile_layer(ee.Image().paint(ee.FeatureCollection([feature]), 0, 2), {"palette": "red"}, "Contorno").add_to(mapa)
+
+        if bounds:
+            mapa.fit_bounds(bounds)
+        return mapa
+
+    map_key = (
+        "overlay", _ee_digest(img1), _ee_digest(img2), _ee_digest(feature),
+        name1, name2, repr(sorted(vis1.items())), repr(sorted(vis2.items())),
+        opacity1, opacity2, mode
+    )
+    _render_map_html(map_key, _build)
 
 # ------------------------------------------------------------------
 # 1. MAPA INTERATIVO PADRÃO
 # ------------------------------------------------------------------
 
-def create_interactive_map(ee_image: ee.Image, feature: ee.Feature, vis_params: dict, unit_label: str = "", opacity: float = 1.0):
-    try:
-        coords = feature.geometry().bounds().getInfo()['coordinates'][0]
-        lon_min, lat_min = coords[0][0], coords[0][1]
-        lon_max, lat_max = coords[2][0], coords[2][1]
-        bounds = [[lat_min, lon_min], [lat_max, lon_max]]
-        centro = feature.geometry().centroid(maxError=1).getInfo()['coordinates'] 
-        lon_c, lat_c = centro[0], centro[1]
-    except Exception:
-        bounds = None
-        lat_c, lon_c = -15.78, -47.93
+def create_interactive_map(ee_image: ee.Image, feature: ee.Feature, vis_params: dict, unit_label: str = "", opacity: float = 1.0, wind_grid: dict = None, wind_density: int = 20):
+    tipo_local = st.session_state.get('tipo_localizacao', '')
 
-    mapa = geemap.Map(center=[lat_c, lon_c], zoom=4, add_google_map=False, tiles=None)
-    
-    esri_layer = folium.TileLayer(
-        tiles="https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
-        attr="Tiles &copy; Esri",
-        name="Esri Satellite",
-        overlay=False,
-        control=True
-    )
-    esri_layer.add_to(mapa)
+    def _build():
+        mapa, bounds, (lat_c, lon_c) = _base_map(feature)
 
-    # Adiciona a camada com a opacidade correta
-    mapa.addLayer(ee_image, vis_params, "Dados Climáticos", opacity=opacity)
-    
-    mapa.addLayer(ee.Image().paint(ee.FeatureCollection([feature]), 0, 2), {"palette": "red"}, "Contorno")
-    
-    tipo_local = st.session_state.get('tipo_localizacao', '')
-    if tipo_local == "Círculo (Lat/Lon/Raio)":
-        folium.Marker(
-            location=[lat_c, lon_c],
-            tooltip=f"Centro: {lat_c:.2f}, {lon_c:.2f}",
-            popup=folium.Popup(f"<b>Centro</b><br>Lat: {lat_c:.5f}<br>Lon: {lon_c:.5f}", max_width=200),
-            icon=folium.Icon(color='red', icon='info-sign')
-        ).add_to(mapa)
-    
-    _add_colorbar_bottomleft(mapa, vis_params, unit_label)
+        # Adiciona a camada com a opacidade correta
+        _ee_tile_layer(ee_image, vis_params, "Dados Climáticos", opacity=opacity).add_to(mapa)
+        
+        _ee_tile_layer(ee.Image().paint(ee.FeatureCollection([feature]), 0, 2), {"palette": "red"}, "Contorno").add_to(mapa)
+        
+        if tipo_local == "Círculo (Lat/Lon/Raio)":
+            folium.Marker(
+                location=[lat_c, lon_c],
+                tooltip=f"Centro: {lat_c:.2f}, {lon_c:.2f}",
+                popup=folium.Popup(f"<b>Centro</b><br>Lat: {lat_c:.5f}<br>Lon: {lon_c:.5f}", max_width=200),
+                icon=folium.Icon(color='red', icon='info-sign')
+            ).add_to(mapa)
+        
+        if wind_grid is not None:
+            _add_wind_arrows(mapa, wind_field_vectors(wind_grid, wind_density), vis_params)
+        
+        _add_colorbar_bottomleft(mapa, vis_params, unit_label)
 
-    if bounds:
-        mapa.fit_bounds(bounds)
-    
-    mapa.to_streamlit(height=500, use_container_width=True)
+        if bounds:
+            mapa.fit_bounds(bounds)
+        return mapa
+
+    map_key = (
+        "interactive", _ee_digest(ee_image), _ee_digest(feature),
+        repr(sorted(vis_params.items())), unit_label, opacity, tipo_local,
+        wind_grid["key"] if wind_grid is not None else None, wind_density
+    )
+    _render_map_html(map_key, _build)
 
 # ------------------------------------------------------------------
 # 2. MAPA ESTÁTICO
@@ -198,6 +190,73 @@ def create_static_map(ee_image: ee.Image, feature: ee.Feature, vis_params: dict,
 # 3. FUNÇÕES AUXILIARES
 # ------------------------------------------------------------------
 
+def _base_map(feature: ee.Feature):
+    """Mapa base (ESRI) centrado na feição. Devolve (mapa, bounds, (lat_c, lon_c))."""
+    try:
+        coords = feature.geometry().bounds().getInfo()['coordinates'][0]
+        lon_min, lat_min = coords[0][0], coords[0][1]
+        lon_max, lat_max = coords[2][0], coords[2][1]
+        bounds = [[lat_min, lon_min], [lat_max, lon_max]]
+        centro = feature.geometry().centroid(maxError=1).getInfo()['coordinates'] 
+        lon_c, lat_c = centro[0], centro[1]
+    except Exception:
+        bounds = None
+        lat_c, lon_c = -15.78, -47.93
+
+    mapa = geemap.Map(center=[lat_c, lon_c], zoom=4, add_google_map=False, tiles=None)
+    
+    esri_layer = folium.TileLayer(
+        tiles=tile_proxy.proxied_url("esri_world_imagery", tile_proxy.ESRI_IMAGERY_URL),
+        attr="Tiles &copy; Esri",
+        name="Esri Satellite",
+        overlay=False,
+        control=True
+    )
+    esri_layer.add_to(mapa)
+    return mapa, bounds, (lat_c, lon_c)
+
+@st.cache_data(ttl=MAP_HTML_TTL, show_spinner=False, max_entries=64)
+def _map_html(map_key: tuple, _build) -> str:
+    """
+    HTML do mapa em cache pela chave de entradas. Como carrega as URLs dos tiles
+    embutidas, o TTL é a folga entre o MAPID_TTL e a validade do token.
+    """
+    return _build().to_html()
+
+def _render_map_html(map_key: tuple, build, height: int = 500):
+    """Emite o HTML do mapa; só reconstrói (e re-serializa) quando a chave muda."""
+    html = _map_html(map_key, build)
+    components.html(html, height=height, scrolling=False)
+
+def _ee_digest(ee_obj) -> str:
+    """Hash da expressão serializada (calculado no cliente, sem chamada ao servidor)."""
+    return hashlib.sha1(ee_obj.serialize().encode("utf-8")).hexdigest()
+
+@st.cache_data(ttl=MAPID_TTL, show_spinner=False)
+def _get_tile_url(image_digest: str, vis_params: dict, _ee_image: ee.Image) -> str:
+    """
+    Faz o getMapId uma única vez por (expressão, vis_params) e devolve o template
+    de URL dos tiles. Reruns seguintes reaproveitam o template sem ir ao servidor.
+    """
+    map_id = _ee_image.getMapId(vis_params)
+    return map_id["tile_fetcher"].url_format
+
+def _ee_tile_layer(ee_image: ee.Image, vis_params: dict, name: str, opacity: float = 1.0) -> folium.TileLayer:
+    """Camada folium para uma imagem EE usando o map ID em cache."""
+    vis = {k: v for k, v in (vis_params or {}).items() if k in _EE_VIS_KEYS}
+    digest = _ee_digest(ee_image)
+    url = _get_tile_url(digest, vis, ee_image)
+    # Nome estável (imagem + vis) para o cache do proxy sobreviver à troca de token
+    url = tile_proxy.proxied_url(f"ee:{digest}:{sorted(vis.items())}", url)
+    return folium.TileLayer(
+        tiles=url,
+        attr="Google Earth Engine",
+        name=name,
+        overlay=True,
+        control=True,
+        opacity=opacity
+    )
+
 def _add_colorbar_bottomleft(mapa: geemap.Map, vis_params: dict, unit_label: str, index: int = 0):
     palette = vis_params.get("palette", None)
     vmin = vis_params.get("min", 0)
@@ -272,17 +331,99 @@ def _stitch_images_to_bytes(title_bytes: bytes, map_bytes: bytes, colorbar_bytes
         return buf.getvalue()
     except: return None
 
+# ------------------------------------------------------------------
+# 4. CAMPO DE VENTO (VETORES A PARTIR DA GRADE U/V)
+# ------------------------------------------------------------------
 
+def wind_field_vectors(grid: dict, density: int = 20) -> dict:
+    """
+    Velocidade e direção (de onde o vento sopra, em graus) calculadas com numpy
+    sobre a grade inteira, e vetores dizimados para ~`density` setas por lado.
+    """
+    u, v = grid["u"], grid["v"]
+    speed = np.hypot(u, v)
+    direction = (np.degrees(np.arctan2(-u, -v)) + 360.0) % 360.0
+
+    step = max(1, int(np.ceil(max(u.shape) / max(density, 1))))
+    sl = (slice(step // 2, None, step), slice(step // 2, None, step))
+    lon2d, lat2d = np.meshgrid(grid["lon"], grid["lat"])
+    sub_u, sub_v, sub_s = u[sl], v[sl], speed[sl]
+    ok = np.isfinite(sub_s)
+    return {
+        "speed": speed,
+        "direction": direction,
+        "lat": lat2d[sl][ok], "lon": lon2d[sl][ok],
+        "u": sub_u[ok], "v": sub_v[ok], "s": sub_s[ok],
+        "cell": grid["step"] * step,
+    }
+
+def _add_wind_arrows(mapa, vectors: dict, vis_params: dict):
+    """Desenha as setas no folium, uma PolyLine (multi-linha) por faixa de cor."""
+    if vectors["s"].size == 0: return
+    palette = vis_params.get("palette", ["#000000"])
+    vmin, vmax = float(vis_params.get("min", 0)), float(vis_params.get("max", 1))
+
+    s = vectors["s"]
+    s_ref = max(float(np.nanmax(s)), 1e-6)
+    length = 0.9 * vectors["cell"] * s / s_ref
+    ux, vy = vectors["u"] / np.maximum(s, 1e-6), vectors["v"] / np.maximum(s, 1e-6)
+
+    lat0, lon0 = vectors["lat"], vectors["lon"]
+    lat1, lon1 = lat0 + vy * length, lon0 + ux * length
+    # Pontas da seta: ±150° em relação à direção do vetor
+    head = 0.35 * length
+    cos_a, sin_a = np.cos(np.radians(150)), np.sin(np.radians(150))
+    hl_x, hl_y = ux * cos_a - vy * sin_a, ux * sin_a + vy * cos_a
+    hr_x, hr_y = ux * cos_a + vy * sin_a, -ux * sin_a + vy * cos_a
+
+    bins = np.clip(((s - vmin) / max(vmax - vmin, 1e-6) * len(palette)).astype(int), 0, len(palette) - 1)
+    group = folium.FeatureGroup(name="Vetores de Vento", overlay=True, control=True)
+    for b in np.unique(bins):
+        idx = np.where(bins == b)[0]
+        lines = []
+        for i in idx:
+            tip = [float(lat1[i]), float(lon1[i])]
+            lines.append([[float(lat0[i]), float(lon0[i])], tip])
+            lines.append([tip, [float(lat1[i] + hl_y[i] * head[i]), float(lon1[i] + hl_x[i] * head[i])]])
+            lines.append([tip, [float(lat1[i] + hr_y[i] * head[i]), float(lon1[i] + hr_x[i] * head[i])]])
+        folium.PolyLine(lines, color=palette[b], weight=2, opacity=0.9).add_to(group)
+    group.add_to(mapa)
+
+def create_static_wind_map(grid: dict, vis_params: dict, density: int = 20, style: str = "Setas", title: str = "") -> bytes:
+    """Mapa estático (PNG) da velocidade com setas ou linhas de corrente, feito localmente."""
+    try:
+        vec = wind_field_vectors(grid, density)
+        palette = vis_params.get("palette", ["#FFFFFF", "#08306B"])
+        cmap = LinearSegmentedColormap.from_list("wind", palette)
+        vmin, vmax = vis_params.get("min", 0), vis_params.get("max", 35)
+
+        fig, ax = plt.subplots(figsize=(7, 6), dpi=120)
+        lon, lat = grid["lon"], grid["lat"]
+        mesh = ax.pcolormesh(lon, lat, vec["speed"], cmap=cmap, vmin=vmin, vmax=vmax, shading="auto")
+
+        if style == "Linhas de Corrente":
+            # streamplot exige eixo y crescente
+            order = np.argsort(lat)
+            ax.streamplot(
+                lon, lat[order],
+                np.nan_to_num(grid["u"][order]), np.nan_to_num(grid["v"][order]),
+                density=max(density, 4) / 20.0, color="k", linewidth=0.7, arrowsize=0.8
+            )
+        else:
+            ax.quiver(vec["lon"], vec["lat"], vec["u"], vec["v"], color="k", pivot="tail", width=0.003)
+
+        ax.set_xlim(lon.min(), lon.max())
+        ax.set_ylim(lat.min(), lat.max())
+        ax.set_aspect("equal")
+        ax.set_xlabel("Longitude")
+        ax.set_ylabel("Latitude")
+        if title: ax.set_title(title, fontsize=10)
+        fig.colorbar(mesh, ax=ax, orientation="horizontal", pad=0.1, fraction=0.05, label=vis_params.get("caption", "Vento (m/s)"))
 
-
-
-
-
-
-
-
-
-
-
-
-
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", bbox_inches="tight")
+        plt.close(fig)
+        return buf.getvalue()
+    except Exception as e:
+        print(f"Erro mapa de vento: {e}")
+        return None
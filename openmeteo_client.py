@@ -0,0 +1,160 @@
+# ==================================================================================
+# openmeteo_client.py
+# ==================================================================================
+"""
+Cliente compartilhado da Open-Meteo (um por processo).
+
+- Sessão HTTP com pool de conexões e timeouts explícitos.
+- Token bucket por processo dimensionado aos limites da API gratuita
+  (600/min, 5000/h, 10000/dia). Pedidos com mais de 10 variáveis, mais de
+  2 semanas ou vários pontos contam como várias chamadas, e o custo é
+  calculado do mesmo jeito aqui.
+- 429/5xx e falhas de conexão são repetidos com backoff exponencial com
+  jitter (respeitando Retry-After), então rajadas de uma turma inteira
+  entram na fila em vez de falhar.
+"""
+import math
+import random
+import threading
+import time
+from datetime import date
+
+import requests
+from requests.adapters import HTTPAdapter
+import streamlit as st
+
+# (chamadas, período em segundos) - limites da API gratuita
+RATE_LIMITS = [(600, 60), (5000, 3600), (10000, 86400)]
+
+TIMEOUT = (5, 30)          # (conexão, leitura) em segundos
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0         # s
+BACKOFF_MAX = 30.0         # s
+MAX_QUEUE_WAIT = 60.0      # espera máxima na fila antes de desistir (s)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimitedError(RuntimeError):
+    """A cota local ou a da API esgotou e a espera passaria de MAX_QUEUE_WAIT."""
+
+
+# ------------------------------------------------------------------
+# 1. TOKEN BUCKET
+# ------------------------------------------------------------------
+
+class TokenBucket:
+    """Balde de `capacity` fichas reabastecido continuamente ao longo de `period` segundos."""
+
+    def __init__(self, capacity: float, period: float):
+        self.capacity = float(capacity)
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        self._refill(now)
+        missing = cost - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, cost: float):
+        self.tokens -= cost
+
+
+def request_cost(params: dict) -> float:
+    """Custo do pedido como a Open-Meteo conta: variáveis/10 × semanas/2 × pontos."""
+    n_vars = sum(len(str(params.get(k, "")).split(",")) for k in ("hourly", "daily", "current") if params.get(k))
+    n_points = len(str(params.get("latitude", "")).split(","))
+    days = 1
+    if params.get("start_date") and params.get("end_date"):
+        try:
+            days = (date.fromisoformat(str(params["end_date"])) - date.fromisoformat(str(params["start_date"]))).days + 1
+        except ValueError:
+            days = 1
+    return max(1, math.ceil(n_vars / 10)) * max(1, math.ceil(days / 14)) * n_points
+
+
+# ------------------------------------------------------------------
+# 2. CLIENTE
+# ------------------------------------------------------------------
+
+class OpenMeteoClient:
+    def __init__(self, limits=RATE_LIMITS, pool_size: int = 16):
+        self._buckets = [TokenBucket(cap, period) for cap, period in limits]
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def _acquire(self, cost: float, deadline: float):
+        """Bloqueia até haver fichas em todos os baldes (ou levanta RateLimitedError)."""
+        cost = min(cost, min(b.capacity for b in self._buckets))
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(b.wait_time(cost, now) for b in self._buckets)
+                if wait <= 0:
+                    for b in self._buckets:
+                        b.take(cost)
+                    return
+            if now + wait > deadline:
+                raise RateLimitedError(f"cota da Open-Meteo esgotada (espera estimada de {wait:.0f} s)")
+            time.sleep(min(wait, 1.0))
+
+    def _drain(self):
+        """Depois de um 429 da API, zera as fichas locais para que os outros pedidos também esperem."""
+        with self._lock:
+            now = time.monotonic()
+            for b in self._buckets[:1]:
+                b._refill(now)
+                b.tokens = min(b.tokens, 0.0)
+
+    @staticmethod
+    def _backoff(attempt: int, resp) -> float:
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX) + random.uniform(0, 1)
+            except ValueError:
+                pass
+        # Full jitter: espera aleatória em [0, base·2^tentativa]
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def get_json(self, url: str, params: dict) -> dict:
+        """GET com fila por cota, timeout e novas tentativas. Devolve o JSON da resposta."""
+        deadline = time.monotonic() + MAX_QUEUE_WAIT
+        cost = request_cost(params)
+        last_exc = None
+        for attempt in range(MAX_RETRIES + 1):
+            self._acquire(cost, deadline)
+            resp = None
+            try:
+                resp = self._session.get(url, params=params, timeout=TIMEOUT)
+                if resp.status_code not in RETRY_STATUS:
+                    resp.raise_for_status()
+                    return resp.json()
+                last_exc = requests.HTTPError(f"{resp.status_code} {resp.reason}", response=resp)
+                if resp.status_code == 429:
+                    self._drain()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_exc = e
+
+            if attempt == MAX_RETRIES:
+                break
+            delay = self._backoff(attempt, resp)
+            if time.monotonic() + delay > deadline:
+                if resp is not None and resp.status_code == 429:
+                    raise RateLimitedError("a Open-Meteo está limitando as consultas (429)") from last_exc
+                break
+            time.sleep(delay)
+        raise last_exc
+
+
+@st.cache_resource(show_spinner=False)
+def get_client() -> OpenMeteoClient:
+    """Cliente único por processo (pool de conexões e cota compartilhados entre sessões)."""
+    return OpenMeteoClient()
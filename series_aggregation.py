@@ -0,0 +1,104 @@
+# ==================================================================================
+# series_aggregation.py
+# ==================================================================================
+"""
+Reamostragem temporal e climatologia de séries diárias (pandas/numpy vetorizado).
+
+Trabalha sobre os DataFrames date/value que já estão em cache na sessão:
+- totais/médias mensais e anuais;
+- climatologia por dia do ano (média, desvio e percentis, suavizada);
+- anomalias (absolutas e padronizadas) em relação à climatologia.
+
+Para períodos longos, os totais mensais/anuais também podem ser pedidos
+direto ao servidor (gee_handler.get_aggregated_series), sem baixar a série diária.
+"""
+import numpy as np
+import pandas as pd
+
+RESAMPLE_RULES = {"Mensal": "MS", "Anual": "YS"}
+CLIM_SMOOTH_DAYS = 15
+
+
+def _clean(df: pd.DataFrame) -> pd.DataFrame:
+    out = df[['date', 'value']].dropna().copy()
+    out['date'] = pd.to_datetime(out['date'])
+    return out.sort_values('date')
+
+def resample_series(df: pd.DataFrame, freq: str = "Mensal", how: str = "mean") -> pd.DataFrame:
+    """
+    Agrega a série diária por mês ou ano. `how`: 'mean' ou 'sum'.
+    Devolve date (início do período), value e n_days.
+    """
+    d = _clean(df).set_index('date')['value']
+    grp = d.resample(RESAMPLE_RULES[freq])
+    out = pd.DataFrame({'value': grp.sum() if how == "sum" else grp.mean(), 'n_days': grp.count()})
+    out = out[out['n_days'] > 0].reset_index()
+    return out
+
+def resample_long(df: pd.DataFrame, freq: str = "Mensal", how: str = "mean", by: str = "region") -> pd.DataFrame:
+    """resample_series para uma tabela longa (várias séries identificadas pela coluna `by`)."""
+    parts = [resample_series(g, freq, how).assign(**{by: k}) for k, g in df.groupby(by, sort=False)]
+    if not parts:
+        return pd.DataFrame(columns=[by, 'date', 'value', 'n_days'])
+    return pd.concat(parts, ignore_index=True)[[by, 'date', 'value', 'n_days']]
+
+def _day_of_year(dates: pd.Series) -> np.ndarray:
+    """Dia do ano 1..365 no calendário de 365 dias (29/02 usa o mesmo índice de 28/02)."""
+    doy = dates.dt.dayofyear.to_numpy()
+    leap = dates.dt.is_leap_year.to_numpy()
+    return np.where(leap & (doy >= 60), np.maximum(doy - 1, 59), doy)
+
+def doy_climatology(df: pd.DataFrame, smooth_days: int = CLIM_SMOOTH_DAYS, percentiles=(10, 90)) -> pd.DataFrame:
+    """
+    Climatologia por dia do ano. As estatísticas usam uma janela móvel circular de
+    `smooth_days` dias (o 31/12 encosta no 01/01), calculada para todos os dias de uma vez.
+    Colunas: doy, mean, std, pXX, n.
+    """
+    d = _clean(df)
+    d = d[~((d['date'].dt.month == 2) & (d['date'].dt.day == 29))]  # 29/02 fica fora da climatologia
+    doy = _day_of_year(d['date'])
+    vals = d['value'].to_numpy(dtype=float)
+
+    # Matriz anos × 365 (NaN onde não há dado) -> janela circular vetorizada
+    years = d['date'].dt.year.to_numpy()
+    yidx = years - years.min()
+    mat = np.full((yidx.max() + 1, 365), np.nan)
+    mat[yidx, doy - 1] = vals
+
+    half = smooth_days // 2
+    offsets = np.arange(-half, half + 1)
+    cols = (np.arange(365)[:, None] + offsets[None, :]) % 365      # 365 × janela
+    windowed = mat[:, cols]                                           # anos × 365 × janela
+    windowed = windowed.transpose(1, 0, 2).reshape(365, -1)           # 365 × (anos·janela)
+
+    with np.errstate(invalid='ignore'):
+        out = pd.DataFrame({
+            'doy': np.arange(1, 366),
+            'mean': np.nanmean(windowed, axis=1),
+            'std': np.nanstd(windowed, axis=1, ddof=1),
+            'n': np.sum(np.isfinite(windowed), axis=1),
+        })
+        pct = np.nanpercentile(windowed, list(percentiles), axis=1)
+    for p, row in zip(percentiles, pct):
+        out[f'p{p}'] = row
+    return out
+
+def anomalies(df: pd.DataFrame, clim: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Anomalia de cada dia em relação à climatologia do seu dia do ano.
+    Colunas: date, value (anomalia), z (anomalia padronizada), clim.
+    """
+    d = _clean(df)
+    if clim is None:
+        clim = doy_climatology(d)
+    doy = _day_of_year(d['date'])
+    mean = clim['mean'].to_numpy()[doy - 1]
+    std = clim['std'].to_numpy()[doy - 1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(std > 0, (d['value'].to_numpy() - mean) / std, np.nan)
+    return pd.DataFrame({
+        'date': d['date'].to_numpy(),
+        'value': d['value'].to_numpy() - mean,
+        'z': z,
+        'clim': mean,
+    })
@@ -1,16 +1,36 @@
 # ==================================================================================
 # skewt_handler.py
 # ==================================================================================
-import requests
 import pandas as pd
 import streamlit as st
 from datetime import datetime, date
 import math
+import re
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import openmeteo_client
+import sounding_archive
 
 # Níveis de pressão padrão (Open-Meteo aceita estes níveis em hPa)
 PRESSURE_LEVELS = [1000, 975, 950, 925, 900, 850, 800, 700,
                    600, 500, 400, 300, 250, 200, 150, 100]
 
+# Variáveis por nível (ordem do último eixo do bloco diário)
+SOUNDING_VARS = ["temperature", "relative_humidity", "wind_speed", "wind_direction"]
+
+# Casas decimais das coordenadas na chave do cache (~1 km; a grade do modelo é mais grossa)
+COORD_DECIMALS = 2
+
+# Lotes: pontos por pedido (lista de coordenadas separadas por vírgula) e dias por janela
+MAX_BATCH_POINTS = 25
+MAX_BATCH_DAYS = 14
+BATCH_WORKERS = 4
+
+# Composições: janelas longas (poucos pedidos grandes) e limite de dias buscados
+COMPOSITE_WINDOW_DAYS = 92
+COMPOSITE_MAX_DAYS = 400
+
 # Data de início dos dados de pressão no Historical Forecast (GFS)
 HIST_FC_START_DATE = date(2021, 3, 23)
 
@@ -35,7 +55,117 @@ def _normalize_hour(hour):
             h_str = h_str.split(sep)[0]
             break
     return int(h_str)
-@st.cache_data(ttl=3600) # Cache válido por 1 hora (3600 segundos)
+
+def _select_endpoint(date_only):
+    """
+    Escolhe o endpoint da Open-Meteo para a data.
+    Recente (futuro ou até 14 dias atrás) -> Previsão; mais antigo -> Historical Forecast.
+    Devolve (url, api_type) ou (None, None) se não houver dados de altitude.
+    """
+    delta = (datetime.utcnow().date() - date_only).days
+    if delta <= 14:
+        return "https://api.open-meteo.com/v1/forecast", "Forecast (GFS/Seamless)"
+    # Nota: Não usamos 'archive-api' (ERA5) porque ele não tem pressão horária
+    if date_only < HIST_FC_START_DATE:
+        return None, None
+    return "https://historical-forecast-api.open-meteo.com/v1/forecast", "Historical Forecast (GFS)"
+
+def _hourly_vars():
+    """Variáveis horárias pedidas: nível-major, na ordem de SOUNDING_VARS."""
+    return [f"{var}_{l}hPa" for l in PRESSURE_LEVELS for var in SOUNDING_VARS]
+
+def _layout():
+    """Assinatura dos níveis e variáveis pedidos (invalida registros antigos do arquivo se mudarem)."""
+    return ",".join(map(str, PRESSURE_LEVELS)) + "|" + ",".join(SOUNDING_VARS)
+
+@st.cache_resource(show_spinner=False)
+def _get_archive():
+    """Arquivo local de sondagens (um por processo), conforme env/Secrets [sounding_archive]."""
+    try:
+        cfg = dict(st.secrets.get("sounding_archive", {}))
+    except Exception:
+        cfg = {}
+    try:
+        return sounding_archive.from_config(cfg)
+    except Exception as e:
+        print(f"Arquivo de sondagens indisponível: {e}")
+        return sounding_archive.SoundingArchive(mode="off")
+
+def _request_json(url, params):
+    # Cliente compartilhado: pool de conexões, timeout, cota e backoff em 429/5xx
+    return openmeteo_client.get_client().get_json(url, params)
+
+def _hourly_to_block(hourly: dict) -> dict:
+    """
+    Converte o bloco 'hourly' da resposta em arrays: times (h) e data (h × níveis × variáveis).
+    Todas as listas do JSON viram um único array numa só conversão (None -> NaN),
+    sem laço por nível ou por hora.
+    """
+    times = np.asarray(hourly.get("time", []), dtype=np.int64)
+    missing = [None] * times.size
+    raw = np.array([hourly.get(name) or missing for name in _hourly_vars()], dtype=np.float32)
+    # (níveis·variáveis) × horas -> horas × níveis × variáveis
+    data = raw.reshape(len(PRESSURE_LEVELS), len(SOUNDING_VARS), times.size).transpose(2, 0, 1)
+    return {"times": times, "data": np.ascontiguousarray(data)}
+
+def _block_fields(data: np.ndarray):
+    """
+    Campos físicos de um bloco (qualquer formato ... × variáveis): temperatura (°C),
+    UR (%, NaN -> 0) e vento em componentes u/v (km/h -> m/s), tudo vetorizado.
+    """
+    t, rh, ws, wd = np.moveaxis(data.astype(float), -1, 0)
+    ws_ms = ws / 3.6  # Open-Meteo Forecast usa Wind Speed em km/h por padrão
+    rad = np.radians(wd)
+    has_wind = np.isfinite(ws) & np.isfinite(wd)
+    u = np.where(has_wind, -ws_ms * np.sin(rad), 0.0)
+    v = np.where(has_wind, -ws_ms * np.cos(rad), 0.0)
+    return t, np.nan_to_num(rh, nan=0.0), u, v
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _fetch_day_block(lat_r, lon_r, date_str, url):
+    """
+    Dia inteiro (24 h) de um ponto, em cache por (lat/lon arredondados, data, endpoint).
+    Trocar a hora só fatia este bloco; não há nova chamada à API.
+    Dias já fechados saem do arquivo local em disco; no modo replay nada vai à API.
+    Erros de rede sobem como exceção (e não ficam em cache).
+    """
+    day = _normalize_date(date_str)
+    archive = _get_archive()
+    if archive.should_read(day):
+        block = archive.get(url, lat_r, lon_r, day, _layout())
+        if block is not None:
+            return block
+    if archive.mode == "replay":
+        raise sounding_archive.ArchiveMissError(f"sondagem de {date_str} em ({lat_r}, {lon_r}) não está no arquivo local")
+
+    data = _request_json(url, {
+        "latitude": lat_r,
+        "longitude": lon_r,
+        "start_date": date_str,
+        "end_date": date_str,
+        "hourly": ",".join(_hourly_vars()),
+        "timeformat": "unixtime",
+        "timezone": "UTC",
+    })
+    if "hourly" not in data:
+        return None
+    block = _hourly_to_block(data["hourly"])
+    archive.put(url, lat_r, lon_r, block, _layout())
+    return block
+
+def _profile_from_block(block: dict, idx: int) -> pd.DataFrame:
+    """Perfil de uma hora a partir do bloco diário (vento km/h -> componentes u/v em m/s)."""
+    t, rh, u, v = _block_fields(block["data"][idx])
+    # Filtra nos arrays antes de montar o DataFrame (evita a cópia da máscara booleana)
+    ok = np.isfinite(t)
+    return pd.DataFrame({
+        "pressure": np.asarray(PRESSURE_LEVELS)[ok],
+        "temperature": t[ok],
+        "relative_humidity": rh[ok],
+        "u_component": u[ok],
+        "v_component": v[ok],
+    })
+
 def get_vertical_profile_data(lat, lon, date_obj, hour):
     # ----------------------------------------------------------------------
     # 0. Normalização
@@ -52,125 +182,56 @@ def get_vertical_profile_data(lat, lon, date_obj, hour):
         st.warning(f"Hora inválida: {idx}")
         return None
 
-    hoje_utc = datetime.utcnow().date()
-    delta = (hoje_utc - date_only).days
-
     # ----------------------------------------------------------------------
     # 1. Escolha do endpoint da Open-Meteo
     # ----------------------------------------------------------------------
-    
-    # REGRA SIMPLIFICADA:
-    # Se for recente (futuro ou até 14 dias atrás) -> Usa API de Previsão
-    # Se for antigo (> 14 dias atrás) -> Usa API de Previsão Histórica (Historical Forecast)
-    
-    if delta <= 14:
-        # Endpoint de Previsão (Forecast)
-        url = "https://api.open-meteo.com/v1/forecast"
-        api_type = "Forecast (GFS/Seamless)"
-        # CORREÇÃO: Removemos 'past_days'. As datas start/end já são suficientes.
-        params = {}
-    else:
-        # Endpoint Histórico (Historical Forecast - contém dados de altitude)
-        # Nota: Não usamos 'archive-api' (ERA5) porque ele não tem pressão horária
-        if date_only < HIST_FC_START_DATE:
-            st.error(f"⚠️ Dados de altitude indisponíveis antes de {HIST_FC_START_DATE.strftime('%d/%m/%Y')}.")
-            return None
-
-        url = "https://historical-forecast-api.open-meteo.com/v1/forecast"
-        api_type = "Historical Forecast (GFS)"
-        params = {}
-
-    # ----------------------------------------------------------------------
-    # 2. Montagem da Requisição
-    # ----------------------------------------------------------------------
-    vars_list = []
-    for l in PRESSURE_LEVELS:
-        vars_list.extend([
-            f"temperature_{l}hPa",
-            f"relative_humidity_{l}hPa",
-            f"wind_speed_{l}hPa",
-            f"wind_direction_{l}hPa",
-        ])
-
-    params.update({
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": date_str,
-        "end_date": date_str,
-        "hourly": ",".join(vars_list),
-        "timeformat": "unixtime",
-        "timezone": "UTC",
-    })
+    url, api_type = _select_endpoint(date_only)
+    if url is None:
+        st.error(f"⚠️ Dados de altitude indisponíveis antes de {HIST_FC_START_DATE.strftime('%d/%m/%Y')}.")
+        return None
 
     # ----------------------------------------------------------------------
-    # 3. Execução
+    # 2. Bloco do dia inteiro (em cache; independe da hora escolhida)
     # ----------------------------------------------------------------------
     try:
-        req = requests.Request("GET", url, params=params)
-        prepped = req.prepare()
-
-        # Debug Opcional (Remova o # abaixo se quiser ver o link na tela)
-        # with st.expander("🐞 Debug Link"): st.write(prepped.url)
-
-        response = requests.Session().send(prepped)
-        response.raise_for_status()
-        data = response.json()
+        block = _fetch_day_block(round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS), date_str, url)
+    except openmeteo_client.RateLimitedError:
+        st.warning("⏳ Muitas consultas à Open-Meteo neste momento. Aguarde cerca de 1 minuto e tente novamente.")
+        return None
+    except sounding_archive.ArchiveMissError as e:
+        st.warning(f"📦 Modo offline (replay): {e}.")
+        return None
     except Exception as e:
         st.error(f"Erro na conexão ({api_type}): {e}")
         return None
 
-    if "hourly" not in data:
+    if block is None:
         st.warning("API respondeu sem dados horários.")
         return None
 
     # ----------------------------------------------------------------------
-    # 4. Processamento dos Dados
+    # 3. Fatia da hora pedida
     # ----------------------------------------------------------------------
     try:
-        ts = data["hourly"].get("time", [])
-        if not ts: return None
+        ts = block["times"]
+        if ts.size == 0: return None
         
         # Garante que o índice existe
-        if idx >= len(ts):
+        if idx >= ts.size:
             # Fallback: Se pedir hora futura não disponível, pega a última
-            idx = len(ts) - 1
+            idx = ts.size - 1
             st.caption(f"⚠️ Hora {hour}:00 não disponível ainda. Usando última disponível.")
 
-        returned_date = datetime.utcfromtimestamp(ts[idx]).date()
+        returned_date = datetime.utcfromtimestamp(int(ts[idx])).date()
         
         if returned_date != date_only:
             st.caption(f"ℹ️ Dados exibidos de: {returned_date}")
 
-        res = []
-        for level in PRESSURE_LEVELS:
-            t = data["hourly"].get(f"temperature_{level}hPa", [None])[idx]
-            rh = data["hourly"].get(f"relative_humidity_{level}hPa", [None])[idx]
-            ws = data["hourly"].get(f"wind_speed_{level}hPa", [None])[idx]
-            wd = data["hourly"].get(f"wind_direction_{level}hPa", [None])[idx]
-
-            if t is not None:
-                # Converte Vento (km/h -> m/s) e calcula componentes
-                u, v = 0.0, 0.0
-                if ws is not None and wd is not None:
-                    rad = math.radians(wd)
-                    # Open-Meteo Forecast usa Wind Speed em km/h por padrão
-                    ws_ms = ws / 3.6 
-                    u = -ws_ms * math.sin(rad)
-                    v = -ws_ms * math.cos(rad)
-
-                res.append({
-                    "pressure": level,
-                    "temperature": float(t),
-                    "relative_humidity": float(rh) if rh is not None else 0.0,
-                    "u_component": u,
-                    "v_component": v,
-                })
-
-        if not res:
+        df = _profile_from_block(block, idx)
+        if df.empty:
             st.error(f"Dados vazios. O modelo {api_type} não retornou níveis de pressão.")
             return None
 
-        df = pd.DataFrame(res)
         df.attrs["source"] = api_type
         df.attrs["real_date"] = returned_date
         return df.sort_values("pressure", ascending=False)
@@ -179,3 +240,345 @@ def get_vertical_profile_data(lat, lon, date_obj, hour):
         st.error(f"Erro processando resposta: {e}")
         return None
 
+def get_day_section(lat, lon, date_obj) -> dict:
+    """
+    As 24 horas do dia como matrizes horas × níveis, a partir do mesmo bloco em cache
+    do Skew-T (nenhuma chamada extra). Usado no corte tempo-altura e na linha do tempo dos índices.
+    Chaves: times (datetime64), pressure, temperature, relative_humidity, u, v, source.
+    Devolve None se não houver dados (os erros já são tratados em get_vertical_profile_data).
+    """
+    try:
+        date_only = _normalize_date(date_obj)
+        url, api_type = _select_endpoint(date_only)
+        if url is None:
+            return None
+        block = _fetch_day_block(round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS), date_only.strftime("%Y-%m-%d"), url)
+    except Exception:
+        return None
+    if block is None or block["times"].size == 0:
+        return None
+
+    t, rh, u, v = _block_fields(block["data"])
+    # Só os níveis com temperatura em todas as horas (o índice precisa de uma grade comum)
+    ok = np.isfinite(t).all(axis=0)
+    if ok.sum() < 2:
+        return None
+    return {
+        "times": pd.to_datetime(block["times"], unit="s").to_numpy(),
+        "pressure": np.asarray(PRESSURE_LEVELS, dtype=float)[ok],
+        "temperature": t[:, ok],
+        "relative_humidity": rh[:, ok],
+        "u": u[:, ok],
+        "v": v[:, ok],
+        "source": api_type,
+    }
+
+# ==================================================================================
+# LOTES: VÁRIOS PONTOS E VÁRIOS DIAS
+# ==================================================================================
+
+def _to_coord(text):
+    """Número com ponto ou vírgula decimal ('-22,91' ou '-22.91')."""
+    return float(text.strip().replace(",", "."))
+
+def _parse_point_line(line, i):
+    """Uma linha -> (nome, lat, lon) ou None se inválida."""
+    if ";" in line or "\t" in line:
+        parts = [p.strip() for p in re.split(r"[;\t]", line) if p.strip()]
+    else:
+        # Forma curta 'lat, lon' (ponto decimal) ou 'lat, lon' com vírgula decimal separados por ', '
+        parts = [p.strip() for p in (line.split(",") if line.count(",") == 1 else re.split(r",\s+", line)) if p.strip()]
+    try:
+        if len(parts) == 3:
+            name, lat, lon = parts[0], _to_coord(parts[1]), _to_coord(parts[2])
+        elif len(parts) == 2:
+            name, lat, lon = f"P{i + 1}", _to_coord(parts[0]), _to_coord(parts[1])
+        else:
+            return None
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return name, lat, lon
+
+def parse_points_text(text):
+    """
+    Linhas 'Nome; lat; lon' (ou 'lat, lon') -> tupla de (nome, lat, lon).
+    Aceita vírgula decimal ('Rio; -22,91; -43,17'). Linhas inválidas ou fora de
+    ±90/±180 são descartadas com aviso.
+    """
+    points, dropped = [], []
+    for i, line in enumerate((text or "").strip().splitlines()):
+        if not line.strip():
+            continue
+        point = _parse_point_line(line, i)
+        if point is None:
+            dropped.append(line.strip())
+        else:
+            points.append(point)
+    if dropped:
+        st.warning("⚠️ Pontos ignorados (use 'Nome; lat; lon'): " + " | ".join(dropped))
+    return tuple(points)
+
+def _date_windows(start, end, max_days=MAX_BATCH_DAYS):
+    """Quebra [start, end] em janelas de até `max_days` dias que usam o mesmo endpoint."""
+    windows = []
+    d = start
+    while d <= end:
+        url, api_type = _select_endpoint(d)
+        w_end = d
+        while (w_end + timedelta(days=1) <= end and (w_end - d).days + 1 < max_days
+               and _select_endpoint(w_end + timedelta(days=1))[0] == url):
+            w_end += timedelta(days=1)
+        if url is not None:
+            windows.append((d, w_end, url, api_type))
+        d = w_end + timedelta(days=1)
+    return windows
+
+def _request_points_window(coords, start_str, end_str, url):
+    """Um pedido para vários pontos e dias. Devolve um bloco (times, data) por ponto, na ordem de `coords`."""
+    data = _request_json(url, {
+        "latitude": ",".join(str(lat) for lat, _ in coords),
+        "longitude": ",".join(str(lon) for _, lon in coords),
+        "start_date": start_str,
+        "end_date": end_str,
+        "hourly": ",".join(_hourly_vars()),
+        "timeformat": "unixtime",
+        "timezone": "UTC",
+    })
+    locations = data if isinstance(data, list) else [data]
+    return [_hourly_to_block(loc["hourly"]) if "hourly" in loc else None for loc in locations]
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _fetch_points_window(coords, start_str, end_str, url):
+    """
+    Como _request_points_window, mas os pontos com todos os dias no arquivo local
+    saem do disco e só os demais vão (juntos) à API. Em cache por janela; erros
+    (rede, limite de taxa, falta no arquivo em replay) sobem como exceção e não
+    ficam em cache.
+    """
+    start, end = _normalize_date(start_str), _normalize_date(end_str)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    archive, layout = _get_archive(), _layout()
+    readable = all(archive.should_read(d) for d in days)
+    blocks = [archive.get_range(url, lat, lon, days, layout) if readable else None for lat, lon in coords]
+
+    missing = [i for i, b in enumerate(blocks) if b is None]
+    if missing:
+        if archive.mode == "replay":
+            raise sounding_archive.ArchiveMissError(f"{len(missing)} ponto(s) sem {start_str}–{end_str} no arquivo local")
+        fetched = _request_points_window([coords[i] for i in missing], start_str, end_str, url)
+        for i, b in zip(missing, fetched):
+            blocks[i] = b
+            if b is not None:
+                archive.put(url, *coords[i], b, layout)
+    return blocks
+
+def _block_to_tidy(name, block, api_type) -> pd.DataFrame:
+    """Bloco horas × níveis × variáveis -> linhas (ponto, tempo, pressão)."""
+    n_t, n_l = block["data"].shape[:2]
+    t, rh, u, v = _block_fields(block["data"].reshape(n_t * n_l, len(SOUNDING_VARS)))
+    df = pd.DataFrame({
+        "point": name,
+        "time": np.repeat(pd.to_datetime(block["times"], unit="s"), n_l),
+        "pressure": np.tile(PRESSURE_LEVELS, n_t),
+        "temperature": t,
+        "relative_humidity": rh,
+        "u_component": u,
+        "v_component": v,
+        "source": api_type,
+    })
+    return df[np.isfinite(t)]
+
+def get_profiles_batch(points, start_date, end_date, hours=None) -> pd.DataFrame:
+    """
+    Perfis de vários pontos e dias.
+    `points`: tupla de (nome, lat, lon). Os pontos vão juntos num pedido por
+    endpoint e janela de datas; as janelas são buscadas em paralelo.
+    Devolve uma tabela indexada por (point, time, pressure); `hours` filtra as horas UTC.
+    Janelas com erro ficam de fora e são listadas em df.attrs['errors'].
+    Sem cache próprio: o cache fica em cada janela (_fetch_points_window), para que
+    uma falha temporária não deixe o resultado parcial guardado por uma hora.
+    """
+    start, end = _normalize_date(start_date), _normalize_date(end_date)
+    points = [(str(n), round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS)) for n, lat, lon in points]
+    jobs = [
+        (points[i:i + MAX_BATCH_POINTS], w0, w1, url, api_type)
+        for w0, w1, url, api_type in _date_windows(start, end)
+        for i in range(0, len(points), MAX_BATCH_POINTS)
+    ]
+
+    def run(job):
+        pts, w0, w1, url, api_type = job
+        try:
+            blocks = _fetch_points_window(tuple((lat, lon) for _, lat, lon in pts), w0.strftime("%Y-%m-%d"), w1.strftime("%Y-%m-%d"), url)
+            return [_block_to_tidy(name, b, api_type) for (name, _, _), b in zip(pts, blocks) if b is not None], None
+        except Exception as e:
+            return [], f"{w0:%d/%m/%Y}–{w1:%d/%m/%Y}: {e}"
+
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+        results = list(pool.map(run, jobs))
+
+    frames = [f for parts, _ in results for f in parts]
+    errors = [err for _, err in results if err]
+    if not frames:
+        df = pd.DataFrame(columns=["point", "time", "pressure", "temperature", "relative_humidity", "u_component", "v_component", "source"])
+    else:
+        df = pd.concat(frames, ignore_index=True)
+    if hours is not None and not df.empty:
+        df = df[df["time"].dt.hour.isin(list(hours))]
+    df = df.set_index(["point", "time", "pressure"]).sort_index(level=["point", "time", "pressure"], ascending=[True, True, False])
+    df.attrs["errors"] = errors
+    return df
+
+# ==================================================================================
+# COMPOSIÇÕES (MUITOS DIAS DE UM PONTO)
+# ==================================================================================
+
+def _month_runs(start, end, months=None):
+    """Trechos contínuos de [start, end] que caem nos meses escolhidos (todos se months for vazio)."""
+    runs, d, run_start = [], start, None
+    months = set(months or range(1, 13))
+    while d <= end:
+        inside = d.month in months
+        if inside and run_start is None:
+            run_start = d
+        if not inside and run_start is not None:
+            runs.append((run_start, d - timedelta(days=1)))
+            run_start = None
+        d += timedelta(days=1)
+    if run_start is not None:
+        runs.append((run_start, end))
+    return runs
+
+def get_composite_profiles(lat, lon, start_date, end_date, hour, months=None) -> dict:
+    """
+    Todas as sondagens de um ponto numa hora UTC fixa entre duas datas (opcionalmente
+    só em alguns meses, ex.: todos os janeiros). Os dias vão em poucos pedidos longos
+    (até COMPOSITE_WINDOW_DAYS dias cada, em paralelo) e passam pelo arquivo local.
+    Devolve matrizes sondagens × níveis (como get_day_section) e 'errors'.
+    O cache fica nas janelas (_fetch_points_window): janelas com erro não são
+    guardadas e voltam a ser pedidas na próxima vez.
+    Levanta ValueError se o período tiver mais de COMPOSITE_MAX_DAYS dias.
+    """
+    start, end = _normalize_date(start_date), _normalize_date(end_date)
+    runs = _month_runs(start, end, months)
+    n_days = sum((b - a).days + 1 for a, b in runs)
+    if n_days == 0:
+        raise ValueError("nenhum dia do período cai nos meses escolhidos")
+    if n_days > COMPOSITE_MAX_DAYS:
+        raise ValueError(f"{n_days} dias selecionados (máximo {COMPOSITE_MAX_DAYS})")
+
+    coords = ((round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS)),)
+    jobs = [w for a, b in runs for w in _date_windows(a, b, COMPOSITE_WINDOW_DAYS)]
+
+    def run(job):
+        w0, w1, url, api_type = job
+        try:
+            block = _fetch_points_window(coords, w0.strftime("%Y-%m-%d"), w1.strftime("%Y-%m-%d"), url)[0]
+            return block, api_type, None
+        except Exception as e:
+            return None, api_type, f"{w0:%d/%m/%Y}–{w1:%d/%m/%Y}: {e}"
+
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+        results = list(pool.map(run, jobs))
+
+    errors = [err for _, _, err in results if err]
+    blocks = [b for b, _, _ in results if b is not None and b["times"].size]
+    sources = sorted({src for b, src, _ in results if b is not None})
+    if not blocks:
+        return {"times": np.array([], dtype="datetime64[ns]"), "errors": errors}
+
+    times = np.concatenate([b["times"] for b in blocks])
+    data = np.concatenate([b["data"] for b in blocks])
+    sel = (times // 3600) % 24 == int(hour)
+    t, rh, u, v = _block_fields(data[sel])
+    ok_lev = np.isfinite(t).mean(axis=0) > 0.5       # níveis presentes na maioria das sondagens
+    t, rh, u, v = t[:, ok_lev], rh[:, ok_lev], u[:, ok_lev], v[:, ok_lev]
+    ok_row = np.isfinite(t).all(axis=1)              # sondagens completas nesses níveis
+    return {
+        "times": pd.to_datetime(times[sel][ok_row], unit="s").to_numpy(),
+        "pressure": np.asarray(PRESSURE_LEVELS, dtype=float)[ok_lev],
+        "temperature": t[ok_row],
+        "relative_humidity": rh[ok_row],
+        "u": u[ok_row],
+        "v": v[ok_row],
+        "source": " + ".join(sources),
+        "n_requests": len(jobs),
+        "errors": errors,
+    }
+
+# ==================================================================================
+# BENCHMARK DO PARSING (python skewt_handler.py)
+# ==================================================================================
+
+def _synthetic_hourly(n_hours, seed=0):
+    rng = np.random.default_rng(seed)
+    hourly = {"time": list(range(0, n_hours * 3600, 3600))}
+    for name in _hourly_vars():
+        hourly[name] = rng.uniform(0, 100, n_hours).round(1).tolist()
+    return hourly
+
+def _legacy_profile(hourly, idx):
+    """Parsing antigo (laço por nível, math.sin/cos, lista de dicts) - só para comparação."""
+    res = []
+    for level in PRESSURE_LEVELS:
+        t = hourly.get(f"temperature_{level}hPa", [None])[idx]
+        rh = hourly.get(f"relative_humidity_{level}hPa", [None])[idx]
+        ws = hourly.get(f"wind_speed_{level}hPa", [None])[idx]
+        wd = hourly.get(f"wind_direction_{level}hPa", [None])[idx]
+        if t is not None:
+            u, v = 0.0, 0.0
+            if ws is not None and wd is not None:
+                rad = math.radians(wd)
+                u, v = -ws / 3.6 * math.sin(rad), -ws / 3.6 * math.cos(rad)
+            res.append({"pressure": level, "temperature": float(t), "relative_humidity": float(rh) if rh is not None else 0.0,
+                        "u_component": u, "v_component": v})
+    return pd.DataFrame(res)
+
+def _legacy_tidy(name, hourly, api_type):
+    """Tabela (ponto, tempo, pressão) pelo parsing antigo: um DataFrame por hora, concatenados."""
+    frames = []
+    for i, ts in enumerate(hourly["time"]):
+        df = _legacy_profile(hourly, i)
+        frames.append(df.assign(point=name, time=pd.to_datetime(ts, unit="s"), source=api_type))
+    return pd.concat(frames, ignore_index=True)
+
+def benchmark_parsing(repeat=5):
+    """
+    Parsing antigo × vetorizado, cada caso com a mesma saída nos dois caminhos:
+    1 e 24 horas -> um DataFrame de perfil por hora; vários pontos -> tabela
+    (ponto, tempo, pressão). A conversão do JSON entra no tempo do vetorizado.
+    """
+    import time
+
+    def _time(fn):
+        fn()
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        return best * 1e3
+
+    def _vec_hours(hourly, hours):
+        block = _hourly_to_block(hourly)
+        return [_profile_from_block(block, h) for h in hours]
+
+    day = _synthetic_hourly(24)
+    multi = [_synthetic_hourly(14 * 24, seed=i) for i in range(25)]
+
+    t_legacy_1 = _time(lambda: _legacy_profile(day, 12))
+    t_vec_1 = _time(lambda: _vec_hours(day, [12]))
+    t_legacy_day = _time(lambda: [_legacy_profile(day, h) for h in range(24)])
+    t_vec_day = _time(lambda: _vec_hours(day, range(24)))
+    t_legacy_multi = _time(lambda: [_legacy_tidy(f"P{i}", h, "") for i, h in enumerate(multi)])
+    t_vec_multi = _time(lambda: [_block_to_tidy(f"P{i}", _hourly_to_block(h), "") for i, h in enumerate(multi)])
+
+    print(f"{'caso (mesma saída nos dois caminhos)':<52}{'laço (ms)':>12}{'numpy (ms)':>12}")
+    print(f"{'1 hora -> 1 DataFrame (16 níveis)':<52}{t_legacy_1:12.2f}{t_vec_1:12.2f}")
+    print(f"{'24 horas -> 24 DataFrames':<52}{t_legacy_day:12.2f}{t_vec_day:12.2f}")
+    print(f"{'25 pontos × 14 dias -> tabela (8400 perfis)':<52}{t_legacy_multi:12.1f}{t_vec_multi:12.1f}")
+
+if __name__ == "__main__":
+    benchmark_parsing()
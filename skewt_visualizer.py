@@ -6,14 +6,52 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 import io
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
 
-try:
-    from metpy.plots import SkewT
-    from metpy.units import units
-    import metpy.calc as mpcalc
-    METPY_AVAILABLE = True
-except ImportError:
-    METPY_AVAILABLE = False
+import sounding_thermo
+import skewt_worker
+
+# O MetPy só é importado nos processos do pool (skewt_worker); aqui basta saber se existe
+METPY_AVAILABLE = importlib.util.find_spec("metpy") is not None
+
+SKEWT_WORKERS = 2      # processos no pool (CPU do servidor, compartilhado entre sessões)
+SKEWT_TIMEOUT = 60     # s
+
+# ------------------------------------------------------------------
+# POOL DE PROCESSOS (MetPy + matplotlib fora da thread da sessão)
+# ------------------------------------------------------------------
+
+@st.cache_resource(show_spinner=False)
+def _skewt_pool():
+    """Pool único por processo do servidor; 'spawn' evita herdar o estado do Streamlit."""
+    return ProcessPoolExecutor(max_workers=SKEWT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+def _run_in_pool(fn, payload):
+    """Executa `fn(payload)` no pool; TimeoutError sobe (e não fica em cache)."""
+    try:
+        future = _skewt_pool().submit(fn, payload)
+    except Exception:
+        future = None
+    if future is not None:
+        try:
+            return future.result(timeout=SKEWT_TIMEOUT)
+        except BrokenProcessPool:
+            _skewt_pool.clear()  # recria o pool na próxima vez
+    # Reserva: calcula na própria thread (ex.: ambiente sem suporte a processos)
+    return fn(payload)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _render_skewt_cached(digest, _payload):
+    """Resultado do worker (PNG + índices) em cache pelo hash do perfil: a mesma sondagem não é redesenhada."""
+    return _run_in_pool(skewt_worker.compute_skewt, _payload)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _render_composite_cached(digest, _payload):
+    """Figuras da composição (Skew-T + histogramas) em cache pelo hash do payload."""
+    return _run_in_pool(skewt_worker.compute_composite, _payload)
 
 def render_skewt_plot(df, lat, lon, date, hour):
     if not METPY_AVAILABLE:
@@ -24,99 +62,17 @@ def render_skewt_plot(df, lat, lon, date, hour):
         st.warning("Sem dados para plotar.")
         return
 
-    # --- 1. SUPER RESOLUÇÃO (Para capturar cruzamentos finos) ---
-    try:
-        # Ordena corretamente (1000 -> 100)
-        df = df.sort_values("pressure", ascending=False).reset_index(drop=True)
-        
-        # Pega limites
-        p_max = int(df["pressure"].max())
-        p_min = int(df["pressure"].min())
-        
-        # Cria grade de 2 em 2 hPa (MUITO FINA)
-        new_levels = range(p_max, p_min - 2, -2) 
-        
-        # Interpolação linear segura
-        df_interp = df.set_index("pressure").reindex(new_levels)
-        df_interp = df_interp.interpolate(method='linear')
-        df_interp = df_interp.reset_index().rename(columns={'index': 'pressure'})
-        
-        data = df_interp # Usamos os dados finos para tudo agora
-        
-    except Exception as e:
-        data = df # Fallback
-
-    # --- 2. DADOS FÍSICOS ---
+    # --- 1-3. ÍNDICES E FIGURA (no pool de processos, em cache pelo perfil) ---
+    payload = skewt_worker.build_payload(df, lat, lon, date, hour)
     try:
-        p = data['pressure'].values * units.hPa
-        T = data['temperature'].values * units.degC
-        
-        rh_vals = np.nan_to_num(data['relative_humidity'].values, nan=0.0)
-        rh = rh_vals / 100.0
-        
-        u = (data['u_component'].values * units('m/s')).to('knots')
-        v = (data['v_component'].values * units('m/s')).to('knots')
-
-        Td = mpcalc.dewpoint_from_relative_humidity(T, rh)
-    except Exception as e:
-        st.error(f"Erro dados: {e}")
+        result = _render_skewt_cached(skewt_worker.payload_digest(payload), payload)
+    except FuturesTimeout:
+        st.warning("⏳ O servidor está ocupado gerando outros Skew-T. Tente novamente em instantes.")
         return
-
-    # --- 3. CÁLCULO MANUAL (BYPASS NO METPY LFC) ---
-    # Aqui está o segredo. Não confiamos no mpcalc.lfc()
-    
-    cape, cin = None, None
-    lcl_p, lcl_t = None, None
-    lfc_p, lfc_t = None, None
-    el_p, el_t = None, None
-    prof = None
-    li, k_idx, pw = None, None, None
-
-    try:
-        # 1. Acha NCL (LCL)
-        lcl_p, lcl_t = mpcalc.lcl(p[0], T[0], Td[0])
-        
-        # 2. Calcula Perfil da Parcela
-        prof = mpcalc.parcel_profile(p, T[0], Td[0]).to('degC')
-        
-        # 3. LÓGICA DE FORÇA BRUTA PARA O LFC
-        # Regra: Primeiro ponto onde T_parcela > T_ambiente E Pressão < LCL
-        
-        # Array booleano: Onde a parcela é mais quente?
-        is_warmer = prof.m > T.m
-        
-        # Array booleano: Onde estamos acima do LCL? (Pressão menor que LCL)
-        above_lcl = p.m < lcl_p.m
-        
-        # Interseção: Parcela quente E acima do LCL
-        instability_zone = is_warmer & above_lcl
-        
-        # Pega os índices onde isso acontece
-        indices = np.where(instability_zone)[0]
-        
-        if len(indices) > 0:
-            # O LFC é o PRIMEIRO ponto dessa zona (o de maior pressão)
-            first_idx = indices[0] 
-            
-            # Pega o valor exato
-            lfc_p = p[first_idx]
-            
-            # Interpola a temperatura nesse nível
-            lfc_t = prof[first_idx]
-        else:
-            lfc_p = None # Estável, sem LFC
-
-        # 4. Resto dos cálculos (CAPE/CIN/EL confiam no MetPy)
-        cape, cin = mpcalc.surface_based_cape_cin(p, T, Td)
-        el_p, el_t = mpcalc.el(p, T, Td)
-        li = mpcalc.lifted_index(p, T, prof)[0]
-        pw = mpcalc.precipitable_water(p, Td)
-        try: k_idx = mpcalc.k_index(p, T, Td)
-        except: pass
-
-    except Exception as e:
-        # st.error(f"Erro calc: {e}")
-        pass
+    if result["png"] is None and result["error"]:
+        st.error(result["error"])
+        return
+    ind = result["indices"]
 
     # --- 4. EXIBIÇÃO ---
     st.markdown("### 📊 Índices Termodinâmicos")
@@ -144,33 +100,33 @@ def render_skewt_plot(df, lat, lon, date, hour):
    
     with st.container(border=True):
         c1, c2, c3, c4 = st.columns(4)
-        def fmt(val, unit=""): return f"{val.magnitude:.0f} {unit}" if val is not None else "--"
+        def fmt(val, unit=""): return f"{val:.0f} {unit}" if val is not None else "--"
         
-        c1.metric("CAPE", fmt(cape, "J/kg"), 
+        c1.metric("CAPE", fmt(ind["cape"], "J/kg"), 
             help="**Convective Available Potential Energy**.\nEnergia potencial disponível para que a parcela suba livremente. Valores elevados indicam ambiente instável.")
         
-        c2.metric("CIN", fmt(cin, "J/kg"), 
+        c2.metric("CIN", fmt(ind["cin"], "J/kg"), 
             help="**Convective Inhibition**.\nEnergia que inibe o disparo da convecção (a 'tampa' da panela de pressão).")
         
-        c3.metric("LCL", fmt(lcl_p, "hPa"), 
+        c3.metric("LCL", fmt(ind["lcl_p"], "hPa"), 
             help="**Lifted Condensation Level**.\nNível de Condensação por Levantamento. Aproximação da altura da base das nuvens.")
         
-        c4.metric("LFC", fmt(lfc_p, "hPa"), 
+        c4.metric("LFC", fmt(ind["lfc_p"], "hPa"), 
             help="**Level of Free Convection**.\nNível a partir do qual a parcela fica mais quente que o ambiente e sobe sozinha (início da tempestade).")
 
         c5, c6, c7, c8 = st.columns(4)
         
-        li_str = f"{li.magnitude:.1f}" if li is not None else "--"
+        li_str = f"{ind['li']:.1f}" if ind["li"] is not None else "--"
         c5.metric("LI", li_str, 
             help="**Lifted Index**.\nDiferença de temperatura (Ambiente - Parcela) em 500hPa. Valores negativos indicam instabilidade.")
         
-        c6.metric("K-Index", f"{k_idx.magnitude:.0f}" if k_idx is not None else "--", 
+        c6.metric("K-Index", f"{ind['k_idx']:.0f}" if ind["k_idx"] is not None else "--", 
             help="**Índice K**.\nCombina temperatura e umidade para estimar potencial de trovoadas e chuvas fortes.")
         
-        c7.metric("Água Prec.", f"{pw.magnitude:.1f} mm" if pw is not None else "--", 
+        c7.metric("Água Prec.", f"{ind['pw']:.1f} mm" if ind["pw"] is not None else "--", 
             help="**Água Precipitável**.\nQuantidade total de água na coluna atmosférica. Indica potencial para chuvas volumosas.")
         
-        c8.metric("EL", fmt(el_p, "hPa"), 
+        c8.metric("EL", fmt(ind["el_p"], "hPa"), 
             help="**Equilibrium Level**.\nNível de Equilíbrio. Onde a parcela para de subir (topo da nuvem bigorna).")
 
     # --- TABELA DE REFERÊNCIA ---
@@ -187,48 +143,184 @@ def render_skewt_plot(df, lat, lon, date, hour):
         st.caption("⚠️ Nota: Valores de referência gerais. Regiões tropicais podem apresentar valores basais mais altos.")
 
     
-    # --- 5. PLOTAGEM ---
-    fig = plt.figure(figsize=(9, 9))
-    skew = SkewT(fig, rotation=45)
-
-    skew.plot(p, T, 'r', linewidth=2, label='Temperatura')
-    skew.plot(p, Td, 'g', linewidth=2, label='Ponto de Orvalho')
-
-    if prof is not None:
-        skew.plot(p, prof, 'k', linewidth=1.5, linestyle='--', label='Parcela')
-        if cape is not None and cape.magnitude > 0:
-            skew.shade_cape(p, T, prof, alpha=0.2)
-        if cin is not None and cin.magnitude < 0:
-            skew.shade_cin(p, T, prof, alpha=0.2)
-
-    # Marcadores
-    if lcl_p is not None: skew.plot(lcl_p, lcl_t, 'ko', label='LCL')
-    if lfc_p is not None: skew.plot(lfc_p, lfc_t, 'bo', label='LFC') # Plot do nosso LFC manual
-    if el_p is not None: skew.plot(el_p, el_t, 'ro', label='EL')
-
-    # Barbelas (Simplificadas)
-    mask = (p.m % 50 == 0)
-    if np.any(mask): skew.plot_barbs(p[mask], u[mask], v[mask])
-    
-    skew.plot_dry_adiabats(alpha=0.3)
-    skew.plot_moist_adiabats(alpha=0.3)
-    skew.plot_mixing_lines(linestyle='dotted', alpha=0.4)
-    skew.ax.set_ylim(1000, 100)
-    skew.ax.set_xlim(-40, 50)
-    
-    # Título
-    real_date = df.attrs.get('real_date', date)
-    d_str = real_date if isinstance(real_date, str) else real_date.strftime('%d/%m/%Y')
-    src = df.attrs.get('source', 'ERA5/GFS')
-    plt.title(f"Skew-T | {d_str} {hour}:00 UTC\n{lat:.2f}, {lon:.2f} | {src}", loc='left')
-    skew.ax.legend(loc='upper right')
+    # --- 5. FIGURA (PNG pronto, vindo do worker) ---
+    st.image(result["png"], use_column_width=True)
+    st.download_button("💾 Baixar Gráfico", result["png"], "skewt.png", "image/png")
+
+def render_profile_comparison(batch):
+    """Perfis de temperatura e ponto de orvalho de várias sondagens (pontos e/ou dias) no mesmo gráfico."""
+    if batch is None or batch.empty:
+        st.warning("Sem dados para a comparação de sondagens.")
+        for err in getattr(batch, "attrs", {}).get("errors", []):
+            st.caption(f"⚠️ {err}")
+        return
+
+    st.markdown("### 🧭 Comparação de Sondagens")
+    df = batch.reset_index()
+    groups = list(df.groupby(["point", "time"], sort=False))
+    colors = plt.cm.tab10(np.linspace(0, 1, 10))
+
+    fig, ax = plt.subplots(figsize=(9, 7))
+    for i, ((point, time), g) in enumerate(groups):
+        g = g.sort_values("pressure", ascending=False)
+        t = g["temperature"].to_numpy()
+        # Mesma fórmula da tabela de índices (sounding_thermo), para gráfico e índices baterem
+        td = sounding_thermo.dewpoint_from_rh(t, g["relative_humidity"].to_numpy())
+        label = f"{point} | {time:%d/%m %H}h" if len(groups) > 1 else str(point)
+        color = colors[i % 10]
+        ax.plot(t, g["pressure"], color=color, linewidth=2, label=label)
+        ax.plot(td, g["pressure"], color=color, linewidth=1.2, linestyle="--")
 
+    ax.set_yscale("log")
+    ax.set_ylim(1000, 100)
+    ax.set_yticks([1000, 850, 700, 500, 300, 200, 100])
+    ax.set_yticklabels(["1000", "850", "700", "500", "300", "200", "100"])
+    ax.set_xlabel("Temperatura (°C) — linha cheia: T | tracejada: Td")
+    ax.set_ylabel("Pressão (hPa)")
+    ax.grid(alpha=0.3)
+    ax.legend(loc="upper right", fontsize=8)
     st.pyplot(fig)
-    
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-    st.download_button("💾 Baixar Gráfico", buf.getvalue(), "skewt.png", "image/png")
 
+    # Índices de todas as sondagens num único cálculo vetorizado
+    idx = sounding_thermo.indices_from_table(batch)
+    if not idx.empty:
+        tbl = idx.reset_index()
+        tbl["time"] = pd.to_datetime(tbl["time"]).dt.strftime("%d/%m %H:%M")
+        st.dataframe(
+            tbl.rename(columns={"point": "Ponto", "time": "Horário (UTC)", "CAPE": "CAPE (J/kg)", "CIN": "CIN (J/kg)",
+                                "LCL_p": "LCL (hPa)", "LCL_T": "T LCL (°C)", "LFC_p": "LFC (hPa)", "EL_p": "EL (hPa)",
+                                "K": "K-Index", "PW": "Água Prec. (mm)"}),
+            hide_index=True, use_container_width=True,
+            column_config={c: st.column_config.NumberColumn(format="%.1f") for c in ["LI", "T LCL (°C)", "Água Prec. (mm)"]}
+            | {c: st.column_config.NumberColumn(format="%.0f") for c in ["CAPE (J/kg)", "CIN (J/kg)", "LCL (hPa)", "LFC (hPa)", "EL (hPa)", "K-Index"]},
+        )
+
+    for err in batch.attrs.get("errors", []):
+        st.caption(f"⚠️ Período sem dados: {err}")
+
+def render_day_section(section, hour=None):
+    """
+    Corte tempo-altura do dia (UR em cores, isotermas e barbelas) e linha do tempo
+    de CAPE/CIN/LI, com os índices das 24 horas calculados num único lote.
+    """
+    if not section:
+        st.info("Sem dados horários para o corte tempo-altura deste dia.")
+        return
+
+    p = section["pressure"]
+    times = pd.to_datetime(section["times"])
+    t, rh = section["temperature"], section["relative_humidity"]
+    idx = sounding_thermo.compute_indices(p, t, relative_humidity=rh)
+    x = np.arange(times.size)
+
+    fig, (ax, ax_idx) = plt.subplots(2, 1, figsize=(11, 8), sharex=True, gridspec_kw={"height_ratios": [3, 1.3], "hspace": 0.08})
+    try:
+        # --- Tempo × altura ---
+        cf = ax.contourf(x, p, rh.T, levels=np.arange(0, 101, 10), cmap="YlGnBu", extend="neither")
+        cs = ax.contour(x, p, t.T, levels=np.arange(-80, 45, 5), colors="k", linewidths=0.8, alpha=0.7)
+        ax.clabel(cs, fmt="%d°", fontsize=7)
+        if np.nanmin(t) < 0 < np.nanmax(t):
+            ax.contour(x, p, t.T, levels=[0], colors="red", linewidths=1.8)
+        step = max(1, times.size // 12)
+        kt = 1.94384  # m/s -> nós (convenção das barbelas)
+        ax.barbs(x[::step, None].repeat(p.size, axis=1), np.broadcast_to(p, (x[::step].size, p.size)),
+                 section["u"][::step] * kt, section["v"][::step] * kt, length=5.5, linewidth=0.6)
+        ax.set_yscale("log")
+        ax.set_ylim(p.max(), max(p.min(), 100))
+        ticks = [lv for lv in (1000, 850, 700, 500, 300, 200, 100) if p.min() <= lv <= p.max()]
+        ax.set_yticks(ticks)
+        ax.set_yticklabels([str(lv) for lv in ticks])
+        ax.yaxis.set_minor_formatter(plt.NullFormatter())
+        ax.set_ylabel("Pressão (hPa)")
+        fig.colorbar(cf, cax=ax.inset_axes([1.01, 0.0, 0.015, 1.0]), label="UR (%)")
+        ax.set_title(f"Evolução do dia {times[0]:%d/%m/%Y} (UTC) | isotermas (°C, 0 °C em vermelho) e vento (nós)", loc="left", fontsize=10)
+
+        # --- Índices ---
+        ax_idx.bar(x, idx["CAPE"], color="#f28e2b", alpha=0.8, label="CAPE")
+        ax_idx.bar(x, idx["CIN"], color="#4e79a7", alpha=0.8, label="CIN")
+        ax_idx.axhline(0, color="k", linewidth=0.6)
+        ax_idx.set_ylabel("J/kg")
+        ax_li = ax_idx.twinx()
+        ax_li.plot(x, idx["LI"], color="#7b3294", marker="o", markersize=3, linewidth=1.5, label="LI")
+        ax_li.axhline(0, color="#7b3294", linewidth=0.6, linestyle=":")
+        ax_li.set_ylabel("LI (°C)")
+        h1, l1 = ax_idx.get_legend_handles_labels()
+        h2, l2 = ax_li.get_legend_handles_labels()
+        ax_idx.legend(h1 + h2, l1 + l2, loc="upper left", fontsize=8, ncol=3)
+
+        ax_idx.set_xticks(x[::step])
+        ax_idx.set_xticklabels([f"{ts:%H}h" for ts in times[::step]])
+        ax_idx.set_xlabel("Hora (UTC)")
+        if hour is not None and 0 <= int(hour) < times.size:
+            for a in (ax, ax_idx):
+                a.axvline(int(hour), color="red", linestyle="--", linewidth=1)
+
+        st.pyplot(fig)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
+    finally:
+        plt.close(fig)
+
+    st.caption("ℹ️ Os índices da linha do tempo vêm do cálculo em lote (sounding_thermo) e podem diferir "
+               "um pouco dos cartões do Skew-T acima, calculados pelo MetPy sobre a grade de 2 hPa.")
+
+    c1, c2 = st.columns(2)
+    c1.download_button("💾 Baixar Gráfico", buf.getvalue(), "corte_tempo_altura.png", "image/png", key="dl_day_section")
+    tbl = idx.assign(hora=times.strftime("%H:%M"))[["hora", "CAPE", "CIN", "LI", "K", "PW", "LCL_p", "LFC_p", "EL_p"]]
+    c2.download_button("📥 Baixar Índices (CSV)", tbl.to_csv(index=False).encode("utf-8"), "indices_do_dia.csv", "text/csv", key="dl_day_indices")
+
+def render_composite(comp, lat, lon, hour):
+    """
+    Skew-T composto (média com faixas P25–P75 e P10–P90 de T e Td) e distribuição
+    dos índices de todas as sondagens do período, calculados num único lote.
+    """
+    if not comp or len(comp.get("times", [])) == 0:
+        st.warning("Sem sondagens para a composição no período escolhido.")
+        for err in (comp or {}).get("errors", []):
+            st.caption(f"⚠️ Período sem dados: {err}")
+        return
+    if not METPY_AVAILABLE:
+        st.error("⚠️ Biblioteca 'MetPy' não instalada.")
+        return
+    p_lev = comp["pressure"]
+    times = pd.to_datetime(comp["times"])
+    stats = sounding_thermo.composite_profiles(p_lev, comp["temperature"], comp["relative_humidity"], comp["u"], comp["v"])
+    idx = sounding_thermo.compute_indices(p_lev, comp["temperature"], relative_humidity=comp["relative_humidity"])
+    n = len(times)
+
+    st.markdown(f"### 📚 Composição: {n} sondagens às {int(hour)}:00 UTC")
+    st.caption(f"{times.min():%d/%m/%Y} a {times.max():%d/%m/%Y} | {comp.get('source', '')} | "
+               f"{comp.get('n_requests', 0)} consulta(s) à API")
+
+    # --- SKEW-T COMPOSTO E HISTOGRAMAS (no pool de processos, em cache pelo payload) ---
+    payload = skewt_worker.build_composite_payload(p_lev, stats, idx, lat, lon, hour)
+    try:
+        figs = _render_composite_cached(skewt_worker.composite_digest(payload), payload)
+    except FuturesTimeout:
+        st.warning("⏳ O servidor está ocupado gerando outros Skew-T. Tente novamente em instantes.")
+        return
+    if figs["error"]:
+        st.error(figs["error"])
+    if figs["png"] is not None:
+        st.image(figs["png"], use_column_width=True)
+        st.download_button("💾 Baixar Gráfico", figs["png"], "skewt_composto.png", "image/png", key="dl_composite_png")
 
+    # --- DISTRIBUIÇÃO DOS ÍNDICES ---
+    st.markdown("#### 📊 Distribuição dos Índices no Período")
+    if figs["hist_png"] is not None:
+        st.image(figs["hist_png"], use_column_width=True)
 
+    summary = idx[["CAPE", "CIN", "LI", "K", "PW"]].describe(percentiles=[.1, .5, .9]).T
+    summary = summary[["mean", "10%", "50%", "90%", "min", "max"]]
+    summary.columns = ["Média", "P10", "Mediana", "P90", "Mínimo", "Máximo"]
+    st.dataframe(summary.round(1), use_container_width=True)
+    st.caption(f"CAPE > 1000 J/kg em {(idx['CAPE'] > 1000).mean() * 100:.0f}% das sondagens | "
+               f"LI < 0 em {(idx['LI'] < 0).mean() * 100:.0f}%.")
 
+    c1, c2 = st.columns(2)
+    c1.download_button("📥 Perfil Composto (CSV)", stats.round(2).to_csv(index=False).encode("utf-8"),
+                       "perfil_composto.csv", "text/csv", key="dl_composite_profile")
+    c2.download_button("📥 Índices por Sondagem (CSV)", idx.assign(data=times.strftime("%Y-%m-%d %H:%M")).round(2).to_csv(index=False).encode("utf-8"),
+                       "indices_composicao.csv", "text/csv", key="dl_composite_indices")
+    for err in comp.get("errors", []):
+        st.caption(f"⚠️ Período sem dados: {err}")
@@ -0,0 +1,270 @@
+# ==================================================================================
+# skewt_worker.py
+# ==================================================================================
+"""
+Cálculo dos índices (MetPy) e desenho do Skew-T (individual e composto) fora da
+thread do Streamlit.
+
+Roda em processos do pool criado por skewt_visualizer (contexto 'spawn'), por isso
+não importa streamlit: recebe um payload só com arrays e textos e devolve bytes
+PNG + dicionário de índices (floats simples, fáceis de serializar e guardar em cache).
+"""
+import hashlib
+import io
+
+import numpy as np
+import pandas as pd
+
+import sounding_thermo
+
+INDEX_KEYS = ["cape", "cin", "lcl_p", "lcl_t", "lfc_p", "lfc_t", "el_p", "el_t", "li", "k_idx", "pw"]
+PAYLOAD_FIELDS = ["pressure", "temperature", "relative_humidity", "u_component", "v_component"]
+PNG_DPI = 150
+
+
+def build_payload(df: pd.DataFrame, lat, lon, date, hour) -> dict:
+    """Payload serializável do perfil (arrays float64) e dos textos do título."""
+    df = df.sort_values("pressure", ascending=False)
+    real_date = df.attrs.get("real_date", date)
+    return {
+        **{f: df[f].to_numpy(dtype=float) for f in PAYLOAD_FIELDS},
+        "title_date": real_date if isinstance(real_date, str) else real_date.strftime("%d/%m/%Y"),
+        "hour": int(hour),
+        "lat": float(lat),
+        "lon": float(lon),
+        "source": str(df.attrs.get("source", "ERA5/GFS")),
+    }
+
+def payload_digest(payload: dict) -> str:
+    """Chave do cache: hash dos arrays do perfil e dos textos do título."""
+    h = hashlib.sha1()
+    for f in PAYLOAD_FIELDS:
+        h.update(np.ascontiguousarray(payload[f], dtype=float).tobytes())
+    h.update(repr([payload[k] for k in ("title_date", "hour", "lat", "lon", "source")]).encode())
+    return h.hexdigest()
+
+
+# ------------------------------------------------------------------
+# 1. ÍNDICES (MESMA LÓGICA DO SKEW-T ORIGINAL)
+# ------------------------------------------------------------------
+
+def _refine(payload: dict) -> pd.DataFrame:
+    """Super-resolução (2 em 2 hPa) para capturar cruzamentos finos (interpolação linear em p)."""
+    df = pd.DataFrame({f: payload[f] for f in PAYLOAD_FIELDS}).sort_values("pressure", ascending=False)
+    try:
+        p = df["pressure"].to_numpy(dtype=float)
+        levels = np.arange(int(p[0]), int(p[-1]) - 2, -2, dtype=float)
+        fields = [f for f in PAYLOAD_FIELDS if f != "pressure"]
+        values = sounding_thermo.interp_levels(p, levels, *(df[f].to_numpy(dtype=float) for f in fields))
+        return pd.DataFrame({"pressure": levels, **dict(zip(fields, values))})
+    except Exception:
+        return df
+
+def _indices(p, T, Td, mpcalc):
+    out = dict.fromkeys(INDEX_KEYS)
+    prof = None
+    try:
+        lcl_p, lcl_t = mpcalc.lcl(p[0], T[0], Td[0])
+        out["lcl_p"], out["lcl_t"] = lcl_p, lcl_t
+        prof = mpcalc.parcel_profile(p, T[0], Td[0]).to("degC")
+
+        # LFC por força bruta: primeiro nível acima do NCL com parcela mais quente que o ambiente
+        indices = np.where((prof.m > T.m) & (p.m < lcl_p.m))[0]
+        if len(indices) > 0:
+            out["lfc_p"], out["lfc_t"] = p[indices[0]], prof[indices[0]]
+
+        out["cape"], out["cin"] = mpcalc.surface_based_cape_cin(p, T, Td)
+        out["el_p"], out["el_t"] = mpcalc.el(p, T, Td)
+        out["li"] = mpcalc.lifted_index(p, T, prof)[0]
+        out["pw"] = mpcalc.precipitable_water(p, Td)
+        try: out["k_idx"] = mpcalc.k_index(p, T, Td)
+        except Exception: pass
+    except Exception:
+        pass
+    return out, prof
+
+def _magnitudes(quantities: dict) -> dict:
+    """Quantidades com unidade -> floats (None onde não há valor ou o valor é NaN)."""
+    out = {}
+    for k, q in quantities.items():
+        val = getattr(q, "magnitude", q)
+        try:
+            val = float(val)
+        except (TypeError, ValueError):
+            val = None
+        out[k] = None if val is None or not np.isfinite(val) else val
+    return out
+
+
+# ------------------------------------------------------------------
+# 2. TAREFA DO PROCESSO
+# ------------------------------------------------------------------
+
+def compute_skewt(payload: dict) -> dict:
+    """
+    Índices + figura do Skew-T. Devolve {'indices': {...}, 'png': bytes | None, 'error': str | None}.
+    Roda em processo separado (ou na própria thread, como reserva).
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import metpy.calc as mpcalc
+    from metpy.plots import SkewT
+    from metpy.units import units
+
+    data = _refine(payload)
+    try:
+        p = data["pressure"].values * units.hPa
+        T = data["temperature"].values * units.degC
+        rh = np.nan_to_num(data["relative_humidity"].values, nan=0.0) / 100.0
+        u = (data["u_component"].values * units("m/s")).to("knots")
+        v = (data["v_component"].values * units("m/s")).to("knots")
+        Td = mpcalc.dewpoint_from_relative_humidity(T, rh)
+    except Exception as e:
+        return {"indices": dict.fromkeys(INDEX_KEYS), "png": None, "error": f"Erro dados: {e}"}
+
+    ind, prof = _indices(p, T, Td, mpcalc)
+
+    fig = plt.figure(figsize=(9, 9))
+    try:
+        skew = SkewT(fig, rotation=45)
+        skew.plot(p, T, 'r', linewidth=2, label='Temperatura')
+        skew.plot(p, Td, 'g', linewidth=2, label='Ponto de Orvalho')
+
+        if prof is not None:
+            skew.plot(p, prof, 'k', linewidth=1.5, linestyle='--', label='Parcela')
+            if ind["cape"] is not None and ind["cape"].magnitude > 0:
+                skew.shade_cape(p, T, prof, alpha=0.2)
+            if ind["cin"] is not None and ind["cin"].magnitude < 0:
+                skew.shade_cin(p, T, prof, alpha=0.2)
+
+        # Marcadores
+        if ind["lcl_p"] is not None: skew.plot(ind["lcl_p"], ind["lcl_t"], 'ko', label='LCL')
+        if ind["lfc_p"] is not None: skew.plot(ind["lfc_p"], ind["lfc_t"], 'bo', label='LFC')
+        if ind["el_p"] is not None: skew.plot(ind["el_p"], ind["el_t"], 'ro', label='EL')
+
+        # Barbelas (Simplificadas)
+        mask = (p.m % 50 == 0)
+        if np.any(mask): skew.plot_barbs(p[mask], u[mask], v[mask])
+
+        skew.plot_dry_adiabats(alpha=0.3)
+        skew.plot_moist_adiabats(alpha=0.3)
+        skew.plot_mixing_lines(linestyle='dotted', alpha=0.4)
+        skew.ax.set_ylim(1000, 100)
+        skew.ax.set_xlim(-40, 50)
+
+        plt.title(f"Skew-T | {payload['title_date']} {payload['hour']}:00 UTC\n"
+                  f"{payload['lat']:.2f}, {payload['lon']:.2f} | {payload['source']}", loc='left')
+        skew.ax.legend(loc='upper right')
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=PNG_DPI, bbox_inches='tight')
+        png, error = buf.getvalue(), None
+    except Exception as e:
+        png, error = None, f"Erro ao desenhar o Skew-T: {e}"
+    finally:
+        plt.close(fig)
+
+    return {"indices": _magnitudes(ind), "png": png, "error": error}
+
+
+# ------------------------------------------------------------------
+# 3. SKEW-T COMPOSTO
+# ------------------------------------------------------------------
+
+COMPOSITE_HIST_COLUMNS = [("CAPE", "CAPE (J/kg)", "#f28e2b"), ("CIN", "CIN (J/kg)", "#4e79a7"),
+                          ("LI", "LI (°C)", "#7b3294"), ("PW", "Água Prec. (mm)", "#59a14f")]
+
+
+def build_composite_payload(p_lev, stats: pd.DataFrame, idx: pd.DataFrame, lat, lon, hour) -> dict:
+    """Payload serializável da composição: perfil estatístico, índices por sondagem e textos."""
+    return {
+        "pressure": np.asarray(p_lev, dtype=float),
+        "stats": {c: stats[c].to_numpy(dtype=float) for c in stats.columns},
+        "indices": {c: idx[c].to_numpy(dtype=float) for c, _, _ in COMPOSITE_HIST_COLUMNS},
+        "n": int(len(idx)),
+        "hour": int(hour),
+        "lat": float(lat),
+        "lon": float(lon),
+    }
+
+def composite_digest(payload: dict) -> str:
+    """Chave do cache da composição: hash dos arrays e dos textos."""
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(payload["pressure"]).tobytes())
+    for group in ("stats", "indices"):
+        for k in sorted(payload[group]):
+            h.update(k.encode())
+            h.update(np.ascontiguousarray(payload[group][k]).tobytes())
+    h.update(repr([payload[k] for k in ("n", "hour", "lat", "lon")]).encode())
+    return h.hexdigest()
+
+def compute_composite(payload: dict) -> dict:
+    """
+    Skew-T composto (média com faixas P25–P75 e P10–P90) e histogramas dos índices.
+    Devolve {'png': bytes | None, 'hist_png': bytes | None, 'error': str | None}.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import metpy.calc as mpcalc
+    from metpy.plots import SkewT
+    from metpy.units import units
+
+    p_lev, stats, n, hour = payload["pressure"], payload["stats"], payload["n"], payload["hour"]
+    out = {"png": None, "hist_png": None, "error": None}
+
+    p = p_lev * units.hPa
+    fig = plt.figure(figsize=(9, 9))
+    try:
+        skew = SkewT(fig, rotation=45)
+        for name, color, label in (("T", "r", "Temperatura"), ("Td", "g", "Ponto de Orvalho")):
+            skew.shade_area(p_lev, stats[f"{name}_p10"], stats[f"{name}_p90"], color=color, alpha=0.12)
+            skew.shade_area(p_lev, stats[f"{name}_p25"], stats[f"{name}_p75"], color=color, alpha=0.25)
+            skew.plot(p, stats[f"{name}_mean"] * units.degC, color, linewidth=2, label=f"{label} (média)")
+            skew.plot(p, stats[f"{name}_p50"] * units.degC, color, linewidth=1, linestyle=":")
+        try:
+            t_mean = stats["T_mean"] * units.degC
+            td_mean = stats["Td_mean"] * units.degC
+            prof = mpcalc.parcel_profile(p, t_mean[0], td_mean[0]).to("degC")
+            skew.plot(p, prof, "k", linewidth=1.5, linestyle="--", label="Parcela (perfil médio)")
+        except Exception:
+            pass
+        kt = 1.94384  # m/s -> nós
+        skew.plot_barbs(p, stats["u_mean"] * kt, stats["v_mean"] * kt)
+        skew.plot_dry_adiabats(alpha=0.3)
+        skew.plot_moist_adiabats(alpha=0.3)
+        skew.plot_mixing_lines(linestyle="dotted", alpha=0.4)
+        skew.ax.set_ylim(1000, 100)
+        skew.ax.set_xlim(-40, 50)
+        plt.title(f"Skew-T composto | {n} sondagens, {hour}:00 UTC\n{payload['lat']:.2f}, {payload['lon']:.2f} | "
+                  f"faixas: P25–P75 e P10–P90 | pontilhado: mediana", loc="left")
+        skew.ax.legend(loc="upper right")
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=PNG_DPI, bbox_inches="tight")
+        out["png"] = buf.getvalue()
+    except Exception as e:
+        out["error"] = f"Erro ao desenhar o Skew-T composto: {e}"
+    finally:
+        plt.close(fig)
+
+    fig2, axes = plt.subplots(1, 4, figsize=(12, 3))
+    try:
+        for ax, (col, label, color) in zip(axes, COMPOSITE_HIST_COLUMNS):
+            vals = payload["indices"][col]
+            vals = vals[np.isfinite(vals)]
+            ax.hist(vals, bins=min(20, max(5, n // 4)), color=color, alpha=0.8)
+            if vals.size:
+                ax.axvline(np.median(vals), color="k", linestyle="--", linewidth=1)
+            ax.set_title(label, fontsize=10)
+            ax.tick_params(labelsize=8)
+        axes[0].set_ylabel("Sondagens")
+        fig2.tight_layout()
+        buf = io.BytesIO()
+        fig2.savefig(buf, format="png", dpi=PNG_DPI, bbox_inches="tight")
+        out["hist_png"] = buf.getvalue()
+    except Exception as e:
+        out["error"] = out["error"] or f"Erro ao desenhar os histogramas: {e}"
+    finally:
+        plt.close(fig2)
+    return out
@@ -0,0 +1,193 @@
+# ==================================================================================
+# sounding_archive.py
+# ==================================================================================
+"""
+Arquivo local (SQLite) de sondagens da Open-Meteo, um registro por dia.
+
+Chave: (endpoint, lat/lon arredondados, data UTC). Cada registro guarda o bloco
+horas × níveis × variáveis do dia (float32 comprimido) e a assinatura dos níveis
+e variáveis pedidos, para que uma mudança em PRESSURE_LEVELS/SOUNDING_VARS não
+devolva blocos com outro formato.
+
+O Historical Forecast não muda depois de publicado, então dias mais antigos que
+a janela de previsão ficam no arquivo sem validade; os recentes continuam só no
+cache em memória (TTL de 1 h) do skewt_handler.
+
+Modos (variável de ambiente CLIMACAST_SOUNDING_MODE ou Secrets [sounding_archive]):
+    archive  lê e grava só dias "fechados" (padrão)
+    record   grava tudo o que vier da API, inclusive dias recentes (para gerar fixtures)
+    replay   nunca chama a API: só responde do arquivo (testes, benchmarks, modo offline)
+    off      desliga o arquivo
+
+Resumo do arquivo: `python sounding_archive.py [caminho.sqlite]`.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+MODES = ("archive", "record", "replay", "off")
+DEFAULT_MODE = "archive"
+DEFAULT_DB_PATH = os.path.join(".sounding_archive", "soundings.sqlite")
+ENV_MODE = "CLIMACAST_SOUNDING_MODE"
+ENV_DB = "CLIMACAST_SOUNDING_DB"
+
+# Dias mais recentes que isto ainda podem mudar (análises/previsões atualizadas)
+CLOSED_AFTER_DAYS = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS soundings (
+    endpoint   TEXT    NOT NULL,
+    lat        REAL    NOT NULL,
+    lon        REAL    NOT NULL,
+    day        TEXT    NOT NULL,
+    layout     TEXT    NOT NULL,
+    n_hours    INTEGER NOT NULL,
+    n_levels   INTEGER NOT NULL,
+    n_vars     INTEGER NOT NULL,
+    times      BLOB    NOT NULL,
+    data       BLOB    NOT NULL,
+    fetched_at TEXT    NOT NULL,
+    PRIMARY KEY (endpoint, lat, lon, day)
+)
+"""
+
+
+class ArchiveMissError(LookupError):
+    """Modo replay: a sondagem pedida não está no arquivo."""
+
+
+def is_closed_day(day, today=None) -> bool:
+    """True se o dia já está fora da janela em que os dados ainda podem mudar."""
+    today = today or datetime.utcnow().date()
+    return (today - day).days > CLOSED_AFTER_DAYS
+
+def split_days(block: dict) -> dict:
+    """Bloco de vários dias -> {data UTC: bloco do dia} (pelas horas em unixtime)."""
+    times = block["times"]
+    if times.size == 0:
+        return {}
+    day_idx = times // 86400
+    bounds = np.flatnonzero(np.diff(day_idx)) + 1
+    out = {}
+    for t_part, d_part in zip(np.split(times, bounds), np.split(block["data"], bounds)):
+        day = datetime.utcfromtimestamp(int(t_part[0])).date()
+        out[day] = {"times": t_part, "data": d_part}
+    return out
+
+def join_days(blocks: list) -> dict:
+    """Inverso de split_days: concatena blocos diários em ordem."""
+    return {
+        "times": np.concatenate([b["times"] for b in blocks]),
+        "data": np.concatenate([b["data"] for b in blocks]),
+    }
+
+
+# ------------------------------------------------------------------
+# 1. ARQUIVO SQLITE
+# ------------------------------------------------------------------
+
+class SoundingArchive:
+    """Blocos diários em SQLite. Uma conexão compartilhada entre threads, serializada por lock."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, mode: str = DEFAULT_MODE):
+        if mode not in MODES:
+            raise ValueError(f"modo de arquivo inválido: {mode!r} (use {', '.join(MODES)})")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._conn = None
+        if mode != "off":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def should_read(self, day) -> bool:
+        return self.enabled and (self.mode in ("replay", "record") or is_closed_day(day))
+
+    def should_write(self, day) -> bool:
+        return self.enabled and (self.mode == "record" or (self.mode == "archive" and is_closed_day(day)))
+
+    def get(self, endpoint: str, lat: float, lon: float, day, layout: str):
+        """Bloco do dia ou None (ausente ou gravado com outros níveis/variáveis)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT layout, n_hours, n_levels, n_vars, times, data FROM soundings "
+                "WHERE endpoint = ? AND lat = ? AND lon = ? AND day = ?",
+                (endpoint, float(lat), float(lon), day.isoformat()),
+            ).fetchone()
+        if row is None or row[0] != layout:
+            return None
+        _, n_h, n_l, n_v, times, data = row
+        return {
+            "times": np.frombuffer(zlib.decompress(times), dtype=np.int64).copy(),
+            "data": np.frombuffer(zlib.decompress(data), dtype=np.float32).reshape(n_h, n_l, n_v).copy(),
+        }
+
+    def get_range(self, endpoint: str, lat: float, lon: float, days: list, layout: str):
+        """Blocos de todos os dias concatenados, ou None se faltar qualquer um."""
+        blocks = [self.get(endpoint, lat, lon, d, layout) for d in days]
+        if not blocks or any(b is None for b in blocks):
+            return None
+        return join_days(blocks)
+
+    def put(self, endpoint: str, lat: float, lon: float, block: dict, layout: str, force: bool = False) -> int:
+        """Grava os dias do bloco que o modo permite (force=True grava todos). Devolve quantos dias gravou."""
+        if not self.enabled:
+            return 0
+        rows = []
+        now = datetime.utcnow().isoformat(timespec="seconds")
+        for day, b in split_days(block).items():
+            if not (force or self.should_write(day)):
+                continue
+            data = np.ascontiguousarray(b["data"], dtype=np.float32)
+            rows.append((
+                endpoint, float(lat), float(lon), day.isoformat(), layout, *data.shape,
+                zlib.compress(np.ascontiguousarray(b["times"], dtype=np.int64).tobytes()),
+                zlib.compress(data.tobytes()), now,
+            ))
+        if rows:
+            with self._lock:
+                self._conn.executemany("INSERT OR REPLACE INTO soundings VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+                self._conn.commit()
+        return len(rows)
+
+    def summary(self) -> dict:
+        """Dias arquivados, pontos distintos, intervalo de datas e tamanho do arquivo."""
+        if not self.enabled:
+            return {"mode": self.mode, "days": 0}
+        with self._lock:
+            n, pts, d0, d1 = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT lat || ',' || lon), MIN(day), MAX(day) FROM soundings"
+            ).fetchone()
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"mode": self.mode, "path": self.path, "days": n, "points": pts, "first_day": d0, "last_day": d1, "size_mb": size / 2**20}
+
+
+def from_config(secrets: dict = None) -> SoundingArchive:
+    """Arquivo conforme variáveis de ambiente (prioridade) ou Secrets [sounding_archive]."""
+    secrets = secrets or {}
+    mode = os.environ.get(ENV_MODE) or secrets.get("mode", DEFAULT_MODE)
+    path = os.environ.get(ENV_DB) or secrets.get("db_path", DEFAULT_DB_PATH)
+    return SoundingArchive(path, str(mode).strip().lower())
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.environ.get(ENV_DB, DEFAULT_DB_PATH)
+    if not os.path.exists(path):
+        print(f"Arquivo não encontrado: {path}")
+    else:
+        for k, v in SoundingArchive(path).summary().items():
+            print(f"{k:>10}: {v}")
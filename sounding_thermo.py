@@ -0,0 +1,457 @@
+# ==================================================================================
+# sounding_thermo.py
+# ==================================================================================
+"""
+Índices termodinâmicos vetorizados para lotes de sondagens (numpy puro).
+
+Todas as funções recebem matrizes perfis × níveis (pressão decrescente, comum a
+todos os perfis) e calculam tudo de uma vez, sem laço por perfil:
+
+- ponto de orvalho a partir da UR, NCL (LCL), perfil da parcela de superfície
+  (adiabática seca + pseudoadiabática úmida integrada por RK4 em ln p);
+- CAPE/CIN de superfície (com correção de temperatura virtual, como o MetPy),
+  LFC, EL, Lifted Index, Índice K e água precipitável.
+
+As constantes e fórmulas seguem o MetPy (pressão de saturação de Ambaum 2020,
+mesma equação da taxa pseudoadiabática), para que os valores batam com os do
+Skew-T individual. Validação e benchmarks: `python sounding_thermo.py`.
+"""
+import time
+import numpy as np
+import pandas as pd
+
+# Constantes (mesmos valores do metpy.constants)
+RD = 287.04749097718457       # J/(kg K)
+CP_D = 1004.6662184201462     # J/(kg K)
+KAPPA = 0.28571428571428564   # Rd/Cp_d (valor usado pelo MetPy na adiabática seca)
+LV = 2500840.0                # J/kg
+RV = 461.52311572606084       # J/(kg K)
+CP_L = 4219.4                 # J/(kg K)
+CP_V = 1860.078011865639      # J/(kg K)
+EPS = 0.6219569100577033
+T0 = 273.16                   # K (ponto triplo)
+ZERO_C = 273.15
+SAT_P0 = 6.112                # hPa
+G = 9.80665                   # m/s²
+RHO_L = 999.97495             # kg/m³
+
+REFINE_HPA = 2.0              # grade fina (mesma do Skew-T)
+LCL_ITERS = 30
+RK4_MAX_DLNP = 0.01           # subpasso da pseudoadiabática (~1% em ln p)
+MIN_RH = 0.1                  # % (evita log(0) no ponto de orvalho)
+
+COMPOSITE_PERCENTILES = (10, 25, 50, 75, 90)
+
+INDEX_COLUMNS = ["CAPE", "CIN", "LCL_p", "LCL_T", "LFC_p", "EL_p", "LI", "K", "PW"]
+
+
+# ------------------------------------------------------------------
+# 1. FUNÇÕES BÁSICAS (K, hPa)
+# ------------------------------------------------------------------
+
+def saturation_vapor_pressure(t_k):
+    """Pressão de vapor de saturação sobre água líquida (Ambaum 2020), em hPa."""
+    latent = LV - (CP_L - CP_V) * (t_k - T0)
+    heat_power = (CP_L - CP_V) / RV
+    return SAT_P0 * (T0 / t_k) ** heat_power * np.exp((LV / T0 - latent / t_k) / RV)
+
+def dewpoint_from_vapor_pressure(e_hpa):
+    """Ponto de orvalho (K) a partir da pressão de vapor (inversa de Bolton, como no MetPy)."""
+    val = np.log(e_hpa / SAT_P0)
+    return ZERO_C + 243.5 * val / (17.67 - val)
+
+def dewpoint_from_rh(t_c, rh_pct):
+    """Ponto de orvalho (°C) a partir de temperatura (°C) e UR (%)."""
+    t_k = np.asarray(t_c, dtype=float) + ZERO_C
+    e = np.clip(np.asarray(rh_pct, dtype=float), MIN_RH, None) / 100.0 * saturation_vapor_pressure(t_k)
+    return dewpoint_from_vapor_pressure(e) - ZERO_C
+
+def mixing_ratio(e_hpa, p_hpa):
+    return EPS * e_hpa / (p_hpa - e_hpa)
+
+def saturation_mixing_ratio(p_hpa, t_k):
+    return mixing_ratio(saturation_vapor_pressure(t_k), p_hpa)
+
+def virtual_temperature(t_k, w):
+    return t_k * (w + EPS) / (EPS * (1 + w))
+
+def _moist_dt_dlnp(t_k, p_hpa):
+    """dT/d(ln p) da pseudoadiabática (mesma expressão do metpy.calc.moist_lapse)."""
+    rs = saturation_mixing_ratio(p_hpa, t_k)
+    return (RD * t_k + LV * rs) / (CP_D + LV * LV * rs * EPS / (RD * t_k ** 2))
+
+
+# ------------------------------------------------------------------
+# 2. NCL E PERFIL DA PARCELA
+# ------------------------------------------------------------------
+
+def lcl(p0, t0_k, td0_k):
+    """NCL por iteração de ponto fixo (adiabática seca × razão de mistura conservada). Devolve (p, T em K)."""
+    w = saturation_mixing_ratio(p0, td0_k)
+    p = np.array(p0, dtype=float)
+    for _ in range(LCL_ITERS):
+        e = p * w / (EPS + w)
+        td = dewpoint_from_vapor_pressure(e)
+        p = p0 * (td / t0_k) ** (1.0 / KAPPA)
+    p = np.minimum(p, p0)
+    return p, t0_k * (p / p0) ** KAPPA
+
+def parcel_profile(p, t0_k, td0_k, lcl_p=None, lcl_t=None):
+    """
+    Temperatura (K) da parcela de superfície em cada nível (perfis × níveis).
+    Abaixo do NCL: adiabática seca; acima: pseudoadiabática integrada por RK4 em ln p,
+    marchando nível a nível para todos os perfis ao mesmo tempo
+    (subpassos de no máximo RK4_MAX_DLNP em ln p).
+    """
+    n_prof, n_lev = t0_k.shape[0], p.shape[-1]
+    p = np.broadcast_to(p, (n_prof, n_lev))
+    if lcl_p is None:
+        lcl_p, lcl_t = lcl(p[:, 0], t0_k, td0_k)
+
+    dry = t0_k[:, None] * (p / p[:, :1]) ** KAPPA
+    out = dry.copy()
+    cur_p, cur_t = lcl_p.copy(), lcl_t.copy()
+    for i in range(n_lev):
+        target = p[:, i]
+        active = target < cur_p
+        if np.any(active):
+            gap = np.where(active, np.log(target) - np.log(cur_p), 0.0)
+            n_sub = max(1, int(np.ceil(np.max(np.abs(gap)) / RK4_MAX_DLNP)))
+            h = gap / n_sub
+            lnp = np.log(cur_p)
+            t = cur_t
+            for _ in range(n_sub):
+                k1 = _moist_dt_dlnp(t, np.exp(lnp))
+                k2 = _moist_dt_dlnp(t + 0.5 * h * k1, np.exp(lnp + 0.5 * h))
+                k3 = _moist_dt_dlnp(t + 0.5 * h * k2, np.exp(lnp + 0.5 * h))
+                k4 = _moist_dt_dlnp(t + h * k3, np.exp(lnp + h))
+                t = t + h / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4)
+                lnp = lnp + h
+            cur_t = np.where(active, t, cur_t)
+            cur_p = np.where(active, target, cur_p)
+        out[:, i] = np.where(target < lcl_p, cur_t, dry[:, i])
+    return out
+
+
+# ------------------------------------------------------------------
+# 3. ÁREAS E CRUZAMENTOS (ln p, por segmento)
+# ------------------------------------------------------------------
+
+def _crossings(lnp, diff, increasing: bool):
+    """
+    ln p de todos os cruzamentos de `diff` por zero entre níveis consecutivos
+    (increasing=True: parcela passa a ficar mais quente subindo). NaN onde não cruza.
+    """
+    d0, d1 = diff[:, :-1], diff[:, 1:]
+    cross = (d0 <= 0) & (d1 > 0) if increasing else (d0 > 0) & (d1 <= 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f = d0 / (d0 - d1)
+    x = lnp[:, :-1] + f * (lnp[:, 1:] - lnp[:, :-1])
+    return np.where(cross, x, np.nan)
+
+def _segment_pieces(lnp, diff):
+    """
+    Divide cada segmento no cruzamento por zero (diff linear em ln p) e devolve,
+    por pedaço: área ∫diff d(ln p) (positiva para cima) e ln p do meio do pedaço.
+    Forma: (perfis, segmentos, 2).
+    """
+    x0, x1 = lnp[:, :-1], lnp[:, 1:]
+    d0, d1 = diff[:, :-1], diff[:, 1:]
+    sign_change = (d0 * d1) < 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f = np.where(sign_change, d0 / (d0 - d1), 1.0)
+    xc = x0 + f * (x1 - x0)
+    dx = x0 - x1  # > 0 (ln p diminui subindo)
+    area_a = np.where(sign_change, 0.5 * d0 * f * dx, 0.5 * (d0 + d1) * dx)
+    area_b = np.where(sign_change, 0.5 * d1 * (1 - f) * dx, 0.0)
+    mid_a = np.where(sign_change, 0.5 * (x0 + xc), 0.5 * (x0 + x1))
+    mid_b = 0.5 * (xc + x1)
+    return np.stack([area_a, area_b], axis=-1), np.stack([mid_a, mid_b], axis=-1)
+
+def _interp_at(p, values, target):
+    """Valor em `target` hPa (linear em ln p) para todos os perfis; p comum e decrescente."""
+    if not (p[-1] <= target <= p[0]):
+        return np.full(values.shape[0], np.nan)
+    j = int(np.clip(np.searchsorted(-p, -target, side='right') - 1, 0, p.size - 2))
+    w = (np.log(target) - np.log(p[j])) / (np.log(p[j + 1]) - np.log(p[j]))
+    return values[:, j] + w * (values[:, j + 1] - values[:, j])
+
+
+# ------------------------------------------------------------------
+# 4. INTERFACE PÚBLICA
+# ------------------------------------------------------------------
+
+def interp_levels(p, new_p, *fields):
+    """Interpola perfis (linear em p, como o reindex do Skew-T) em níveis quaisquer, para todos os perfis de uma vez."""
+    p = np.asarray(p, dtype=float)
+    new_p = np.asarray(new_p, dtype=float)
+    j = np.clip(np.searchsorted(-p, -new_p, side='right') - 1, 0, p.size - 2)
+    w = (new_p - p[j]) / (p[j + 1] - p[j])
+    return tuple(f[..., j] + w * (f[..., j + 1] - f[..., j]) for f in fields)
+
+def refine_profiles(p, *fields, step=REFINE_HPA):
+    """Interpola perfis (linear em p) numa grade regular de `step` hPa, para todos os perfis de uma vez."""
+    p = np.asarray(p, dtype=float)
+    fine = np.arange(p[0], p[-1] - step / 2, -step)
+    if fine[-1] != p[-1]:
+        fine = np.append(fine, p[-1])
+    return (fine,) + interp_levels(p, fine, *fields)
+
+def compute_indices(pressure, temperature, dewpoint=None, relative_humidity=None, refine=True) -> pd.DataFrame:
+    """
+    Índices para um lote de perfis.
+    pressure: (níveis,) em hPa, decrescente. temperature/dewpoint: (perfis, níveis) em °C
+    (ou relative_humidity em %, no lugar do ponto de orvalho).
+    Devolve um DataFrame com uma linha por perfil (colunas INDEX_COLUMNS).
+    """
+    p = np.asarray(pressure, dtype=float)
+    t = np.atleast_2d(np.asarray(temperature, dtype=float))
+    if dewpoint is None:
+        rh = np.atleast_2d(np.asarray(relative_humidity, dtype=float))
+        if refine:
+            p, t, rh = refine_profiles(p, t, rh)
+        td = dewpoint_from_rh(t, rh)
+    else:
+        td = np.atleast_2d(np.asarray(dewpoint, dtype=float))
+        if refine:
+            p, t, td = refine_profiles(p, t, td)
+
+    tk, tdk = t + ZERO_C, td + ZERO_C
+    pp = np.broadcast_to(p, tk.shape)
+    lnp = np.log(pp)
+
+    lcl_p, lcl_t = lcl(p[0], tk[:, 0], tdk[:, 0])
+    prof = parcel_profile(p, tk[:, 0], tdk[:, 0], lcl_p, lcl_t)
+
+    # LFC/EL exibidos (temperatura "seca", como no Skew-T)
+    diff = prof - tk
+    above_lcl = pp < lcl_p[:, None]
+    up = np.where(above_lcl[:, :-1], _crossings(lnp, diff, True), np.nan)
+    down = np.where(above_lcl[:, :-1], _crossings(lnp, diff, False), np.nan)
+    lfc_ln = np.nanmax(np.where(np.isnan(up), -np.inf, up), axis=1)
+    # Parcela já mais quente logo acima do NCL -> LFC = NCL
+    first_above = np.argmax(above_lcl, axis=1)
+    warm_at_lcl = diff[np.arange(len(diff)), first_above] > 0
+    lfc_p = np.where(warm_at_lcl, lcl_p, np.where(np.isfinite(lfc_ln), np.exp(lfc_ln), np.nan))
+    el_ln = np.nanmin(np.where(np.isnan(down), np.inf, down), axis=1)
+    el_p = np.where(np.isfinite(el_ln) & (diff[:, -1] <= 0) & np.isfinite(lfc_p), np.exp(el_ln), np.nan)
+
+    # CAPE/CIN com temperatura virtual (como metpy.calc.surface_based_cape_cin)
+    w_env = saturation_mixing_ratio(pp, tdk)
+    w_parcel = np.where(pp > lcl_p[:, None], saturation_mixing_ratio(p[0], tdk[:, :1]), saturation_mixing_ratio(pp, prof))
+    vdiff = virtual_temperature(prof, w_parcel) - virtual_temperature(tk, w_env)
+    v_up = np.where(above_lcl[:, :-1], _crossings(lnp, vdiff, True), np.nan)
+    v_down = np.where(above_lcl[:, :-1], _crossings(lnp, vdiff, False), np.nan)
+    first_above_v = vdiff[np.arange(len(vdiff)), first_above] > 0
+    v_lfc_ln = np.nanmax(np.where(np.isnan(v_up), -np.inf, v_up), axis=1)
+    v_lfc_ln = np.where(first_above_v, np.log(lcl_p), v_lfc_ln)
+    v_el_ln = np.nanmin(np.where(np.isnan(v_down), np.inf, v_down), axis=1)
+    v_el_ln = np.where(np.isfinite(v_el_ln) & (vdiff[:, -1] <= 0), v_el_ln, np.log(p[-1]))
+
+    area, mid = _segment_pieces(lnp, vdiff)
+    eps = 1e-9
+    in_cape = (mid <= v_lfc_ln[:, None, None] + eps) & (mid >= v_el_ln[:, None, None] - eps)
+    below_lfc = mid > v_lfc_ln[:, None, None] + eps
+    has_lfc = np.isfinite(v_lfc_ln)
+    cape = np.where(has_lfc, RD * np.sum(np.where(in_cape & (area > 0), area, 0.0), axis=(1, 2)), 0.0)
+    cin = np.where(has_lfc, RD * np.sum(np.where(below_lfc & (area < 0), area, 0.0), axis=(1, 2)), 0.0)
+
+    # LI, K e água precipitável
+    li = _interp_at(p, tk, 500.0) - _interp_at(p, prof, 500.0)
+    t850, t700, t500 = (_interp_at(p, t, lev) for lev in (850.0, 700.0, 500.0))
+    td850, td700 = (_interp_at(p, td, lev) for lev in (850.0, 700.0))
+    k_idx = (t850 - t500) + td850 - (t700 - td700)
+    w = saturation_mixing_ratio(pp, tdk)
+    dp = -np.diff(pp * 100.0, axis=1)
+    pw = np.sum(0.5 * (w[:, 1:] + w[:, :-1]) * dp, axis=1) / (G * RHO_L) * 1000.0  # mm (trapézios)
+
+    return pd.DataFrame({
+        "CAPE": cape, "CIN": cin,
+        "LCL_p": lcl_p, "LCL_T": lcl_t - ZERO_C,
+        "LFC_p": lfc_p, "EL_p": el_p,
+        "LI": li, "K": k_idx, "PW": pw,
+    })
+
+def indices_from_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Índices para uma tabela de sondagens indexada por (point, time, pressure)
+    (formato de skewt_handler.get_profiles_batch). Uma linha por (point, time).
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    t = df["temperature"].unstack("pressure")
+    rh = df["relative_humidity"].unstack("pressure")
+    levels = np.sort(t.columns.to_numpy(dtype=float))[::-1]
+    t, rh = t[levels], rh[levels]
+    ok = t.notna().all(axis=1) & rh.notna().all(axis=1)
+    if not ok.any():
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    out = compute_indices(levels, t[ok].to_numpy(), relative_humidity=rh[ok].to_numpy())
+    out.index = t.index[ok]
+    return out
+
+
+def composite_profiles(pressure, temperature, relative_humidity, u=None, v=None, percentiles=COMPOSITE_PERCENTILES) -> pd.DataFrame:
+    """
+    Perfil composto de muitas sondagens (sondagens × níveis): média e percentis por nível
+    de T e Td (Td calculado sondagem a sondagem antes de reduzir), UR média e vento médio
+    vetorial. Uma linha por nível.
+    """
+    t = np.atleast_2d(np.asarray(temperature, dtype=float))
+    rh = np.atleast_2d(np.asarray(relative_humidity, dtype=float))
+    td = dewpoint_from_rh(t, rh)
+    out = {"pressure": np.asarray(pressure, dtype=float), "n": np.sum(np.isfinite(t), axis=0)}
+    with np.errstate(invalid='ignore'):
+        for name, arr in (("T", t), ("Td", td)):
+            out[f"{name}_mean"] = np.nanmean(arr, axis=0)
+            out[f"{name}_std"] = np.nanstd(arr, axis=0)
+            for q, row in zip(percentiles, np.nanpercentile(arr, list(percentiles), axis=0)):
+                out[f"{name}_p{q}"] = row
+        out["RH_mean"] = np.nanmean(rh, axis=0)
+        if u is not None and v is not None:
+            out["u_mean"] = np.nanmean(u, axis=0)
+            out["v_mean"] = np.nanmean(v, axis=0)
+    return pd.DataFrame(out)
+
+
+# ------------------------------------------------------------------
+# 5. VALIDAÇÃO (MetPy) E BENCHMARK
+# ------------------------------------------------------------------
+
+LEVELS_STD = np.array([1000, 975, 950, 925, 900, 850, 800, 700, 600, 500, 400, 300, 250, 200, 150, 100], dtype=float)
+
+def synthetic_profiles(n: int, seed: int = 0):
+    """Perfis tropicais/subtropicais plausíveis nos 16 níveis padrão: (T °C, UR %)."""
+    rng = np.random.default_rng(seed)
+    z = 44330.8 * (1 - (LEVELS_STD / 1013.25) ** 0.190263)  # altura padrão (m)
+    t_sfc = rng.uniform(18, 34, (n, 1))
+    lapse = rng.uniform(5.5, 7.5, (n, 1)) / 1000.0
+    t = t_sfc - lapse * z[None, :] + rng.normal(0, 0.8, (n, z.size))
+    t = np.maximum(t, -75.0)
+    rh_sfc = rng.uniform(40, 95, (n, 1))
+    rh = np.clip(rh_sfc * np.exp(-z[None, :] / rng.uniform(4000, 9000, (n, 1))) + rng.normal(0, 5, (n, z.size)), 2, 100)
+    return t, rh
+
+def validate_against_metpy(n: int = 20, seed: int = 1) -> pd.DataFrame:
+    """Compara com o MetPy (mesma grade de 2 hPa do Skew-T). Devolve as diferenças por perfil."""
+    import metpy.calc as mpcalc
+    from metpy.units import units
+
+    t, rh = synthetic_profiles(n, seed)
+    ours = compute_indices(LEVELS_STD, t, relative_humidity=rh)
+    rows = []
+    p_f, t_f, rh_f = refine_profiles(LEVELS_STD, t, rh)
+    for i in range(n):
+        p = p_f * units.hPa
+        T = t_f[i] * units.degC
+        Td = mpcalc.dewpoint_from_relative_humidity(T, np.clip(rh_f[i], MIN_RH, None) / 100.0)
+        lcl_p, _ = mpcalc.lcl(p[0], T[0], Td[0])
+        prof = mpcalc.parcel_profile(p, T[0], Td[0]).to('degC')
+        cape, cin = mpcalc.surface_based_cape_cin(p, T, Td)
+        li = mpcalc.lifted_index(p, T, prof)[0]
+        pw = mpcalc.precipitable_water(p, Td)
+        k = mpcalc.k_index(p, T, Td)
+        rows.append({
+            "CAPE": ours.at[i, "CAPE"] - cape.m, "CIN": ours.at[i, "CIN"] - cin.m,
+            "LCL_p": ours.at[i, "LCL_p"] - lcl_p.m, "LI": ours.at[i, "LI"] - li.m,
+            "K": ours.at[i, "K"] - k.m, "PW": ours.at[i, "PW"] - pw.to('mm').m,
+            "CAPE_ref": cape.m,
+        })
+    return pd.DataFrame(rows)
+
+def benchmark(n_profiles=(1, 24, 240), repeat: int = 3):
+    """Tempo do lote (24 horas de um ponto, 10 pontos × 24 h...) e, se disponível, do MetPy por perfil."""
+    def _time(fn):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        return best
+
+    for n in n_profiles:
+        t, rh = synthetic_profiles(n)
+        dt = _time(lambda: compute_indices(LEVELS_STD, t, relative_humidity=rh))
+        print(f"{n:5d} perfis: {dt * 1e3:9.1f} ms  ({dt / n * 1e3:.2f} ms/perfil)")
+
+    try:
+        import metpy.calc as mpcalc
+        from metpy.units import units
+        t, rh = synthetic_profiles(1)
+        p_f, t_f, rh_f = refine_profiles(LEVELS_STD, t, rh)
+
+        def _metpy_one():
+            p, T = p_f * units.hPa, t_f[0] * units.degC
+            Td = mpcalc.dewpoint_from_relative_humidity(T, rh_f[0] / 100.0)
+            prof = mpcalc.parcel_profile(p, T[0], Td[0])
+            mpcalc.surface_based_cape_cin(p, T, Td)
+            mpcalc.el(p, T, Td)
+            mpcalc.lifted_index(p, T, prof)
+            mpcalc.precipitable_water(p, Td)
+            mpcalc.k_index(p, T, Td)
+        print(f"MetPy, 1 perfil: {_time(_metpy_one) * 1e3:9.1f} ms")
+    except ImportError:
+        pass
+
+
+def _metpy_skewt_indices(p_hpa, t_c, rh_pct, mpcalc, units) -> dict:
+    """Mesmos cálculos do Skew-T (skewt_worker), numa grade qualquer."""
+    p, T = p_hpa * units.hPa, t_c * units.degC
+    Td = mpcalc.dewpoint_from_relative_humidity(T, np.clip(rh_pct, MIN_RH, None) / 100.0)
+    lcl_p, _ = mpcalc.lcl(p[0], T[0], Td[0])
+    prof = mpcalc.parcel_profile(p, T[0], Td[0]).to('degC')
+    warm = np.where((prof.m > T.m) & (p.m < lcl_p.m))[0]
+    cape, cin = mpcalc.surface_based_cape_cin(p, T, Td)
+    el_p, _ = mpcalc.el(p, T, Td)
+    return {"CAPE": cape.m, "CIN": cin.m, "LFC_p": p.m[warm[0]] if warm.size else np.nan, "EL_p": el_p.m}
+
+def benchmark_vertical_grid(n: int = 30, seed: int = 2, coarse_step: float = 10.0) -> pd.DataFrame:
+    """
+    Erro dos índices (MetPy, como no Skew-T) × custo, para a grade fixa de 2 hPa
+    (referência) e uma grade uniforme de `coarse_step` hPa (controle).
+    """
+    import metpy.calc as mpcalc
+    from metpy.units import units
+
+    t, rh = synthetic_profiles(n, seed)
+    grids = {
+        "fixa 2 hPa": lambda i: refine_profiles(LEVELS_STD, t[i:i + 1], rh[i:i + 1])[0],
+        f"uniforme {coarse_step:g} hPa": lambda i: refine_profiles(LEVELS_STD, t[i:i + 1], step=coarse_step)[0],
+    }
+    results = {}
+    for name, make in grids.items():
+        rows, levels, t0 = [], [], time.perf_counter()
+        for i in range(n):
+            p = make(i)
+            ti, rhi = interp_levels(LEVELS_STD, p, t[i], rh[i])
+            rows.append(_metpy_skewt_indices(p, ti, rhi, mpcalc, units))
+            levels.append(p.size)
+        results[name] = (pd.DataFrame(rows), np.mean(levels), (time.perf_counter() - t0) / n)
+
+    ref = results["fixa 2 hPa"][0]
+    summary = []
+    for name, (df, n_lev, dt) in results.items():
+        err = (df - ref).abs()
+        summary.append({
+            "grade": name, "níveis (média)": n_lev, "ms/perfil": dt * 1e3,
+            "|ΔCAPE| máx (J/kg)": err["CAPE"].max(), "|ΔCIN| máx (J/kg)": err["CIN"].max(),
+            "|ΔLFC| máx (hPa)": err["LFC_p"].max(), "|ΔEL| máx (hPa)": err["EL_p"].max(),
+            "LFC/EL diferentes": int((err[["LFC_p", "EL_p"]] > coarse_step / 2).any(axis=1).sum()),
+        })
+    return pd.DataFrame(summary).set_index("grade")
+
+
+if __name__ == "__main__":
+    try:
+        diffs = validate_against_metpy()
+        print("Diferença para o MetPy (média absoluta | máxima absoluta):")
+        for col in ["CAPE", "CIN", "LCL_p", "LI", "K", "PW"]:
+            print(f"  {col:6s} {diffs[col].abs().mean():8.2f} | {diffs[col].abs().max():8.2f}")
+    except ImportError:
+        print("MetPy não instalado: validação ignorada.")
+    benchmark()
+    try:
+        print("\nGrade vertical do Skew-T (MetPy): erro dos índices × custo")
+        print(benchmark_vertical_grid().round(2).to_string())
+    except ImportError:
+        pass
@@ -0,0 +1,265 @@
+# ==================================================================================
+# tile_proxy.py
+# ==================================================================================
+"""
+Proxy local de tiles com cache em disco (LRU) para o Clima-Cast.
+
+Os mapas interativos buscam cada tile do Earth Engine e do basemap ESRI direto
+do navegador. Em aula, dezenas de alunos baixam os mesmos tiles do mesmo estado.
+Este módulo sobe um pequeno servidor HTTP junto com o app: o primeiro acesso
+busca o tile na origem, os seguintes saem do disco.
+
+Configuração (Streamlit Secrets, seção [tile_proxy]):
+    enabled    = true
+    host       = "127.0.0.1"               # interface de escuta ("0.0.0.0" expõe na rede)
+    port       = 8765
+    public_url = "http://localhost:8765"   # endereço visto pelo navegador
+    cache_dir  = ".tile_cache"
+    max_mb     = 512
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+import streamlit as st
+
+ESRI_IMAGERY_URL = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
+
+UPSTREAM_TIMEOUT = (5, 20)  # (conexão, leitura) em segundos
+DEFAULT_CONTENT_TYPE = "image/png"
+
+# Cada arquivo do cache começa com uma linha "CT:<Content-Type>" (ESRI é JPEG, EE é PNG)
+_CT_PREFIX = b"CT:"
+
+
+def _pack_tile(data: bytes, content_type: str) -> bytes:
+    return _CT_PREFIX + content_type.encode("ascii", "ignore") + b"\n" + data
+
+def _unpack_tile(raw: bytes) -> tuple[bytes, str]:
+    """(bytes do tile, Content-Type). Arquivos sem cabeçalho têm o tipo deduzido dos bytes."""
+    if raw.startswith(_CT_PREFIX):
+        head, _, data = raw.partition(b"\n")
+        return data, head[len(_CT_PREFIX):].decode("ascii", "ignore") or DEFAULT_CONTENT_TYPE
+    return raw, "image/jpeg" if raw[:3] == b"\xff\xd8\xff" else DEFAULT_CONTENT_TYPE
+
+
+# ------------------------------------------------------------------
+# 1. CACHE EM DISCO (LRU)
+# ------------------------------------------------------------------
+
+class TileCache:
+    """Armazena tiles em disco e remove os menos usados quando passa do limite."""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # caminho -> tamanho (ordem = uso mais antigo primeiro)
+        self._total = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for f in files:
+                path = os.path.join(root, f)
+                try:
+                    st_ = os.stat(path)
+                    entries.append((st_.st_mtime, path, st_.st_size))
+                except OSError:
+                    continue
+        for _, path, size in sorted(entries):
+            self._index[path] = size
+            self._total += size
+
+    def _path(self, source: str, z: int, x: int, y: int) -> str:
+        return os.path.join(self.cache_dir, source, str(z), str(x), f"{y}.tile")
+
+    def get(self, source: str, z: int, x: int, y: int):
+        """(bytes, Content-Type) do tile, ou None se não estiver no cache."""
+        path = self._path(source, z, x, y)
+        with self._lock:
+            if path not in self._index:
+                return None
+            self._index.move_to_end(path)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            os.utime(path, None)
+            return _unpack_tile(raw)
+        except OSError:
+            with self._lock:
+                self._total -= self._index.pop(path, 0)
+            return None
+
+    def put(self, source: str, z: int, x: int, y: int, data: bytes, content_type: str = DEFAULT_CONTENT_TYPE):
+        data = _pack_tile(data, content_type)
+        path = self._path(source, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._total -= self._index.pop(path, 0)
+            self._index[path] = len(data)
+            self._total += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._index:
+            old_path, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+# ------------------------------------------------------------------
+# 2. PROXY
+# ------------------------------------------------------------------
+
+class TileProxy:
+    """Servidor HTTP em thread própria que serve /t/<fonte>/<z>/<x>/<y>."""
+
+    def __init__(self, port: int, public_url: str, cache_dir: str, max_mb: int, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.public_url = public_url.rstrip("/")
+        self.cache = TileCache(cache_dir, max_mb * 1024 * 1024)
+        self._sources = {}
+        self._sources_lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        proxy = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                proxy._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def register(self, name: str, url_template: str) -> str:
+        """
+        Registra (ou atualiza) uma fonte e devolve o template de URL via proxy.
+        `name` deve ser estável (ex.: digest da imagem), para o cache sobreviver
+        à renovação do token do Earth Engine.
+        """
+        key = hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+        with self._sources_lock:
+            self._sources[key] = url_template
+        return f"{self.public_url}/t/{key}/{{z}}/{{x}}/{{y}}"
+
+    def _fetch(self, source: str, z: int, x: int, y: int):
+        """Busca na origem; pedidos simultâneos do mesmo tile compartilham um único download."""
+        tile_id = (source, z, x, y)
+        with self._inflight_lock:
+            fut = self._inflight.get(tile_id)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[tile_id] = fut
+        if not owner:
+            return fut.result()
+
+        try:
+            with self._sources_lock:
+                template = self._sources.get(source)
+            result = None
+            if template:
+                resp = self._session.get(template.format(z=z, x=x, y=y), timeout=UPSTREAM_TIMEOUT)
+                if resp.status_code == 200:
+                    result = (resp.content, resp.headers.get("Content-Type", DEFAULT_CONTENT_TYPE))
+                    self.cache.put(source, z, x, y, *result)
+            fut.set_result(result)
+            return result
+        except Exception:
+            fut.set_result(None)
+            return None
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(tile_id, None)
+
+    def _handle(self, req: BaseHTTPRequestHandler):
+        parts = req.path.split("?")[0].strip("/").split("/")
+        try:
+            if len(parts) != 5 or parts[0] != "t":
+                raise ValueError
+            source, z, x, y = parts[1], int(parts[2]), int(parts[3]), int(parts[4])
+        except ValueError:
+            req.send_error(404)
+            return
+
+        cached = self.cache.get(source, z, x, y)
+        if cached is None:
+            cached = self._fetch(source, z, x, y)
+            if cached is None:
+                req.send_error(502)
+                return
+        data, ctype = cached
+
+        req.send_response(200)
+        req.send_header("Content-Type", ctype)
+        req.send_header("Content-Length", str(len(data)))
+        req.send_header("Cache-Control", "public, max-age=86400")
+        req.send_header("Access-Control-Allow-Origin", "*")
+        req.end_headers()
+        try:
+            req.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+# ------------------------------------------------------------------
+# 3. INTERFACE PÚBLICA
+# ------------------------------------------------------------------
+
+@st.cache_resource(show_spinner=False)
+def _get_proxy():
+    """Sobe o proxy uma única vez por processo (ou devolve None se desativado)."""
+    try:
+        cfg = dict(st.secrets.get("tile_proxy", {}))
+    except Exception:
+        cfg = {}
+    if not cfg.get("enabled", False):
+        return None
+    port = int(cfg.get("port", 8765))
+    try:
+        return TileProxy(
+            host=str(cfg.get("host", "127.0.0.1")),
+            port=port,
+            public_url=cfg.get("public_url", f"http://localhost:{port}"),
+            cache_dir=cfg.get("cache_dir", ".tile_cache"),
+            max_mb=int(cfg.get("max_mb", 512)),
+        )
+    except OSError as e:
+        print(f"Tile proxy indisponível: {e}")
+        return None
+
+def proxied_url(name: str, url_template: str) -> str:
+    """Template de URL via proxy, ou o original quando o proxy está desligado."""
+    proxy = _get_proxy()
+    if proxy is None:
+        return url_template
+    return proxy.register(name, url_template)
@@ -67,6 +67,22 @@ def reset_analysis_results_only():
 # Renderizar a barra lateral
 # --------------------------
 
+def _renderizar_comparacao_regioes(opcoes, atual, rotulo):
+    """Multiselect de regiões extras para a comparação multi-região (Séries Temporais)."""
+    validas = [o for o in opcoes if o != atual]
+    # Seleções antigas (outro estado/município ou tipo de região) somem antes do widget
+    if 'regioes_comparacao' in st.session_state:
+        st.session_state['regioes_comparacao'] = [r for r in st.session_state['regioes_comparacao'] if r in validas]
+    st.multiselect(
+        f"Comparar com outros {rotulo}",
+        validas,
+        key='regioes_comparacao',
+        max_selections=8,
+        on_change=reset_analysis_state,
+        placeholder="Opcional",
+        help="As regiões são processadas juntas no servidor (uma única consulta para todas)."
+    )
+
 def renderizar_sidebar(dados_geo, mapa_nomes_uf):
     with st.sidebar:
         # --- 1. TÍTULO ---
@@ -115,6 +131,26 @@ def renderizar_sidebar(dados_geo, mapa_nomes_uf):
             st.date_input("Data", value=data_padrao, max_value=hoje, key='skew_date', format="DD/MM/YYYY", on_change=reset_analysis_state)
             st.slider("Hora (UTC)", 0, 23, 12, key='skew_hour', help="Hora em UTC (3 horas à frente de Brasília).", on_change=reset_analysis_state)
 
+            with st.expander("🧭 Comparar Sondagens (outros pontos/dias)"):
+                st.text_area(
+                    "Pontos extras (um por linha: Nome; Lat; Lon)",
+                    key='skew_extra_points', height=100,
+                    placeholder="Rio de Janeiro; -22.91; -43.17\nCampinas; -22.91; -47.06",
+                    on_change=reset_analysis_state
+                )
+                st.number_input("Dias consecutivos (a partir da data)", 1, 14, 1, key='skew_n_days', on_change=reset_analysis_state)
+                st.caption("Todos os pontos vão juntos numa única consulta por período.")
+
+            with st.expander("📚 Composição (média de muitos dias)"):
+                st.checkbox("Gerar Skew-T composto", key='skew_composite', on_change=reset_analysis_state,
+                            help="Média e faixas de percentis de todas as sondagens do período, na hora escolhida acima.")
+                c1, c2 = st.columns(2)
+                with c1: st.date_input("Início", value=hoje - relativedelta(months=3), max_value=hoje, key='skew_comp_start', format="DD/MM/YYYY", on_change=reset_analysis_state)
+                with c2: st.date_input("Fim", value=hoje - relativedelta(days=1), max_value=hoje, key='skew_comp_end', format="DD/MM/YYYY", on_change=reset_analysis_state)
+                st.multiselect("Somente os meses (opcional)", NOMES_MESES_PT, key='skew_comp_months', on_change=reset_analysis_state,
+                               help="Ex.: Janeiro com um período de vários anos = todas as sondagens de janeiro.")
+                st.caption("Até 400 dias selecionados, buscados em poucas consultas longas.")
+
             st.warning("ℹ️ **Nota:** Dados de altitude (3D/Perfil Vertical) estão disponíveis apenas a partir de **23/03/2021** "
                 "(limite do GFS). Para datas anteriores, apenas dados de superfície (2D) podem ser consultados.")
 
@@ -187,7 +223,11 @@ def renderizar_sidebar(dados_geo, mapa_nomes_uf):
                 
                 st.markdown("---")
                 
-                vis_mode = st.radio("Estilo de Comparação:", ["Transparência", "Split Map (Cortina)"], horizontal=True, key='overlay_mode', on_change=reset_analysis_results_only)
+                vis_mode = st.radio("Estilo de Comparação:", ["Transparência", "Split Map (Cortina)", "Comparação Calculada"], horizontal=True, key='overlay_mode', on_change=reset_analysis_results_only)
+                
+                if vis_mode == "Comparação Calculada":
+                    st.selectbox("Operação (A = 1ª, B = 2ª camada):", ["Diferença (B − A)", "Razão (B / A)", "Anomalia Padronizada (zB − zA)"], key='overlay_op', on_change=reset_analysis_results_only)
+                    st.caption("A comparação é calculada no servidor e exibida como uma única camada.")
                 
                 if vis_mode == "Transparência":
                     st.markdown("🎚️ **Controle de Opacidade**")
@@ -254,6 +294,8 @@ def renderizar_sidebar(dados_geo, mapa_nomes_uf):
 
                 if tipo_loc == "Estado":
                     st.selectbox("UF", lista_ufs, key='estado', on_change=reset_analysis_state)
+                    if opcao == "Séries Temporais" and st.session_state.get('estado', 'Selecione...') != "Selecione...":
+                        _renderizar_comparacao_regioes(lista_ufs[1:], st.session_state.get('estado'), "estados")
                 
                 elif tipo_loc == "Município":
                     st.selectbox("UF", lista_ufs, key='estado', on_change=reset_analysis_state)
@@ -278,6 +320,8 @@ def renderizar_sidebar(dados_geo, mapa_nomes_uf):
                              lista_muns = [f"Erro ao carregar cidades de {uf_sigla}"]
                     
                     st.selectbox("Município", lista_muns, key='municipio', on_change=reset_analysis_state)
+                    if opcao == "Séries Temporais" and st.session_state.get('municipio', 'Selecione...') in lista_muns[1:]:
+                        _renderizar_comparacao_regioes(lista_muns[1:], st.session_state.get('municipio'), "municípios da UF")
                 
                 elif tipo_loc == "Círculo (Lat/Lon/Raio)":
 
@@ -402,6 +446,27 @@ def renderizar_sidebar(dados_geo, mapa_nomes_uf):
             
             st.divider()
 
+            # --- 6b. RESOLUÇÃO DA SÉRIE ---
+            if opcao in ["Séries Temporais", "Múltiplas Séries"]:
+                st.markdown("#### 🧮 Resolução da Série")
+                st.selectbox(
+                    "Resolução da Série",
+                    ["Diária", "Horária", "Mensal", "Anual"] + (["Ciclo Diurno"] if opcao == "Séries Temporais" else []),
+                    key='serie_resolucao',
+                    on_change=reset_analysis_state,
+                    label_visibility="collapsed",
+                    help="Mensal e Anual são agregadas no servidor (totais para chuva, médias para as demais), transferindo bem menos dados em períodos longos. "
+                         "Horária usa o ERA5-Land horário (UTC, até 1 ano). Ciclo Diurno devolve a média de cada hora UTC no período."
+                )
+                if opcao == "Séries Temporais" and st.session_state.get('serie_resolucao', 'Diária') == "Diária":
+                    st.toggle(
+                        "Distribuição espacial (percentis)",
+                        key='serie_distribuicao',
+                        on_change=reset_analysis_state,
+                        help="Além da média, traz mín., máx. e P10/P50/P90 dos pixels da região em cada dia (mesma consulta)."
+                    )
+                st.divider()
+
             # --- 7. VISUALIZAÇÃO ---
             if opcao == "Mapas":
                 st.markdown("#### 🎨 Visualização")